@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser
+from json import load
+
+
+def main():
+    parser = ArgumentParser(description="Compare two benchmark results.")
+    parser.add_argument("before", help="JSON results of the base commit")
+    parser.add_argument("after", help="JSON results of the new commit")
+    parser.add_argument("--mode", choices=["cold", "warm"], default="cold")
+    args = parser.parse_args()
+
+    with open(args.before) as obj:
+        before = load(obj)
+    with open(args.after) as obj:
+        after = load(obj)
+    print("{0} -> {1} ({2})".format(before.get("revision"),
+                                    after.get("revision"), args.mode))
+    for shape in sorted(set(before["shapes"]) & set(after["shapes"])):
+        print("\n" + shape)
+        old = before["shapes"][shape][args.mode]
+        new = after["shapes"][shape][args.mode]
+        for case in sorted(set(old) | set(new)):
+            if case not in old or case not in new:
+                print("  {0:<24} {1}".format(
+                    case, "added" if case in new else "removed"))
+                continue
+            old_ms = old[case]["median_ms"]
+            new_ms = new[case]["median_ms"]
+            ratio = new_ms / old_ms if old_ms else float("inf")
+            print("  {0:<24} {1:>10.2f} ms {2:>10.2f} ms {3:>7.2f}x".format(
+                case, old_ms, new_ms, ratio))
+
+
+if __name__ == "__main__":
+    main()
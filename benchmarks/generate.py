@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser
+from os import makedirs, path
+from random import Random
+from subprocess import PIPE, Popen, check_call
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "Benchmark",
+    "GIT_AUTHOR_EMAIL": "benchmark@localhost",
+    "GIT_COMMITTER_NAME": "Benchmark",
+    "GIT_COMMITTER_EMAIL": "benchmark@localhost",
+    "HOME": "/nonexistent",
+    "GIT_CONFIG_NOSYSTEM": "1",
+    "PATH": "/usr/local/bin:/usr/bin:/bin"
+}
+
+DEFAULT_SHAPE = {
+    "files": 1000,
+    "depth": 3,
+    "modified_ratio": 0.05,
+    "untracked_ratio": 0.02,
+    "branches": 10,
+    "commits": 100,
+    "large_diff_size": 0,
+    "binary_size": 0
+}
+
+
+def git(repository, *args, **kwargs):
+    """Run git in a repository with a reproducible identity."""
+    check_call(["git"] + list(args), cwd=repository, env=GIT_ENV, **kwargs)
+
+
+def _file_paths(shape, rand):
+    """Return the relative paths of the tracked files."""
+    paths = []
+    for i in range(shape["files"]):
+        depth = rand.randint(0, shape["depth"])
+        dirs = ["dir{0}".format(rand.randint(0, 9)) for _ in range(depth)]
+        paths.append("/".join(dirs + ["file{0}.txt".format(i)]))
+    return paths
+
+
+def _content(rand, lines=20):
+    return "".join("line {0} {1}\n".format(i, rand.random())
+                   for i in range(lines)).encode("ascii")
+
+
+def _blob(data):
+    return b"data " + str(len(data)).encode("ascii") + b"\n" + data + b"\n"
+
+
+def generate(repository, shape, seed=0):
+    """Create a repository of the given shape, return its path.
+
+    History is written with git fast-import: the first commit adds every
+    file, each following one modifies a single file. Branches point to
+    random commits. The working tree then gets modified, deleted,
+    untracked, large text and binary changes according to the shape.
+    """
+    shape = dict(DEFAULT_SHAPE, **shape)
+    rand = Random(seed)
+    makedirs(repository)
+    git(repository, "init", "-q")
+    git(repository, "config", "remote.origin.url",
+        "https://example.com/benchmark/repository.git")
+    paths = _file_paths(shape, rand)
+    large_path = "large.txt"
+    binary_path = "binary.bin"
+
+    stream = []
+    timestamp = 1500000000
+    commits = max(1, shape["commits"])
+    for mark in range(1, commits + 1):
+        stream.append(b"commit refs/heads/master\nmark :" +
+                      str(mark).encode("ascii") + b"\n")
+        stream.append("committer Benchmark <benchmark@localhost> {0} +0000\n"
+                      .format(timestamp + mark).encode("ascii"))
+        stream.append(_blob("Commit {0}".format(mark).encode("ascii")))
+        if mark == 1:
+            for file_path in paths:
+                stream.append(b"M 100644 inline " +
+                              file_path.encode("ascii") + b"\n")
+                stream.append(_blob(_content(rand)))
+            if shape["large_diff_size"]:
+                stream.append(b"M 100644 inline " +
+                              large_path.encode("ascii") + b"\n")
+                stream.append(_blob(_content(
+                    rand, shape["large_diff_size"] // 32)))
+            if shape["binary_size"]:
+                stream.append(b"M 100644 inline " +
+                              binary_path.encode("ascii") + b"\n")
+                stream.append(_blob(bytes(bytearray(
+                    rand.getrandbits(8)
+                    for _ in range(shape["binary_size"])))))
+        else:
+            file_path = rand.choice(paths)
+            stream.append(b"M 100644 inline " + file_path.encode("ascii") +
+                          b"\n")
+            stream.append(_blob(_content(rand)))
+    for i in range(shape["branches"]):
+        stream.append("reset refs/heads/branch{0}\nfrom :{1}\n\n".format(
+            i, rand.randint(1, commits)).encode("ascii"))
+
+    process = Popen(["git", "fast-import", "--quiet"], stdin=PIPE,
+                    cwd=repository, env=GIT_ENV)
+    process.communicate(b"".join(stream))
+    git(repository, "checkout", "-q", "-f", "master")
+
+    # Working tree changes
+    for file_path in rand.sample(paths,
+                                 int(len(paths) * shape["modified_ratio"])):
+        full_path = path.join(repository, file_path)
+        if rand.random() < 0.2:
+            git(repository, "rm", "-q", file_path)
+        else:
+            with open(full_path, "ab") as obj:
+                obj.write(_content(rand, 2))
+    for i in range(int(len(paths) * shape["untracked_ratio"])):
+        with open(path.join(repository, "untracked{0}.txt".format(i)),
+                  "wb") as obj:
+            obj.write(_content(rand, 2))
+    if shape["large_diff_size"]:
+        with open(path.join(repository, large_path), "wb") as obj:
+            obj.write(_content(rand, shape["large_diff_size"] // 32))
+    if shape["binary_size"]:
+        with open(path.join(repository, binary_path), "wb") as obj:
+            obj.write(bytes(bytearray(rand.getrandbits(8)
+                                      for _ in range(shape["binary_size"]))))
+    return repository
+
+
+def main():
+    parser = ArgumentParser(description="Generate a synthetic repository.")
+    parser.add_argument("repository", help="Path of the new repository")
+    parser.add_argument("--seed", type=int, default=0)
+    for key, value in sorted(DEFAULT_SHAPE.items()):
+        parser.add_argument("--" + key.replace("_", "-"), type=type(value),
+                            default=value)
+    args = parser.parse_args()
+    shape = dict((key, getattr(args, key)) for key in DEFAULT_SHAPE)
+    generate(args.repository, shape, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser
+from json import dump, dumps
+from os import environ, path
+from platform import python_version
+from shutil import rmtree
+from subprocess import check_output
+from sys import path as sys_path
+from tempfile import mkdtemp
+from timeit import default_timer
+
+from generate import generate
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+environ["DATA_DIR"] = path.join(ROOT, "data")
+environ["SRC_DIR"] = path.join(ROOT, "src")
+environ["WIDGETS_DIR"] = path.join(ROOT, "src", "widgets")
+environ["MODELS_DIR"] = path.join(ROOT, "src", "models")
+sys_path.insert(0, environ["SRC_DIR"])
+sys_path.insert(0, environ["MODELS_DIR"])
+
+from utils import get_uri, is_git
+from acceleration import has_builtin_fsmonitor
+from cache import repository_cache
+from discovery import discovery
+from git import Git
+from pool import stats, workers
+
+SHAPES = {
+    "small": {"files": 500, "depth": 2, "branches": 10, "commits": 50},
+    "medium": {"files": 5000, "depth": 4, "branches": 200,
+               "commits": 1000, "large_diff_size": 1024 * 1024,
+               "binary_size": 64 * 1024},
+    "large": {"files": 50000, "depth": 6, "branches": 5000,
+              "commits": 10000, "large_diff_size": 16 * 1024 * 1024,
+              "binary_size": 1024 * 1024}
+}
+
+
+def reset_caches():
+    """Make the next call pay every cost again."""
+    repository_cache.clear()
+    discovery.clear()
+    workers.close_all()
+
+
+def measure(func, repeat, cold):
+    """Return timing statistics of func in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        if cold:
+            reset_caches()
+        started = default_timer()
+        func()
+        timings.append((default_timer() - started) * 1000)
+    timings.sort()
+    return {
+        "runs": repeat,
+        "min_ms": timings[0],
+        "median_ms": timings[len(timings) // 2],
+        "max_ms": timings[-1]
+    }
+
+
+def get_model_cases(repository):
+    """Return name -> callable of every model method to time."""
+    uri = get_uri(repository)
+    git = Git(uri)
+    modified = git.get_modified()
+    first = modified[0] if modified else "file0.txt"
+    nested = path.join(repository, path.dirname(first))
+
+    def diff_set():
+        diff = git.get_diff_set()
+        for diff_file in diff.get_files():
+            diff.get_patch(diff_file.path)
+        diff.close()
+
+    return {
+        "is_git": lambda: is_git(get_uri(nested)),
+        "Git.__init__": lambda: Git(uri),
+        "get_status": git.get_status,
+        "get_modified": git.get_modified,
+        "get_branch": git.get_branch,
+        "get_project_branch": git.get_project_branch,
+        "get_project_name": git.get_project_name,
+        "get_remote_url": git.get_remote_url,
+        "get_branch_list": git.get_branch_list,
+        "get_index_summary": git.get_index_summary,
+        "get_diff": lambda: git.get_diff(first),
+        "get_stat": lambda: git.get_stat(first),
+        "DiffSet.get_files": lambda: git.get_diff_set().get_files(),
+        "DiffSet.all_patches": diff_set
+    }
+
+
+def get_status_cases(repository):
+    """Return name -> (config, callable) timing git status with the
+    untracked cache and fsmonitor turned on through the plugin settings."""
+    uri = get_uri(repository)
+    modes = {
+        "status[plain]": {},
+        "status[untracked-cache]": {"nautilus-git.untrackedCache": "true"}
+    }
+    if has_builtin_fsmonitor():
+        modes["status[fsmonitor]"] = {
+            "nautilus-git.untrackedCache": "true",
+            "nautilus-git.fsmonitor": "true"
+        }
+    return dict((name, (settings, lambda: Git(uri).get_snapshot()))
+                for name, settings in modes.items())
+
+
+def measure_status(repository, repeat, result):
+    """Time the status cases, keeping the repository config as it was."""
+    for case, (settings, func) in sorted(
+            get_status_cases(repository).items()):
+        for key, value in settings.items():
+            check_output(["git", "config", key, value], cwd=repository)
+        try:
+            # Let git write its caches to the index first, the second run
+            # starts from the index the first one refreshed
+            for _ in range(2):
+                reset_caches()
+                func()
+            result["cold"][case] = measure(func, repeat, cold=True)
+            result["warm"][case] = measure(
+                lambda: _uncached(func), repeat, cold=False)
+        finally:
+            for key in settings:
+                check_output(["git", "config", "--unset", key],
+                             cwd=repository)
+            if settings:
+                check_output(["git", "update-index", "--no-untracked-cache"],
+                             cwd=repository)
+
+
+def _uncached(func):
+    """Run func against a warm index and warm workers, but with git status
+    recomputed instead of answered from the plugin cache."""
+    repository_cache.clear()
+    return func()
+
+
+def _wait(busy):
+    """Iterate the main loop as long as busy() is true."""
+    from gi.repository import GLib
+    context = GLib.MainContext.default()
+    while busy():
+        context.iteration(True)
+
+
+def get_widget_cases(repository):
+    """Return name -> callable of the widget constructions to time.
+
+    Needs PyGObject, GTK and a display (e.g. xvfb-run); the reason is
+    returned instead when they are not available.
+    """
+    try:
+        from gi import require_version
+        require_version("Gtk", "3.0")
+        from gi.repository import Gio, Gtk
+    except (ImportError, ValueError) as error:
+        return "PyGObject unavailable: {0}".format(error)
+    if not Gtk.init_check(None)[0]:
+        return "no display available"
+    target = path.join(mkdtemp(), "nautilus-git.gresource")
+    check_output(["glib-compile-resources", "--sourcedir",
+                  environ["DATA_DIR"], "--target", target,
+                  path.join(environ["DATA_DIR"], "nautilus-git.gresource.xml")])
+    Gio.Resource._register(Gio.resource_load(target))
+    sys_path.insert(0, environ["WIDGETS_DIR"])
+    from location import NautilusLocation
+    from page import NautilusPropertyPage
+    from compare import NautilusGitCompare
+
+    uri = get_uri(repository)
+    window = Gtk.Window()
+
+    def location():
+        widget = NautilusLocation(uri, window)
+        _wait(lambda: widget._task)
+        widget.main.destroy()
+
+    def page():
+        widget = NautilusPropertyPage(uri)
+        _wait(lambda: widget._task or widget._index_task)
+        widget.main.destroy()
+
+    def compare():
+        widget = NautilusGitCompare(Git(uri))
+        _wait(lambda: any(not task.done for task in widget._tasks))
+        widget._window.destroy()
+
+    return {
+        "NautilusLocation": location,
+        "NautilusPropertyPage": page,
+        "NautilusGitCompare": compare
+    }
+
+
+def run_shape(name, shape, workdir, repeat, widgets):
+    """Generate a repository and time every case on it."""
+    repository = path.join(workdir, name)
+    started = default_timer()
+    generate(repository, shape)
+    result = {
+        "shape": shape,
+        "generate_ms": (default_timer() - started) * 1000,
+        "cold": {},
+        "warm": {}
+    }
+    cases = get_model_cases(repository)
+    if widgets:
+        widget_cases = get_widget_cases(repository)
+        if isinstance(widget_cases, dict):
+            cases.update(widget_cases)
+        else:
+            result["widgets_skipped"] = widget_cases
+    for case, func in sorted(cases.items()):
+        result["cold"][case] = measure(func, repeat, cold=True)
+        result["warm"][case] = measure(func, repeat, cold=False)
+    measure_status(repository, repeat, result)
+    result["pool"] = stats.get()
+    return result
+
+
+def get_revision():
+    """Return the commit of the benchmarked tree."""
+    try:
+        return check_output(["git", "rev-parse", "HEAD"],
+                            cwd=ROOT).decode("ascii").strip()
+    except (OSError, ValueError):
+        return None
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark nautilus-git.")
+    parser.add_argument("--shape", action="append", choices=sorted(SHAPES),
+                        help="Repository shape, may be repeated "
+                             "(default: small)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="JSON file to write the results")
+    parser.add_argument("--no-widgets", action="store_true",
+                        help="Only time the models")
+    parser.add_argument("--keep", action="store_true",
+                        help="Keep the generated repositories")
+    args = parser.parse_args()
+
+    workdir = mkdtemp(prefix="nautilus-git-benchmark-")
+    results = {
+        "revision": get_revision(),
+        "python": python_version(),
+        "git": check_output(["git", "--version"]).decode("ascii").strip(),
+        "shapes": {}
+    }
+    try:
+        for name in args.shape or ["small"]:
+            results["shapes"][name] = run_shape(name, SHAPES[name], workdir,
+                                                args.repeat,
+                                                not args.no_widgets)
+    finally:
+        workers.close_all()
+        if not args.keep:
+            rmtree(workdir)
+    if args.output:
+        with open(args.output, "w") as obj:
+            dump(results, obj, indent=2, sort_keys=True)
+    else:
+        print(dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from argparse import ArgumentParser
+from ast import Import, ImportFrom, parse
+from json import dump, dumps
+from os import environ, path
+from subprocess import PIPE, Popen
+from sys import executable
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+SOURCE_DIRS = [path.join(ROOT, "src"), path.join(ROOT, "src", "models"),
+               path.join(ROOT, "src", "widgets")]
+ENTRY_POINTS = {
+    "nautilus": path.join(ROOT, "nautilus-git", "nautilus-git.py.in"),
+    "nemo": path.join(ROOT, "nemo-git", "nemo-git.py.in")
+}
+# Imported when a widget is first shown, each in a fresh interpreter
+FIRST_USE = ["annotations", "page", "location", "compare"]
+# Modules the file manager should not pay for at startup
+HEAVY = ["GtkSource", "compare", "location", "page", "annotations", "git",
+         "watchdog", "index", "diff", "multiprocessing"]
+
+
+def get_startup_modules(entry_point):
+    """Return the project modules the entry point imports at load time."""
+    with open(entry_point) as obj:
+        tree = parse(obj.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ImportFrom):
+            names = [node.module]
+        elif isinstance(node, Import):
+            names = [alias.name for alias in node.names]
+        else:
+            continue
+        for name in names:
+            if any(path.exists(path.join(directory, name + ".py"))
+                   for directory in SOURCE_DIRS):
+                modules.append(name)
+    return modules
+
+
+def import_time(modules, preload=()):
+    """Import modules in a new interpreter with -X importtime.
+
+    Returns the cumulative microseconds of each module imported, or the
+    error when one of them couldn't be imported.
+    """
+    env = dict(environ)
+    env["SRC_DIR"] = SOURCE_DIRS[0]
+    env["MODELS_DIR"] = SOURCE_DIRS[1]
+    env["WIDGETS_DIR"] = SOURCE_DIRS[2]
+    env["DATA_DIR"] = path.join(ROOT, "data")
+    code = "import sys\n"
+    for directory in SOURCE_DIRS:
+        code += "sys.path.insert(0, {0!r})\n".format(directory)
+    for module in preload:
+        code += "import {0}\n".format(module)
+    code += "sys.stderr.write('-- measured --\\n')\n"
+    for module in modules:
+        code += "import {0}\n".format(module)
+    process = Popen([executable, "-X", "importtime", "-c", code],
+                    stdout=PIPE, stderr=PIPE, env=env)
+    _, errors = process.communicate()
+    errors = errors.decode("utf-8", "replace")
+    if process.returncode != 0:
+        return errors.strip().splitlines()[-1]
+    timings = {}
+    measured = False
+    for line in errors.splitlines():
+        if line.startswith("-- measured --"):
+            measured = True
+        elif measured and line.startswith("import time:"):
+            fields = line[len("import time:"):].split("|")
+            try:
+                timings[fields[2].strip()] = int(fields[1])
+            except (IndexError, ValueError):
+                continue
+    return timings
+
+
+def summarize(runs, modules):
+    """Return the median timings of a list of import_time results."""
+    if any(not isinstance(run, dict) for run in runs):
+        return {"error": next(run for run in runs
+                              if not isinstance(run, dict))}
+    totals = sorted(sum(run.get(module, 0) for module in modules)
+                    for run in runs)
+    loaded = set()
+    for run in runs:
+        loaded.update(run)
+    return {
+        "median_ms": totals[len(totals) // 2] / 1000.0,
+        "modules": dict((module, run_median(runs, module) / 1000.0)
+                        for module in modules),
+        "imported": len(loaded),
+        "heavy": sorted(name for name in loaded
+                        if name.split(".")[0] in HEAVY)
+    }
+
+
+def run_median(runs, module):
+    values = sorted(run.get(module, 0) for run in runs)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = ArgumentParser(description="Time the extension imports done "
+                                        "at file manager startup.")
+    parser.add_argument("--entry-point", choices=sorted(ENTRY_POINTS),
+                        default="nautilus")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="JSON file to write the results")
+    args = parser.parse_args()
+
+    # The file manager bindings aren't needed to load the project modules
+    modules = get_startup_modules(ENTRY_POINTS[args.entry_point])
+    results = {
+        "entry_point": args.entry_point,
+        "startup_modules": modules,
+        "startup": summarize([import_time(modules)
+                              for _ in range(args.repeat)], modules),
+        "first_use": {}
+    }
+    for module in FIRST_USE:
+        results["first_use"][module] = summarize(
+            [import_time([module], modules) for _ in range(args.repeat)],
+            [module])
+    if args.output:
+        with open(args.output, "w") as obj:
+            dump(results, obj, indent=2, sort_keys=True)
+    else:
+        print(dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from collections import OrderedDict
+from json import dump, load
+from os import environ, getpid, makedirs, path, remove, rename, umask
+from signal import SIGINT, SIGTERM
+import socket
+from sys import path as sys_path
+from threading import Lock, Thread
+from time import time
+
+# Try Python2 imports
+try:
+    from SocketServer import StreamRequestHandler, ThreadingUnixStreamServer
+
+# Python3 imports
+except ImportError:
+    from socketserver import StreamRequestHandler, ThreadingUnixStreamServer
+
+SRC_DIR = path.dirname(path.abspath(__file__))
+environ.setdefault("SRC_DIR", SRC_DIR)
+environ.setdefault("MODELS_DIR", path.join(SRC_DIR, "models"))
+sys_path.insert(0, environ["SRC_DIR"])
+sys_path.insert(0, environ["MODELS_DIR"])
+
+from gi.repository import GLib
+
+from utils import get_uri
+from budget import budget
+from git import Git, load_snapshot
+from service import (WAIT_TIMEOUT, client, decode, encode, get_runtime_dir,
+                     get_socket_path, is_private)
+from watchdog import subscribe, unsubscribe
+
+# Repositories watched at once, the least recently queried are dropped
+MAX_REPOSITORIES = 64
+# Seconds between two saves of the known snapshots
+SAVE_INTERVAL = 300
+# Seconds without any query after which a socket activated service exits
+IDLE_EXIT = 600
+# First file descriptor passed by systemd socket activation
+LISTEN_FDS_START = 3
+
+
+def get_state_path():
+    """Return the file the known snapshots are kept in across restarts."""
+    cache_home = environ.get("XDG_CACHE_HOME") or \
+        path.join(path.expanduser("~"), ".cache")
+    return path.join(cache_home, "nautilus-git", "snapshots.json")
+
+
+def save_state(file_path):
+    """Write the last snapshot of every repository."""
+    state = [[root, snapshot, slow_since] for root, snapshot, slow_since
+             in budget.get_results("snapshot")]
+    try:
+        directory = path.dirname(file_path)
+        if not path.isdir(directory):
+            makedirs(directory)
+        temporary = file_path + ".tmp"
+        with open(temporary, "w") as obj:
+            dump(state, obj)
+        rename(temporary, file_path)
+    except (IOError, OSError):
+        pass
+
+
+def load_state(file_path):
+    """Restore the snapshots saved by save_state.
+
+    They are only shown while the current ones are computed, as the
+    working tree may have changed since.
+    """
+    try:
+        with open(file_path) as obj:
+            state = load(obj)
+        for root, snapshot, slow_since in state:
+            if path.isdir(root):
+                budget.restore(root, "snapshot", load_snapshot(snapshot),
+                               slow_since)
+    except (IOError, OSError, ValueError, TypeError):
+        pass
+
+
+class StatusService:
+    """Status snapshots of every repository queried by the clients.
+
+    Each repository is watched from the first query on, its snapshot is
+    then served from the repository cache until it changes.
+    """
+
+    def __init__(self):
+        self.last_query = time()
+        self._lock = Lock()
+        # root -> [Git, watchdog token]
+        self._repositories = OrderedDict()
+
+    def _get_git(self, root):
+        with self._lock:
+            self.last_query = time()
+            repository = self._repositories.pop(root, None)
+            if repository is None:
+                repository = [Git(get_uri(root)), None]
+                # Monitors belong to the main loop thread
+                GLib.idle_add(self._watch, root, repository)
+            self._repositories[root] = repository
+            while len(self._repositories) > MAX_REPOSITORIES:
+                _, (_, token) = self._repositories.popitem(last=False)
+                if token is not None:
+                    GLib.idle_add(unsubscribe, token)
+            return repository[0]
+
+    def _watch(self, root, repository):
+        with self._lock:
+            if self._repositories.get(root) is repository:
+                repository[1] = subscribe(repository[0].dir,
+                                          lambda watchdog: None)
+        return False
+
+    def snapshot(self, root, wait=False):
+        """Return the status snapshot of a repository.
+
+        With wait, a git status running past its budget is waited for.
+        """
+        git = self._get_git(root)
+        if wait:
+            budget.wait(git.dir, "snapshot", WAIT_TIMEOUT)
+        return git.get_snapshot()
+
+    def handle(self, request):
+        """Answer a decoded request."""
+        method = request.pop("method", None)
+        if method == "snapshot":
+            return {"result": self.snapshot(**request)}
+        if method == "ping":
+            return {"result": getpid()}
+        return {"error": "Unknown method {0}".format(method)}
+
+
+class RequestHandler(StreamRequestHandler):
+    """Answer the requests of a client until it disconnects."""
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            try:
+                answer = self.server.service.handle(decode(line))
+            except Exception as error:
+                answer = {"error": str(error)}
+            self.wfile.write(encode(answer))
+            self.wfile.flush()
+
+
+class Server(ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, service, listening_socket=None):
+        self.service = service
+        self.activated = listening_socket is not None
+        if self.activated:
+            ThreadingUnixStreamServer.__init__(self, None, RequestHandler,
+                                               bind_and_activate=False)
+            self.socket.close()
+            self.socket = listening_socket
+        else:
+            socket_path = get_socket_path()
+            _remove_stale_socket(socket_path)
+            ThreadingUnixStreamServer.__init__(self, socket_path,
+                                               RequestHandler)
+
+
+def _remove_stale_socket(socket_path):
+    """Remove the socket of a dead service, exit if one is running."""
+    runtime_dir = get_runtime_dir()
+    if not path.lexists(runtime_dir):
+        makedirs(runtime_dir, 0o700)
+    if not is_private(runtime_dir):
+        raise SystemExit("{0} must be a directory only accessible to its "
+                         "owner".format(runtime_dir))
+    if not path.exists(socket_path):
+        return
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except (socket.error, IOError, OSError):
+        remove(socket_path)
+        return
+    finally:
+        connection.close()
+    raise SystemExit("The status service is already running")
+
+
+def get_activation_socket():
+    """Return the socket passed by systemd, None when started directly."""
+    if environ.get("LISTEN_PID") != str(getpid()) or \
+            int(environ.get("LISTEN_FDS", "0")) < 1:
+        return None
+    return socket.fromfd(LISTEN_FDS_START, socket.AF_UNIX,
+                         socket.SOCK_STREAM)
+
+
+def main():
+    """Run the status service until SIGTERM or SIGINT."""
+    # This process answers the clients, it isn't one
+    client.enabled = False
+    umask(0o077)
+    state_path = get_state_path()
+    load_state(state_path)
+    service = StatusService()
+    server = Server(service, get_activation_socket())
+    thread = Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    loop = GLib.MainLoop()
+
+    def save():
+        save_state(state_path)
+        return True
+
+    def exit_if_idle():
+        # systemd starts the service again on the next connection
+        if time() - service.last_query > IDLE_EXIT:
+            loop.quit()
+            return False
+        return True
+
+    GLib.timeout_add_seconds(SAVE_INTERVAL, save)
+    if server.activated:
+        GLib.timeout_add_seconds(IDLE_EXIT // 10, exit_if_idle)
+    for signal_number in (SIGINT, SIGTERM):
+        GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal_number, loop.quit)
+    loop.run()
+    server.shutdown()
+    save_state(state_path)
+    if not server.activated:
+        remove(server.server_address)
+
+
+if __name__ == "__main__":
+    main()
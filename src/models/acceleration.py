@@ -0,0 +1,89 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from collections import namedtuple
+from threading import Lock
+
+from config import TRUE_VALUES, get_config
+from pool import workers
+
+BUILD_OPTIONS_COMMAND = ["git", "version", "--build-options"]
+FALSE_VALUES = ["false", "no", "off", "0", ""]
+
+
+class Acceleration(namedtuple("Acceleration", ["untracked_cache",
+                                               "fsmonitor", "options"])):
+    """How git status avoids walking the whole working tree.
+
+    options are the `-c` overrides turning on what the user opted in for
+    with `git config nautilus-git.untrackedCache/fsmonitor true`.
+    """
+    __slots__ = ()
+
+    @property
+    def enabled(self):
+        """Whether git keeps a cache in the index to speed up status.
+
+        The index has to be written by status for the cache to stay
+        warm, so --no-optional-locks can't be used then.
+        """
+        return self.untracked_cache or self.fsmonitor
+
+
+_lock = Lock()
+_builtin_fsmonitor = []
+
+
+def has_builtin_fsmonitor():
+    """Whether git comes with its fsmonitor daemon on this platform."""
+    with _lock:
+        if not _builtin_fsmonitor:
+            try:
+                output = workers.run(BUILD_OPTIONS_COMMAND, None)
+            except OSError:
+                output = b""
+            _builtin_fsmonitor.append(b"fsmonitor--daemon" in output)
+        return _builtin_fsmonitor[0]
+
+
+def get_acceleration(repository):
+    """Return the Acceleration git status of a repository can use."""
+    config = get_config(repository)
+    options = []
+
+    untracked_cache = config.get_bool("core.untrackedCache")
+    if not untracked_cache and config.get_bool("nautilus-git.untrackedCache"):
+        options.extend(["-c", "core.untrackedCache=true"])
+        untracked_cache = True
+
+    # Either a boolean for the daemon, or the path of a hook
+    values = config.get_all("core.fsmonitor")
+    value = values[-1] if values else "false"
+    if value is None or value.lower() in TRUE_VALUES:
+        fsmonitor = has_builtin_fsmonitor()
+    elif value.lower() in FALSE_VALUES:
+        fsmonitor = False
+    else:
+        fsmonitor = True
+    if (not fsmonitor and config.get_bool("nautilus-git.fsmonitor") and
+            has_builtin_fsmonitor()):
+        options.extend(["-c", "core.fsmonitor=true"])
+        fsmonitor = True
+    return Acceleration(untracked_cache, fsmonitor, options)
+
@@ -0,0 +1,96 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from collections import OrderedDict
+from os import environ
+from sys import path as sys_path
+
+sys_path.insert(0, environ["SRC_DIR"])
+from utils import get_uri
+from git import MODE_BRANCH
+from repository import acquire, release
+from status_index import StatusIndex
+
+# Number of repositories whose status index is kept around
+MAX_REPOSITORIES = 16
+
+
+class Annotations:
+    """Status indexes of the repositories the file manager shows.
+
+    Indexes are computed off the main thread from a single status call
+    per repository and recomputed when the repository changes.
+    on_changed is then called with the paths whose status changed, for
+    the file manager to refresh them.
+    """
+
+    def __init__(self, on_changed):
+        self._on_changed = on_changed
+        # root -> [StatusIndex or None, (model, handler), pending request]
+        self._repositories = OrderedDict()
+
+    def get(self, repository):
+        """Return the StatusIndex of a repository, None until computed."""
+        state = self._repositories.pop(repository.root, None)
+        if state is None:
+            state = [None, acquire(get_uri(repository.root), self._refresh),
+                     None]
+            self._evict()
+            self._repositories[repository.root] = state
+            self._update(repository.root, state)
+        else:
+            self._repositories[repository.root] = state
+        return state[0]
+
+    def _evict(self):
+        while len(self._repositories) >= MAX_REPOSITORIES:
+            _, state = self._repositories.popitem(last=False)
+            if state[2]:
+                state[2].cancel()
+            release(*state[1])
+
+    def _update(self, root, state):
+        """Compute the index of a repository in the background."""
+        if state[2]:
+            # Restarted by the repository model on changes
+            return
+        model = state[1][0]
+
+        def compute():
+            snapshot = model.git.get_snapshot()
+            if snapshot.mode == MODE_BRANCH:
+                # Nothing known yet, the watchdog fires once it is
+                return None
+            return StatusIndex(root, snapshot)
+
+        def done(index):
+            state[2] = None
+            if index is None:
+                return
+            previous, state[0] = state[0], index
+            self._on_changed(root, index.changed_paths(previous))
+
+        def failed(error):
+            state[2] = None
+        state[2] = model.request("status_index", compute, done, failed)
+
+    def _refresh(self, model):
+        state = self._repositories.get(model.root)
+        if state is not None:
+            self._update(model.root, state)
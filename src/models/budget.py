@@ -0,0 +1,251 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from collections import OrderedDict, namedtuple
+from os import environ, path
+from sys import path as sys_path
+from threading import Event, Lock, Thread
+from time import time
+
+sys_path.insert(0, environ["SRC_DIR"])
+from utils import (Cancellable, get_current_cancellable,
+                   set_current_cancellable)
+from config import get_config
+from index import get_entry_count
+
+# Thresholds, overridable with `git config nautilus-git.<key>`.
+# statusTimeout: milliseconds a status query may block before falling
+# back to a partial result, the query still finishes in the background.
+# largeIndexEntries: index size from which untracked files aren't listed.
+# untrackedFiles: false never lists untracked files.
+DEFAULT_STATUS_TIMEOUT = 1000
+DEFAULT_LARGE_INDEX_ENTRIES = 100000
+# Number of repositories whose last snapshot is remembered
+MAX_SNAPSHOTS = 64
+# Seconds a repository is considered slow after exceeding its budget,
+# e.g. a cold disk cache, it's then measured again
+SLOW_EXPIRY = 1800
+
+Limits = namedtuple("Limits", ["timeout", "large_index_entries",
+                               "untracked_files"])
+
+
+class BudgetExceeded(Exception):
+    """A computation didn't finish in time, fallback is shown meanwhile."""
+
+    def __init__(self, fallback):
+        Exception.__init__(self)
+        self.fallback = fallback
+
+
+def get_limits(repository):
+    """Return the Limits of a repository, read from its git config."""
+    config = get_config(repository)
+    return Limits(
+        config.get_int("nautilus-git.statusTimeout",
+                       DEFAULT_STATUS_TIMEOUT) / 1000.0,
+        config.get_int("nautilus-git.largeIndexEntries",
+                       DEFAULT_LARGE_INDEX_ENTRIES),
+        config.get_bool("nautilus-git.untrackedFiles", True))
+
+
+def is_large(repository, limits=None):
+    """Whether listing untracked files is likely to be too slow.
+
+    Big indexes, sparse checkouts and partial clones are all signs of a
+    working tree too large to be walked entirely.
+    """
+    limits = limits or get_limits(repository)
+    if not limits.untracked_files:
+        return True
+    config = get_config(repository)
+    if (config.get_bool("core.sparseCheckout") or
+            config.get("extensions.partialClone") or
+            path.exists(path.join(repository.git_dir, "info",
+                                  "sparse-checkout"))):
+        return True
+    return get_entry_count(repository) >= limits.large_index_entries
+
+
+class Computation:
+    """A function running in its own thread, callers may stop waiting.
+
+    Its commands are killed once every caller waiting for it got
+    cancelled, unless one already stopped waiting for a late result.
+    """
+
+    def __init__(self, func, on_done):
+        self.started = time()
+        self.duration = None
+        self.result = None
+        self.error = None
+        # Whether a caller stopped waiting and showed a partial result
+        self.exceeded = False
+        # Cancellables of the callers waiting
+        self.waiting = []
+        self.cancellable = Cancellable()
+        self._func = func
+        self._on_done = on_done
+        self._event = Event()
+        thread = Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+
+    def _run(self):
+        set_current_cancellable(self.cancellable)
+        try:
+            self.result = self._func()
+        except Exception as error:
+            self.error = error
+        self.duration = time() - self.started
+        self._on_done(self)
+        self._event.set()
+
+    def wait(self, timeout):
+        """Whether the computation finished within timeout seconds."""
+        return self._event.wait(timeout)
+
+
+class Budget:
+    """Run per repository computations within a time budget.
+
+    A computation exceeding its budget raises BudgetExceeded with a
+    partial result and keeps running: the listeners are called with its
+    result once available. A single computation per repository and key
+    runs at once.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._running = {}
+        self._last = OrderedDict()
+        # (root, key) -> time the computation exceeded its budget
+        self._slow = {}
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call callback(repository, key, result) for late results."""
+        self._listeners.append(callback)
+
+    def is_slow(self, root, key):
+        """Whether the computation exceeded its budget lately."""
+        with self._lock:
+            return self._get_slow_since(root, key) is not None
+
+    def _get_slow_since(self, root, key):
+        since = self._slow.get((root, key))
+        if since is not None and time() - since > SLOW_EXPIRY:
+            del self._slow[(root, key)]
+            return None
+        return since
+
+    def get_last(self, root, key):
+        """Return the last result computed, None if there's none."""
+        with self._lock:
+            return self._last.get((root, key))
+
+    def get_results(self, key):
+        """Return (root, last result, slow since) of every repository.
+
+        slow since is the time the computation exceeded its budget,
+        None if it didn't lately.
+        """
+        with self._lock:
+            return [(root, result, self._get_slow_since(root, key))
+                    for (root, key_), result in list(self._last.items())
+                    if key_ == key]
+
+    def restore(self, root, key, result, slow_since):
+        """Remember a result computed by an earlier process."""
+        with self._lock:
+            self._last.setdefault((root, key), result)
+            if slow_since is not None and (root, key) not in self._slow:
+                self._slow[(root, key)] = slow_since
+
+    def wait(self, root, key, timeout=None):
+        """Wait for the running computation of a repository, if any."""
+        with self._lock:
+            computation = self._running.get((root, key))
+        if computation is not None:
+            computation.wait(timeout)
+
+    def notify(self, repository, key, result):
+        """Call the listeners with a late result."""
+        for listener in self._listeners:
+            listener(repository, key, result)
+
+    def run(self, repository, key, func, timeout, partial):
+        """Return func(), or raise BudgetExceeded after timeout seconds.
+
+        partial(last) builds the result shown meanwhile from the last
+        known one, None if there's none.
+        """
+        root = repository.root
+        # Callers which can't be cancelled keep the computation going
+        cancellable = get_current_cancellable() or Cancellable()
+        with self._lock:
+            computation = self._running.get((root, key))
+            if computation is None:
+                computation = Computation(
+                    func, lambda done: self._on_done(repository, key, done))
+                self._running[(root, key)] = computation
+            computation.waiting.append(cancellable)
+
+        def on_cancelled():
+            with self._lock:
+                stop = not computation.exceeded and all(
+                    waiter.is_cancelled() for waiter in computation.waiting)
+            if stop:
+                computation.cancellable.cancel()
+        cancellable.connect(on_cancelled)
+        try:
+            finished = computation.wait(timeout)
+        finally:
+            cancellable.disconnect(on_cancelled)
+            with self._lock:
+                computation.waiting.remove(cancellable)
+        if not finished:
+            with self._lock:
+                # It may have finished since, but then it's in time
+                exceeded = (root, key) in self._running
+                computation.exceeded = exceeded
+            if exceeded:
+                raise BudgetExceeded(partial(self.get_last(root, key)))
+        if computation.error is not None:
+            raise computation.error
+        return computation.result
+
+    def _on_done(self, repository, key, computation):
+        root = repository.root
+        with self._lock:
+            self._running.pop((root, key), None)
+            if computation.error is not None:
+                return
+            self._last.pop((root, key), None)
+            self._last[(root, key)] = computation.result
+            while len(self._last) > MAX_SNAPSHOTS:
+                self._last.popitem(last=False)
+            exceeded = computation.exceeded
+            if exceeded:
+                self._slow[(root, key)] = time()
+        if exceeded:
+            self.notify(repository, key, computation.result)
+
+
+budget = Budget()
@@ -0,0 +1,131 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from collections import OrderedDict
+from os import path, stat
+from threading import RLock
+from time import time
+
+# Files whose change means the cached values of a repository are outdated,
+# the first ones are per worktree, the others shared by all worktrees.
+# Git updates loose refs by renaming a lock file, which touches the
+# refs/heads directory of top level branches; nested ones are left to the
+# watchdog.
+STAMP_FILES = ["HEAD", "index"]
+COMMON_STAMP_FILES = ["packed-refs", "config", "refs/heads"]
+
+
+def get_stamp(repository):
+    """Return a cheap fingerprint of the repository metadata."""
+    files = [path.join(repository.git_dir, filename)
+             for filename in STAMP_FILES]
+    files.extend(path.join(repository.common_dir, filename)
+                 for filename in COMMON_STAMP_FILES)
+    stamp = []
+    for file_path in files:
+        try:
+            fstat = stat(file_path)
+            stamp.append((fstat.st_mtime, fstat.st_size, fstat.st_ino))
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+class CacheEntry:
+    """Values computed for one repository at a given stamp."""
+    __slots__ = ("stamp", "created", "values")
+
+    def __init__(self, stamp):
+        self.stamp = stamp
+        self.created = time()
+        self.values = {}
+
+
+class RepositoryCache:
+    """Process wide cache of computed values keyed by repository root.
+
+    An entry is dropped as soon as the stamp of its repository changes.
+    Values depending on the working tree (volatile ones) are also
+    recomputed after max_age seconds, as editing a file does not touch
+    anything under .git.
+    """
+
+    def __init__(self, max_size=64, max_age=5):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = RLock()
+
+    def _get_entry(self, repository):
+        """Return a valid entry for a repository, creating one if needed."""
+        root = repository.root
+        stamp = get_stamp(repository)
+        entry = self._entries.pop(root, None)
+        if entry is None or entry.stamp != stamp:
+            entry = CacheEntry(stamp)
+        # Re-insert to mark the entry as the most recently used one
+        self._entries[root] = entry
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return entry
+
+    def get(self, repository, key, compute, volatile=False):
+        """Return the cached value of key, calling compute on a miss."""
+        with self._lock:
+            entry = self._get_entry(repository)
+            if key in entry.values:
+                created, value = entry.values[key]
+                if not volatile or time() - created < self.max_age:
+                    self.hits += 1
+                    return value
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            entry.values[key] = (time(), value)
+        return value
+
+    def set(self, repository, key, value):
+        """Store a value computed outside of get."""
+        with self._lock:
+            self._get_entry(repository).values[key] = (time(), value)
+
+    def invalidate(self, root):
+        """Forget everything known about a repository."""
+        with self._lock:
+            self._entries.pop(root, None)
+
+    def clear(self):
+        """Forget every repository."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return a dict with the cache counters."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'max_size': self.max_size
+            }
+
+
+repository_cache = RepositoryCache()
@@ -0,0 +1,103 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+import re
+from os import environ, read
+from subprocess import PIPE, STDOUT, Popen
+from sys import path as sys_path
+from threading import Lock
+from time import time
+
+sys_path.insert(0, environ["SRC_DIR"])
+import tracing
+
+# e.g. "Updating files:  45% (450/1000)", terminated by \r until done
+PROGRESS = re.compile(r"^(?P<phase>[^:]+):\s+(?P<percent>\d+)% "
+                      r"\((?P<done>\d+)/(?P<total>\d+)\)")
+# e.g. "M\tsrc/file.py", printed for each file with local changes
+LOCAL_CHANGE = re.compile(r"^[ADMT]\t")
+READ_SIZE = 4096
+
+_locks = {}
+_locks_lock = Lock()
+
+
+def get_lock(root):
+    """Return the lock serializing the operations writing to a repository."""
+    with _locks_lock:
+        lock = _locks.get(root)
+        if lock is None:
+            lock = _locks[root] = Lock()
+        return lock
+
+
+def parse_progress(line):
+    """Return (phase, fraction) of a progress line, None for other lines."""
+    match = PROGRESS.match(line)
+    if match is None:
+        return None
+    total = int(match.group("total"))
+    fraction = int(match.group("done")) / float(total) if total else 1.0
+    return match.group("phase"), fraction
+
+
+def checkout(root, branch, create=False, on_progress=None):
+    """Checkout a branch, creating it if asked, reporting the progress.
+
+    on_progress is called from the calling thread with the phase and
+    the done fraction, as git reports them. Operations on the same
+    repository run one after the other. Return None on success, the
+    error reported by git otherwise.
+    """
+    cmd = ["git", "checkout", "--progress"]
+    if create:
+        cmd.append("-b")
+    # Names starting with - are rejected by Git.check_branch_name
+    cmd.append(branch)
+    with get_lock(root):
+        started = time()
+        # A single pipe, git would block on the one left unread
+        process = Popen(cmd, stdout=PIPE, stderr=STDOUT, cwd=root)
+        messages = []
+        last = None
+        buffer = b""
+        while True:
+            data = read(process.stdout.fileno(), READ_SIZE)
+            if not data:
+                break
+            # Progress lines are rewritten in place with \r
+            lines = re.split(b"[\r\n]", buffer + data)
+            buffer = lines.pop()
+            for line in lines:
+                line = line.decode("utf-8", "replace")
+                progress = parse_progress(line)
+                if progress is None:
+                    if line.strip() and not LOCAL_CHANGE.match(line):
+                        messages.append(line)
+                elif progress != last and on_progress:
+                    last = progress
+                    on_progress(*progress)
+        if buffer.strip():
+            messages.append(buffer.decode("utf-8", "replace"))
+        process.stdout.close()
+        returncode = process.wait()
+        tracing.record(cmd, root, time() - started, 0, returncode)
+    if returncode:
+        return "\n".join(messages) or "git checkout failed"
+    return None
@@ -0,0 +1,324 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from os import environ, path, stat
+from re import compile as re_compile, escape, IGNORECASE
+from threading import Lock
+
+from refs import get_head
+
+# Maximum depth of nested include directives, as git does.
+MAX_INCLUDE_DEPTH = 10
+ESCAPES = {"n": "\n", "t": "\t", "b": "\b", "\\": "\\", '"': '"'}
+TRUE_VALUES = ["true", "yes", "on", "1"]
+
+
+def _stamp(file_path):
+    try:
+        fstat = stat(file_path)
+        return fstat.st_mtime, fstat.st_size, fstat.st_ino
+    except OSError:
+        return None
+
+
+def _parse_value(raw):
+    """Unquote and unescape a config value, dropping trailing comments."""
+    value = []
+    quoted = False
+    pending_space = ""
+    i = 0
+    while i < len(raw):
+        char = raw[i]
+        i += 1
+        if char == '"':
+            quoted = not quoted
+        elif char == "\\" and i < len(raw):
+            value.append(pending_space + ESCAPES.get(raw[i], raw[i]))
+            pending_space = ""
+            i += 1
+        elif char in ";#" and not quoted:
+            break
+        elif char.isspace() and not quoted:
+            if value:
+                # Git turns each whitespace character into a space
+                pending_space += " "
+        else:
+            value.append(pending_space + char)
+            pending_space = ""
+    return "".join(value)
+
+
+def parse_config(content):
+    """Parse the content of a config file into a list of (key, value).
+
+    Keys are in the canonical section.subsection.name form, section and
+    name being lowercased. A key without a value has the value None.
+    """
+    entries = []
+    section = None
+    lines = content.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        i += 1
+        # Line continuations, the whitespace of the next line is kept
+        while line.endswith("\\") and i < len(lines):
+            line = line[:-1] + lines[i]
+            i += 1
+        if not line or line[0] in ";#":
+            continue
+        if line.startswith("["):
+            end = line.find("]")
+            if end == -1:
+                continue
+            header = line[1:end].strip()
+            if '"' in header:
+                name, subsection = header.split('"', 1)
+                subsection = subsection.rsplit('"', 1)[0]
+                subsection = subsection.replace('\\"', '"')
+                subsection = subsection.replace("\\\\", "\\")
+                section = name.strip().lower() + "." + subsection
+            elif "." in header:
+                # Deprecated [section.subsection] syntax
+                name, subsection = header.split(".", 1)
+                section = name.lower() + "." + subsection.lower()
+            else:
+                section = header.lower()
+            line = line[end + 1:].strip()
+            if not line or line[0] in ";#":
+                continue
+        if section is None:
+            continue
+        if "=" in line:
+            name, raw = line.split("=", 1)
+            value = _parse_value(raw.strip())
+        else:
+            name, value = line.split()[0], None
+        entries.append((section + "." + name.strip().lower(), value))
+    return entries
+
+
+def _glob_to_regex(pattern, ignore_case=False):
+    """Translate a wildmatch pattern (with ** support) into a regex."""
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            regex += "/.*"
+            i += 3
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        else:
+            regex += escape(pattern[i])
+            i += 1
+    return re_compile(regex + "$", IGNORECASE if ignore_case else 0)
+
+
+def _expand_path(file_path, base_dir):
+    """Resolve a path found in a config file."""
+    file_path = path.expanduser(file_path)
+    if not path.isabs(file_path):
+        file_path = path.join(base_dir, file_path)
+    return path.normpath(file_path)
+
+
+class ConfigFileCache:
+    """Parsed config files, reparsed only when they change on disk."""
+
+    def __init__(self):
+        self._files = {}
+        self._lock = Lock()
+
+    def get(self, file_path):
+        """Return the entries of a config file and its stamp."""
+        stamp = _stamp(file_path)
+        with self._lock:
+            cached = self._files.get(file_path)
+            if cached is not None and cached[0] == stamp:
+                return cached
+        entries = []
+        if stamp is not None:
+            try:
+                with open(file_path, 'r') as obj:
+                    entries = parse_config(obj.read())
+            except (IOError, OSError, UnicodeDecodeError):
+                entries = []
+        with self._lock:
+            self._files[file_path] = (stamp, entries)
+        return stamp, entries
+
+
+config_files = ConfigFileCache()
+
+
+class GitConfig:
+    """The configuration of a repository, as seen by git."""
+
+    def __init__(self, repository):
+        self._repository = repository
+        self._values = {}
+        # file path -> stamp of every file read, included ones too
+        self.stamps = {}
+        self._load()
+
+    @staticmethod
+    def get_global_files():
+        """Return the system and global config files, in order."""
+        files = []
+        if not environ.get("GIT_CONFIG_NOSYSTEM"):
+            files.append(environ.get("GIT_CONFIG_SYSTEM", "/etc/gitconfig"))
+        if "GIT_CONFIG_GLOBAL" in environ:
+            files.append(environ["GIT_CONFIG_GLOBAL"])
+        else:
+            xdg_config = environ.get("XDG_CONFIG_HOME",
+                                     path.expanduser("~/.config"))
+            files.append(path.join(xdg_config, "git", "config"))
+            files.append(path.expanduser("~/.gitconfig"))
+        return files
+
+    def _load(self):
+        for file_path in self.get_global_files():
+            self._read(file_path, 0)
+        if self._repository:
+            self._read(path.join(self._repository.common_dir, "config"), 0)
+            if self.get_bool("extensions.worktreeconfig"):
+                self._read(path.join(self._repository.git_dir,
+                                     "config.worktree"), 0)
+
+    def _read(self, file_path, depth):
+        if depth > MAX_INCLUDE_DEPTH:
+            return
+        stamp, entries = config_files.get(file_path)
+        self.stamps[file_path] = stamp
+        for key, value in entries:
+            self._values.setdefault(key, []).append(value)
+            if value is None or not key.endswith(".path"):
+                continue
+            if key == "include.path":
+                include = True
+            elif key.startswith("includeif."):
+                include = self._check_condition(key[len("includeif."):-5],
+                                                file_path)
+            else:
+                include = False
+            if include:
+                self._read(_expand_path(value, path.dirname(file_path)),
+                           depth + 1)
+
+    def _check_condition(self, condition, file_path):
+        """Whether an includeIf condition matches this repository."""
+        if not self._repository:
+            return False
+        if condition.startswith(("gitdir:", "gitdir/i:")):
+            keyword, pattern = condition.split(":", 1)
+            if pattern.startswith("./"):
+                pattern = path.join(path.dirname(file_path), pattern[2:])
+            pattern = path.expanduser(pattern)
+            if not pattern.startswith("/"):
+                pattern = "**/" + pattern
+            if pattern.endswith("/"):
+                pattern += "**"
+            regex = _glob_to_regex(pattern, keyword == "gitdir/i")
+            git_dir = self._repository.git_dir
+            return bool(regex.match(git_dir) or
+                        regex.match(path.realpath(git_dir)))
+        if condition.startswith("onbranch:"):
+            pattern = condition[len("onbranch:"):]
+            if pattern.endswith("/"):
+                pattern += "**"
+            # The included file depends on the branch checked out
+            head_path = path.join(self._repository.git_dir, "HEAD")
+            self.stamps.setdefault(head_path, _stamp(head_path))
+            head = get_head(self._repository)
+            if head is None or not head.startswith("refs/heads/"):
+                return False
+            regex = _glob_to_regex(pattern)
+            return bool(regex.match(head[len("refs/heads/"):]))
+        return False
+
+    def is_valid(self):
+        """Whether no file read for this config changed since."""
+        for file_path, stamp in self.stamps.items():
+            if _stamp(file_path) != stamp:
+                return False
+        return True
+
+    def get(self, key, default=None):
+        """Return the last value of key."""
+        values = self.get_all(key)
+        if values:
+            return values[-1]
+        return default
+
+    def get_all(self, key):
+        """Return every value of key, in order."""
+        section, _, name = key.rpartition(".")
+        if "." in section:
+            # Only the section part is case insensitive
+            main, subsection = section.split(".", 1)
+            section = main.lower() + "." + subsection
+        else:
+            section = section.lower()
+        return self._values.get(section + "." + name.lower(), [])
+
+    def get_bool(self, key, default=False):
+        """Return the boolean value of key."""
+        values = self.get_all(key)
+        if not values:
+            return default
+        # A key without "= value" is true
+        if values[-1] is None:
+            return True
+        return values[-1].lower() in TRUE_VALUES
+
+    def get_int(self, key, default=0):
+        """Return the integer value of key, with k/m/g suffixes."""
+        value = self.get(key)
+        if not value:
+            return default
+        units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+        try:
+            if value[-1].lower() in units:
+                return int(value[:-1]) * units[value[-1].lower()]
+            return int(value)
+        except ValueError:
+            return default
+
+
+_configs = {}
+_configs_lock = Lock()
+
+
+def get_config(repository):
+    """Return the GitConfig of a repository, reparsing only changed files."""
+    key = repository.git_dir if repository else None
+    with _configs_lock:
+        config = _configs.get(key)
+    if config is None or not config.is_valid():
+        config = GitConfig(repository)
+        with _configs_lock:
+            _configs[key] = config
+    return config
@@ -0,0 +1,536 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from codecs import getincrementaldecoder
+from collections import OrderedDict, namedtuple
+from os import devnull, environ, lstat, path
+from subprocess import PIPE, Popen
+from sys import path as sys_path
+from tempfile import TemporaryFile
+from threading import Condition, RLock, Thread
+from time import time
+
+sys_path.insert(0, environ["SRC_DIR"])
+import tracing
+from utils import Cancelled, get_current_cancellable
+from index import read_index
+from pool import workers
+
+# Object id of the empty tree, the base of repositories without commits
+EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+# Options shared by the numstat and patch passes so both list the files
+# in the same order.
+DIFF_OPTIONS = ["--no-color", "--no-ext-diff", "-M"]
+# Explicit prefixes, the paths of the headers are parsed back
+PATCH_OPTIONS = DIFF_OPTIONS + ["--unified=0", "--src-prefix=a/",
+                                "--dst-prefix=b/"]
+HUNK_PREFIXES = ("@@", "Binary files", "GIT binary patch")
+HUNK_PREFIXES_RAW = tuple(prefix.encode("ascii")
+                          for prefix in HUNK_PREFIXES)
+# Escapes of the paths git quotes, besides octal bytes
+QUOTE_ESCAPES = {b"a": b"\a", b"b": b"\b", b"t": b"\t", b"n": b"\n",
+                 b"v": b"\v", b"f": b"\f", b"r": b"\r", b'"': b'"',
+                 b"\\": b"\\"}
+READ_SIZE = 65536
+# Memory used by the cached patches, and the largest patch cached
+MAX_CACHE_SIZE = 32 * 1024 * 1024
+MAX_CACHED_PATCH_SIZE = 1024 * 1024
+# Number of changed files whose patch is computed ahead of time
+PREFETCH_FILES = 20
+
+# One changed file: added/removed are None for binary files and orig_path
+# is only set for renames.
+DiffFile = namedtuple("DiffFile",
+                      ["path", "orig_path", "added", "removed"])
+
+
+def parse_numstat(output):
+    """Parse the output of `git diff --numstat -z` into DiffFiles."""
+    files = []
+    fields = output.decode("utf-8", "replace").split("\0")
+    i = 0
+    while i < len(fields):
+        record = fields[i]
+        i += 1
+        if not record:
+            continue
+        added, removed, file_path = record.split("\t", 2)
+        orig_path = None
+        if not file_path:
+            # Renames: the paths follow as separate fields
+            orig_path, file_path = fields[i], fields[i + 1]
+            i += 2
+        if added == "-":
+            added = removed = None
+        else:
+            added, removed = int(added), int(removed)
+        files.append(DiffFile(file_path, orig_path, added, removed))
+    return files
+
+
+def unquote_path(raw):
+    """Return the path of a header, unquoting it the way git quotes it.
+
+    Paths with special characters are written between double quotes,
+    with C escapes and octal bytes.
+    """
+    if not raw.startswith(b'"'):
+        return raw.decode("utf-8", "replace")
+    unquoted = bytearray()
+    i = 1
+    while i < len(raw) and raw[i:i + 1] != b'"':
+        char = raw[i:i + 1]
+        i += 1
+        if char == b"\\":
+            if raw[i:i + 3].isdigit():
+                unquoted.append(int(raw[i:i + 3], 8))
+                i += 3
+                continue
+            char = QUOTE_ESCAPES.get(raw[i:i + 1], raw[i:i + 1])
+            i += 1
+        unquoted.extend(char)
+    return bytes(unquoted).decode("utf-8", "replace")
+
+
+def get_header_path(header):
+    """Return the path a patch is about, from its header lines (bytes).
+
+    The new path is taken from the rename or +++ lines, the old one for
+    deletions, and from the diff --git line when the patch has none of
+    them (binary files, mode changes).
+    """
+    deleted = None
+    for line in header:
+        line = line.rstrip(b"\n")
+        if line.startswith((b"rename to ", b"copy to ")):
+            return unquote_path(line.split(b" ", 2)[2])
+        if line.startswith((b"--- ", b"+++ ")):
+            # Unquoted paths with spaces are followed by a tab, for patch
+            raw = line[4:]
+            if not raw.startswith(b'"'):
+                raw = raw.rstrip(b"\t")
+            if raw == b"/dev/null":
+                continue
+            if line.startswith(b"+++ "):
+                return unquote_path(raw)[2:]
+            deleted = unquote_path(raw)[2:]
+    if deleted is not None:
+        return deleted
+    paths = header[0].rstrip(b"\n")[len(b"diff --git "):]
+    if paths.startswith(b'"'):
+        return unquote_path(paths)[2:]
+    # "a/<path> b/<path>", both the same without a rename
+    length = (len(paths) - len(b"a/ b/")) // 2
+    return paths[2:2 + length].decode("utf-8", "replace")
+
+
+def format_stat(diff_file):
+    """Return the added/removed lines of a DiffFile as git --stat does."""
+    if diff_file.added is None:
+        return "Binary file"
+    stat = []
+    if diff_file.added:
+        stat.append("{0} insertion{1}(+)".format(
+            diff_file.added, "s" if diff_file.added > 1 else ""))
+    if diff_file.removed:
+        stat.append("{0} deletion{1}(-)".format(
+            diff_file.removed, "s" if diff_file.removed > 1 else ""))
+    return ", ".join(stat)
+
+
+def strip_header(patch):
+    """Return the hunks of a single file patch without its header.
+
+    Patches without hunks (mode changes, pure renames) keep their
+    extended header lines instead, as that's the whole change.
+    """
+    lines = patch.split("\n")
+    for i, line in enumerate(lines):
+        if line.startswith(HUNK_PREFIXES):
+            return "\n".join(lines[i:]).rstrip("\n")
+    return "\n".join(line for line in lines[1:]
+                     if not line.startswith(("index ", "--- ", "+++ "))
+                     ).rstrip("\n")
+
+
+class DiffCache:
+    """Process wide LRU of single file patches, bounded in bytes.
+
+    Patches are keyed by what they're computed from (see get_diff_key),
+    so an unchanged file is never diffed twice and there's nothing to
+    invalidate.
+    """
+
+    def __init__(self, max_size=MAX_CACHE_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self._patches = OrderedDict()
+        self._lock = RLock()
+
+    def get(self, key):
+        """Return the raw patch stored for key, None on a miss."""
+        with self._lock:
+            patch = self._patches.pop(key, None)
+            if patch is not None:
+                self._patches[key] = patch
+            return patch
+
+    def put(self, key, patch):
+        """Store a raw patch, evicting the least recently used ones."""
+        if len(patch) > MAX_CACHED_PATCH_SIZE:
+            return
+        with self._lock:
+            previous = self._patches.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._patches[key] = patch
+            self.size += len(patch)
+            while self.size > self.max_size:
+                _, evicted = self._patches.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._patches
+
+    def clear(self):
+        with self._lock:
+            self._patches.clear()
+            self.size = 0
+
+
+diff_cache = DiffCache()
+
+
+def get_diff_key(root, base, index, file_path):
+    """Return the cache key of the patch of a file against base.
+
+    A file keeps its key as long as its index blob and its size and
+    mtime in the working tree don't change.
+    """
+    try:
+        fstat = lstat(path.join(root, file_path))
+        worktree = (fstat.st_size, fstat.st_mtime, fstat.st_ino)
+    except OSError:
+        worktree = None
+    oid = index.find_oid(file_path.encode("utf-8")) if index else None
+    return (root, base, file_path, oid, worktree)
+
+
+def get_base(root):
+    """Return what the working tree is diffed against: HEAD, or the
+    empty tree on an unborn branch."""
+    return workers.rev_parse(root, "HEAD") or EMPTY_TREE
+
+
+def prefetch_patches(git, paths, limit=PREFETCH_FILES):
+    """Compute the patches of the first changed files ahead of time.
+
+    Runs at low priority, one file at a time, skipping those already
+    cached. Renames are left out as they depend on the other files.
+    """
+    base = get_base(git.dir)
+    index = read_index(git.repository)
+    cancellable = get_current_cancellable()
+    for file_path in paths[:limit]:
+        if cancellable and cancellable.is_cancelled():
+            return
+        key = get_diff_key(git.dir, base, index, file_path)
+        if key in diff_cache:
+            continue
+        patch = workers.run(["git", "diff"] + PATCH_OPTIONS +
+                            [base, "--", file_path], git.dir,
+                            low_priority=True)
+        if patch:
+            diff_cache.put(key, patch)
+
+
+class CachedPatch:
+    """A patch of the DiffCache, read like the spool of a DiffSet."""
+
+    def __init__(self, patch):
+        self.patch = patch
+
+    def read(self, start, size):
+        return self.patch[start:start + size]
+
+
+class DiffSet:
+    """The changes of the working tree against HEAD.
+
+    The file list and line counts come from a single numstat pass. The
+    patches come from a single `git diff` streamed in the background to
+    a temporary file, split into per file byte ranges which are only
+    read and decoded when a file is displayed. A file can be shown as
+    soon as its own patch went through.
+    """
+
+    def __init__(self, git):
+        self._git = git
+        self._base = None
+        self._index = None
+        self._lock = RLock()
+        self._changed = Condition(self._lock)
+        self._files = None
+        # path -> (start, end) of the patches streamed so far
+        self._ranges = None
+        self._loaded = False
+        self._spool = None
+        self._process = None
+
+    def _get_base(self):
+        if self._base is None:
+            self._base = get_base(self._git.dir)
+        return self._base
+
+    def get_files(self):
+        """Return the list of changed DiffFiles."""
+        with self._lock:
+            if self._files is None:
+                output = workers.run(["git", "diff", "--numstat", "-z"] +
+                                     DIFF_OPTIONS + [self._get_base()],
+                                     self._git.dir)
+                self._files = parse_numstat(output)
+            return self._files
+
+    def get_file(self, file_path):
+        """Return the DiffFile of a path, None if unchanged."""
+        for diff_file in self.get_files():
+            if diff_file.path == file_path:
+                return diff_file
+        return None
+
+    def _get_key(self, diff_file):
+        """Return the DiffCache key of a file, None for renames."""
+        if diff_file is None or diff_file.orig_path:
+            return None
+        with self._lock:
+            if self._index is None:
+                self._index = read_index(self._git.repository) or False
+        return get_diff_key(self._git.dir, self._get_base(), self._index,
+                            diff_file.path)
+
+    def _get_cached(self, file_path):
+        """Return the CachedPatch of a file, None on a miss."""
+        key = self._get_key(self.get_file(file_path))
+        patch = diff_cache.get(key) if key else None
+        return CachedPatch(patch) if patch is not None else None
+
+    def _start_loading(self):
+        """Start streaming the whole diff to the spool file."""
+        files = self.get_files()
+        # Keys are taken before diffing, a file changing meanwhile gets
+        # a different key next time.
+        keys = dict((diff_file.path, self._get_key(diff_file))
+                    for diff_file in files)
+        cmd = ["git", "diff"] + PATCH_OPTIONS + [self._get_base()]
+        self._ranges = {}
+        self._loaded = False
+        self._spool = TemporaryFile()
+        try:
+            # stderr is never read, autocrlf warnings alone would fill it
+            with open(devnull, "wb") as null:
+                self._process = Popen(cmd, stdout=PIPE, stderr=null,
+                                      cwd=self._git.dir)
+        except OSError:
+            self._loaded = True
+            return
+        thread = Thread(target=self._stream,
+                        args=(cmd, self._process, self._spool, keys))
+        thread.daemon = True
+        thread.start()
+
+    def _stream(self, cmd, process, spool, keys):
+        """Copy the diff to the spool, publishing every patch once whole.
+
+        Runs in its own thread, readers of a file only wait until its
+        own patch went through.
+        """
+        started = time()
+        header = None
+        in_header = False
+        start = offset = 0
+        for line in iter(process.stdout.readline, b""):
+            if line.startswith(b"diff --git "):
+                self._add_range(spool, keys, header, start, offset)
+                header = [line]
+                in_header = True
+                start = offset
+            elif in_header and line.startswith(HUNK_PREFIXES_RAW):
+                in_header = False
+            elif in_header:
+                header.append(line)
+            with self._lock:
+                if self._spool is not spool:
+                    # Closed meanwhile
+                    break
+                spool.write(line)
+            offset += len(line)
+        else:
+            self._add_range(spool, keys, header, start, offset)
+        process.wait()
+        process.stdout.close()
+        tracing.record(cmd, self._git.dir, time() - started, offset,
+                       process.returncode)
+        with self._lock:
+            if self._spool is spool:
+                self._loaded = True
+                self._changed.notify_all()
+
+    def _add_range(self, spool, keys, header, start, end):
+        """Publish the byte range of a whole patch, and cache it."""
+        if header is None:
+            return
+        # Each range is keyed by the path of its own header, the order of
+        # the numstat pass isn't relied on
+        file_path = get_header_path(header)
+        with self._lock:
+            if self._spool is not spool:
+                return
+            self._ranges[file_path] = (start, end)
+            self._changed.notify_all()
+        key = keys.get(file_path)
+        if key and end - start <= MAX_CACHED_PATCH_SIZE:
+            patch = self.read(start, end - start)
+            if len(patch) == end - start:
+                diff_cache.put(key, patch)
+
+    def get_patch_range(self, file_path):
+        """Return (start, end) of a file patch in the spool file.
+
+        Waits until the patch of the file went through, not the whole
+        diff.
+        """
+        cancellable = get_current_cancellable()
+
+        def wake_up():
+            with self._lock:
+                self._changed.notify_all()
+        if cancellable:
+            cancellable.connect(wake_up)
+        try:
+            with self._lock:
+                if self._ranges is None:
+                    self._start_loading()
+                while (self._ranges is not None and
+                       file_path not in self._ranges and
+                       not self._loaded):
+                    if cancellable and cancellable.is_cancelled():
+                        raise Cancelled(file_path)
+                    self._changed.wait()
+                return (self._ranges or {}).get(file_path)
+        finally:
+            if cancellable:
+                cancellable.disconnect(wake_up)
+
+    def read(self, start, size):
+        """Read raw bytes of the spooled diff, b"" once closed."""
+        with self._lock:
+            if self._spool is None:
+                return b""
+            self._spool.seek(start)
+            data = self._spool.read(size)
+            # The diff may still be written after the last byte
+            self._spool.seek(0, 2)
+            return data
+
+    def open_patch(self, file_path):
+        """Return a PatchReader of a file, None if it has no patch."""
+        cached = self._get_cached(file_path)
+        if cached is not None:
+            return PatchReader(cached, 0, len(cached.patch))
+        byte_range = self.get_patch_range(file_path)
+        if byte_range is None:
+            return None
+        return PatchReader(self, *byte_range)
+
+    def get_patch(self, file_path):
+        """Return the hunks of a file, decoded."""
+        cached = self._get_cached(file_path)
+        if cached is not None:
+            patch = cached.patch
+        else:
+            byte_range = self.get_patch_range(file_path)
+            if byte_range is None:
+                return ""
+            start, end = byte_range
+            patch = self.read(start, end - start)
+        return strip_header(patch.decode("utf-8", "replace"))
+
+    def close(self):
+        """Stop streaming and drop the spooled diff."""
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                self._process.kill()
+            self._process = None
+            if self._spool is not None:
+                self._spool.close()
+                self._spool = None
+                self._ranges = None
+            self._changed.notify_all()
+
+
+class PatchReader:
+    """Incremental reader of a single file patch of a DiffSet.
+
+    Text is decoded chunk by chunk, the header being stripped from the
+    first one, so a huge patch never has to be held in memory at once.
+    """
+
+    def __init__(self, source, start, end):
+        self._source = source
+        self._offset = start
+        self._end = end
+        self._decoder = getincrementaldecoder("utf-8")("replace")
+        self._started = False
+        self.size = end - start
+
+    @property
+    def remaining(self):
+        """Number of bytes left to read."""
+        return self._end - self._offset
+
+    def read(self, size=READ_SIZE):
+        """Return up to size bytes of the patch as text, "" at the end."""
+        if not self._started:
+            # Make sure the whole header is part of the first chunk
+            size = max(size, READ_SIZE)
+        size = min(size, self.remaining)
+        if size <= 0:
+            return ""
+        raw = self._source.read(self._offset, size)
+        self._offset += len(raw)
+        if not raw:
+            # The spooled diff got closed
+            self._offset = self._end
+        text = self._decoder.decode(raw, final=not self.remaining)
+        if not self._started:
+            self._started = True
+            text = self._strip_header(text)
+        return text
+
+    def _strip_header(self, text):
+        """Drop the header from the first chunk."""
+        if not self.remaining:
+            return strip_header(text)
+        for prefix in HUNK_PREFIXES:
+            position = text.find("\n" + prefix)
+            if position != -1:
+                return text[position + 1:]
+        return text
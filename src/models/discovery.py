@@ -0,0 +1,162 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from collections import namedtuple
+from os import environ, path, stat
+from threading import Lock
+
+# root: the working tree, git_dir: the repository of this working tree and
+# common_dir: where refs, objects and config live, which differs from
+# git_dir for linked worktrees.
+Repository = namedtuple("Repository", ["root", "git_dir", "common_dir"])
+# Upper bound of remembered directories before starting over.
+MAX_DIRECTORIES = 100000
+
+
+def _mtime(file_path):
+    try:
+        fstat = stat(file_path)
+        return fstat.st_mtime, fstat.st_ino
+    except OSError:
+        return None
+
+
+def _read_gitfile(gitfile):
+    """Return the repository a .git file (worktree, submodule) points to."""
+    try:
+        with open(gitfile, 'r') as obj:
+            content = obj.read().strip()
+    except (IOError, OSError):
+        return None
+    if not content.startswith("gitdir:"):
+        return None
+    git_dir = content[len("gitdir:"):].strip()
+    return path.normpath(path.join(path.dirname(gitfile), git_dir))
+
+
+def _read_common_dir(git_dir):
+    """Return the common directory of a repository."""
+    try:
+        with open(path.join(git_dir, "commondir"), 'r') as obj:
+            common_dir = obj.read().strip()
+    except (IOError, OSError):
+        return git_dir
+    return path.normpath(path.join(git_dir, common_dir))
+
+
+def get_ceiling_directories():
+    """Return the directories discovery must not walk up into."""
+    ceilings = environ.get("GIT_CEILING_DIRECTORIES", "")
+    return set(path.normpath(ceiling) for ceiling in ceilings.split(":")
+               if path.isabs(ceiling))
+
+
+class Discovery:
+    """Find the repository of a directory without spawning git.
+
+    Every visited directory is remembered along with its mtime and
+    whether it holds a repository, so looking up a directory again only
+    costs a stat() per parent directory instead of a fork.
+    """
+
+    def __init__(self):
+        # directory -> (mtime, Repository or None)
+        self._dirs = {}
+        # directory -> (mtime, Repository or None) found by walking up
+        self._found = {}
+        self._lock = Lock()
+
+    def _get_own_repository(self, directory):
+        """Return the repository whose root is directory, or None."""
+        stamp = _mtime(directory)
+        cached = self._dirs.get(directory)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        repository = None
+        dot_git = path.join(directory, ".git")
+        if path.isdir(dot_git):
+            if path.exists(path.join(dot_git, "HEAD")):
+                repository = Repository(directory, dot_git,
+                                        _read_common_dir(dot_git))
+        elif path.isfile(dot_git):
+            git_dir = _read_gitfile(dot_git)
+            if git_dir and path.exists(path.join(git_dir, "HEAD")):
+                repository = Repository(directory, git_dir,
+                                        _read_common_dir(git_dir))
+        if len(self._dirs) >= MAX_DIRECTORIES:
+            self._dirs.clear()
+        self._dirs[directory] = (stamp, repository)
+        return repository
+
+    def find(self, directory):
+        """Return the Repository directory belongs to, or None."""
+        directory = path.normpath(path.abspath(directory))
+        # Git directories themselves are not part of a working tree
+        if ".git" in directory.split(path.sep):
+            return None
+        ceilings = get_ceiling_directories()
+        with self._lock:
+            while True:
+                repository = self._get_own_repository(directory)
+                if repository is not None:
+                    return repository
+                parent = path.dirname(directory)
+                if parent == directory or parent in ceilings:
+                    return None
+                directory = parent
+
+    def find_cached(self, directory):
+        """Return the Repository directory belongs to, or None.
+
+        The result is remembered per directory and only checked against
+        the mtime of directory itself, a lookup costs a single stat()
+        instead of one per parent. Meant for the many files of a folder.
+        """
+        stamp = _mtime(directory)
+        with self._lock:
+            cached = self._found.get(directory)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        repository = self.find(directory)
+        with self._lock:
+            if len(self._found) >= MAX_DIRECTORIES:
+                self._found.clear()
+            self._found[directory] = (stamp, repository)
+        return repository
+
+    def clear(self):
+        """Forget every visited directory."""
+        with self._lock:
+            self._dirs.clear()
+            self._found.clear()
+
+
+discovery = Discovery()
+
+
+def find_repository(directory):
+    """Return the Repository a directory belongs to, or None."""
+    return discovery.find(directory)
+
+
+def find_cached_repository(directory):
+    """Return the Repository a directory belongs to, remembered until
+    the directory changes."""
+    return discovery.find_cached(directory)
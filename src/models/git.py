@@ -18,22 +18,179 @@ You should have received a copy of the GNU General Public License
 along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
 """
 
-# Try Python2 imports
-try:
-    from StringIO import StringIO
-    from ConfigParser import ConfigParser, NoSectionError
-
-# Python3 imports
-except ModuleNotFoundError:
-    from io import StringIO
-    from configparser import ConfigParser, NoSectionError
-
-
+import re
+from collections import namedtuple
 from os import environ, path
 from sys import path as sys_path
+from threading import Lock
 
 sys_path.insert(0, environ["SRC_DIR"])
-from utils import execute, get_file_path, get_real_git_dir
+from utils import get_file_path
+from acceleration import get_acceleration, has_builtin_fsmonitor
+from budget import BudgetExceeded, budget, get_limits, is_large
+from cache import repository_cache
+from checkout import checkout
+from config import get_config
+from diff import (DIFF_OPTIONS, PATCH_OPTIONS, DiffSet, format_stat,
+                  get_base, parse_numstat, strip_header)
+from discovery import Repository, find_repository
+from index import get_index_summary
+from pool import workers
+from refs import get_branch, get_head, resolve_ref
+from service import client
+
+
+# --no-optional-locks keeps git status from rewriting the index, which
+# would otherwise invalidate the cached snapshot it just produced.
+STATUS_COMMAND = ["git", "--no-optional-locks", "status", "--porcelain=v2",
+                  "--branch", "-z"]
+STATUS_ARGUMENTS = STATUS_COMMAND[2:]
+
+# Local branches, most recently committed to first, in a single process
+BRANCH_LIST_COMMAND = ["git", "for-each-ref", "--sort=-committerdate",
+                       "--format=%(refname:lstrip=2)", "refs/heads/"]
+
+# Characters and sequences git refuses in branch names, see
+# git check-ref-format
+INVALID_BRANCH = re.compile(r"[\x00-\x20\x7f~^:?*\[\\]|\.\.|@\{|//|/\.|"
+                            r"^[-/.]|[/.]$|\.lock$|\.lock/|^@$")
+
+# How complete a snapshot is: everything, without untracked files (large
+# repositories), the last known one while the current one is computed,
+# or only the branch when there's no last known one.
+MODE_FULL = "full"
+MODE_NO_UNTRACKED = "no-untracked"
+MODE_STALE = "stale"
+MODE_BRANCH = "branch"
+
+# A single file reported by git status.
+# index/worktree are the X/Y status letters, "." meaning unchanged,
+# "?" untracked. orig_path is only set for renames and copies.
+StatusEntry = namedtuple("StatusEntry",
+                         ["path", "index", "worktree", "orig_path"])
+
+
+class StatusSnapshot(namedtuple("StatusSnapshot",
+                                ["oid", "branch", "upstream", "ahead",
+                                 "behind", "entries", "mode"])):
+    """Immutable result of a single `git status --porcelain=v2` call."""
+    __slots__ = ()
+
+    @property
+    def is_partial(self):
+        """Whether some changes may be missing or outdated."""
+        return self.mode != MODE_FULL
+
+    @property
+    def staged(self):
+        """Entries with changes in the index."""
+        return [entry for entry in self.entries
+                if entry.index not in (".", "?")]
+
+    @property
+    def unstaged(self):
+        """Entries with changes in the working tree."""
+        return [entry for entry in self.entries
+                if entry.worktree not in (".", "?")]
+
+    @property
+    def untracked(self):
+        """Untracked entries."""
+        return [entry for entry in self.entries if entry.index == "?"]
+
+    @property
+    def renamed(self):
+        """Renamed or copied entries."""
+        return [entry for entry in self.entries if entry.orig_path]
+
+    @property
+    def conflicted(self):
+        """Unmerged entries."""
+        return [entry for entry in self.entries if entry.index == "U" or
+                entry.worktree == "U" or entry.index + entry.worktree in
+                ("AA", "DD")]
+
+    @property
+    def modified_files(self):
+        """Sorted paths of tracked files with staged or unstaged changes."""
+        return sorted(set(entry.path for entry in self.entries
+                          if entry.index != "?"))
+
+    def files_with(self, *letters):
+        """Sorted paths having one of the letters in the index or worktree."""
+        return sorted(set(entry.path for entry in self.entries
+                          if entry.index in letters or
+                          entry.worktree in letters))
+
+
+def parse_status(output, mode=MODE_FULL):
+    """Parse the raw output of STATUS_COMMAND into a StatusSnapshot."""
+    branch = {"oid": None, "head": None, "upstream": None,
+              "ahead": 0, "behind": 0}
+    entries = []
+    fields = output.decode("utf-8", "replace").split("\0")
+    i = 0
+    while i < len(fields):
+        record = fields[i]
+        i += 1
+        if not record:
+            continue
+        kind = record[0]
+        if kind == "#":
+            header = record[2:].split(" ")
+            key, values = header[0], header[1:]
+            if key == "branch.oid" and values[0] != "(initial)":
+                branch["oid"] = values[0]
+            elif key == "branch.head" and values[0] != "(detached)":
+                branch["head"] = " ".join(values)
+            elif key == "branch.upstream":
+                branch["upstream"] = " ".join(values)
+            elif key == "branch.ab":
+                branch["ahead"] = abs(int(values[0]))
+                branch["behind"] = abs(int(values[1]))
+        elif kind == "1":
+            # 1 XY sub mH mI mW hH hI path
+            parts = record.split(" ", 8)
+            entries.append(StatusEntry(parts[8], parts[1][0], parts[1][1],
+                                       None))
+        elif kind == "2":
+            # 2 XY sub mH mI mW hH hI Xscore path NUL origPath
+            parts = record.split(" ", 9)
+            orig_path = fields[i] if i < len(fields) else None
+            i += 1
+            entries.append(StatusEntry(parts[9], parts[1][0], parts[1][1],
+                                       orig_path))
+        elif kind == "u":
+            # u XY sub m1 m2 m3 mW h1 h2 h3 path
+            parts = record.split(" ", 10)
+            entries.append(StatusEntry(parts[10], parts[1][0], parts[1][1],
+                                       None))
+        elif kind == "?":
+            entries.append(StatusEntry(record[2:], "?", "?", None))
+    return StatusSnapshot(branch["oid"], branch["head"], branch["upstream"],
+                          branch["ahead"], branch["behind"], tuple(entries),
+                          mode)
+
+
+def load_snapshot(values):
+    """Build a StatusSnapshot back from its JSON list of values."""
+    values = list(values)
+    values[5] = tuple(StatusEntry(*entry) for entry in values[5])
+    return StatusSnapshot(*values)
+
+
+# Roots whose snapshot is being waited for from the status service
+_service_waiters = set()
+_service_waiters_lock = Lock()
+
+
+def _store_late_snapshot(repository, key, snapshot):
+    """A status which exceeded its budget finished, keep it."""
+    if key == "snapshot":
+        repository_cache.set(repository, key, snapshot)
+
+
+budget.add_listener(_store_late_snapshot)
 
 
 class Git:
@@ -41,78 +198,170 @@ class Git:
 
     def __init__(self, uri):
         file_path = get_file_path(uri)
-        git_dir = get_real_git_dir(file_path)
-        if git_dir:
-            self._dir = git_dir
-        else:
-            self._dir = file_path
+        repository = find_repository(file_path)
+        if not repository:
+            git_dir = path.join(file_path, ".git")
+            repository = Repository(file_path, git_dir, git_dir)
+        self._repository = repository
+        self._dir = repository.root
 
     @property
     def dir(self):
         """Property: dir."""
         return self._dir
 
-    def get_branch(self):
-        """Return branch name."""
-        return execute(r"git symbolic-ref HEAD | sed 's!refs\/heads\/!!'", self.dir)
+    @property
+    def repository(self):
+        """Property: repository, where the .git directories are."""
+        return self._repository
 
-    def get_project_name(self):
-        """Return project name if found."""
-        config_file = path.join(self.dir, ".git", "config")
-        if path.exists(config_file):
-            with open(config_file, 'r') as obj:
-                content = obj.readlines()
-            obj.close()
-            lines = [line.strip() for line in content]
-            try:
-                cfg = ConfigParser()
-                buf = StringIO("\n".join(lines))
-                cfg.readfp(buf)
-                url = cfg.get('remote "origin"', "url")
-                return url.split("/")[-1].replace(".git", "")
-            except (NoSectionError, KeyError):
-                return None
+    def _cached(self, key, compute, volatile=False):
+        """Return a value from the shared repository cache."""
+        return repository_cache.get(self.repository, key, compute, volatile)
+
+    def get_snapshot(self):
+        """Return the status snapshot, running git status if needed.
+
+        Past the time budget of the repository, a partial snapshot is
+        returned while git status finishes in the background.
+        """
+        try:
+            return self._cached("snapshot", self._compute_snapshot,
+                                volatile=True)
+        except BudgetExceeded as error:
+            return error.fallback
+
+    def _compute_snapshot(self):
+        """Run git status, without untracked files if that's too slow.
+
+        The status service answers instead when it's running.
+        """
+        snapshot = self._get_service_snapshot()
+        if snapshot is not None:
+            return snapshot
+        limits = get_limits(self.repository)
+        acceleration = get_acceleration(self.repository)
+        if acceleration.enabled:
+            # Let git update the untracked cache and fsmonitor token of
+            # the index, the snapshot is computed again once if it does.
+            command = ["git"] + acceleration.options + STATUS_ARGUMENTS
         else:
+            command = list(STATUS_COMMAND)
+        mode = MODE_FULL
+        if (is_large(self.repository, limits) or
+                budget.is_slow(self.dir, "snapshot")):
+            command.append("--untracked-files=no")
+            mode = MODE_NO_UNTRACKED
+
+        def compute():
+            return parse_status(workers.run(command, self.dir), mode)
+
+        def partial(last):
+            if last is not None:
+                return last._replace(mode=MODE_STALE)
+            return StatusSnapshot(resolve_ref(self.repository, "HEAD"),
+                                  get_branch(self.repository), None, 0, 0,
+                                  (), MODE_BRANCH)
+        return budget.run(self.repository, "snapshot", compute,
+                          limits.timeout, partial)
+
+    def _get_service_snapshot(self):
+        """Return the snapshot known to the status service, if running.
+
+        Past the time budget of the service, its partial snapshot is
+        raised with BudgetExceeded like a local one, and its result is
+        handled as a late local one.
+        """
+        result = client.call("snapshot", root=self.dir)
+        if result is None:
             return None
+        snapshot = load_snapshot(result)
+        if snapshot.mode in (MODE_STALE, MODE_BRANCH):
+            with _service_waiters_lock:
+                waiting = self.dir in _service_waiters
+                _service_waiters.add(self.dir)
+            if not waiting:
+                client.call_later(self._on_service_snapshot, "snapshot",
+                                  root=self.dir, wait=True)
+            raise BudgetExceeded(snapshot)
+        return snapshot
+
+    def _on_service_snapshot(self, result):
+        with _service_waiters_lock:
+            _service_waiters.discard(self.dir)
+        if result is None:
+            return
+        snapshot = load_snapshot(result)
+        if snapshot.mode not in (MODE_STALE, MODE_BRANCH):
+            budget.notify(self.repository, "snapshot", snapshot)
+
+    def would_benefit_from_caches(self):
+        """Whether status is slow and git's caches aren't used."""
+        if not (budget.is_slow(self.dir, "snapshot") or
+                is_large(self.repository)):
+            return False
+        acceleration = get_acceleration(self.repository)
+        return not acceleration.untracked_cache or (
+            not acceleration.fsmonitor and has_builtin_fsmonitor())
+
+    def refresh(self):
+        """Drop the cached values, the next query will recompute them."""
+        repository_cache.invalidate(self.dir)
 
-    def get_status(self):
-        """Return a dict with a count of added/modified/removed files."""
-        modified = execute("git status | grep 'modified:'", self.dir)
-        removed = execute("git status | grep 'deleted:'", self.dir)
-        added = execute("git status | grep 'new file:'", self.dir)
-
-        def get_only_files_path(array):
-            array = array.strip()
-            if array:
-                def clean(file_path):
-                    return file_path.split(':')[1].strip()
-                if len(array) > 0 and array:
-                    return list(map(clean, array.split("\n")))
-            return []
+    def get_branch(self, snapshot=None):
+        """Return branch name, or the abbreviated commit when detached.
+
+        Like the other getters taking a snapshot, the given one is used
+        instead of querying it again.
+        """
+        head = get_head(self.repository)
+        if head is None:
+            # Not readable natively, e.g. reftable
+            return (snapshot or self.get_snapshot()).branch or ""
+        return get_branch(self.repository) or head[:7]
+
+    def get_project_name(self):
+        """Return project name if found."""
+        url = get_config(self.repository).get('remote.origin.url')
+        if url:
+            return url.rstrip("/").split("/")[-1].replace(".git", "")
+        return None
+
+    def get_status(self, snapshot=None):
+        """Return a dict with a list of added/modified/removed files."""
+        snapshot = snapshot or self.get_snapshot()
         return {
-            'added': get_only_files_path(added),
-            'removed': get_only_files_path(removed),
-            'modified': get_only_files_path(modified)
+            'added': snapshot.files_with("A"),
+            'removed': snapshot.files_with("D"),
+            'modified': snapshot.files_with("M"),
+            'renamed': [entry.path for entry in snapshot.renamed],
+            'untracked': [entry.path for entry in snapshot.untracked],
+            'conflicted': [entry.path for entry in snapshot.conflicted]
         }
 
-    def get_modified(self):
+    def get_index_summary(self):
+        """Return the staged and unstaged paths, read from the index."""
+        return self._cached("index_summary",
+                            lambda: get_index_summary(self.repository),
+                            volatile=True)
+
+    def get_modified(self, snapshot=None):
         """Return a list of files that have been modified."""
-        modified = execute("{ git diff --name-only ; git diff "
-                                 "--name-only --staged ; } | sort | uniq",
-                                 self.dir)
-        if modified:
-            return modified.split("\n")
-        return []
+        return (snapshot or self.get_snapshot()).modified_files
+
+    def get_diff_set(self):
+        """Return the changes of the working tree, loaded on demand."""
+        return DiffSet(self)
 
     def get_diff(self, filename):
         """Return the diff bettween the current file and HEAD."""
-        diff = execute("git diff --unified=0 {0}".format(filename),
-                             self.dir).split("\n")[4:]
-        return "\n".join(diff)
+        diff = workers.run(["git", "diff"] + PATCH_OPTIONS +
+                           [get_base(self.dir), "--", filename], self.dir)
+        return strip_header(diff.decode("utf-8", "replace"))
 
     def get_remote_url(self):
         """Return remote url."""
-        url = execute("git config --get remote.origin.url", self.dir)
+        url = get_config(self.repository).get('remote.origin.url') or ""
         if url[0:8] == "https://":
             pass
         elif url[0:4] == "git@":
@@ -127,32 +376,50 @@ class Git:
 
     def get_stat(self, filename):
         """Return file stat line added/removed."""
-        stat = execute("git diff --stat {0}".format(filename), self.dir)
-        if stat:
-            return ", ".join(stat.split("\n")[1].split(",")[1:])
+        stat = workers.run(["git", "diff", "--numstat", "-z"] +
+                           DIFF_OPTIONS + [get_base(self.dir), "--", filename],
+                           self.dir)
+        files = parse_numstat(stat)
+        if files:
+            return format_stat(files[0])
         return None
 
-    def get_project_branch(self):
+    def get_project_branch(self, snapshot=None):
         branch = ""
         project_name = self.get_project_name()
         if project_name:
             branch += project_name + "/"
-        branch += self.get_branch()
+        branch += self.get_branch(snapshot)
         return branch
 
     def check_branch_name(self, branch):
-        return True
+        """Whether branch is a valid name for a new or existing branch."""
+        return INVALID_BRANCH.search(branch) is None
+
+    def _get_branches(self):
+        """Return the branch names and a set of them for lookups."""
+        def compute():
+            output = workers.run(BRANCH_LIST_COMMAND, self.dir)
+            names = [name for name in
+                     output.decode("utf-8", "replace").split("\n") if name]
+            return names, frozenset(names)
+        return self._cached("branches", compute)
 
     def get_branch_list(self):
-        b_list = execute("git branch --list", self.dir).split("\n")
+        """Return the local branches, sorted by committer date."""
+        return list(self._get_branches()[0])
 
-        def clean_branch_name(branch_name):
-            return str(branch_name).lstrip("*").strip()
-        return list(map(clean_branch_name, b_list))
+    def has_branch(self, branch):
+        """Whether a local branch exists."""
+        return branch in self._get_branches()[1]
 
-    def update_branch(self, branch):
-        branches = self.get_branch_list()
-        if branch in branches:
-            execute("git checkout {}".format(branch), self.dir)
-        else:
-            execute("git checkout -b {0}".format(branch), self.dir)
+    def update_branch(self, branch, on_progress=None):
+        """Checkout a branch, created if it doesn't exist yet.
+
+        Blocks until done, on_progress is called with the phase and done
+        fraction meanwhile. Return None on success, git's error otherwise.
+        """
+        error = checkout(self.dir, branch, not self.has_branch(branch),
+                         on_progress)
+        self.refresh()
+        return error
@@ -0,0 +1,557 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+import re
+from array import array
+from binascii import hexlify
+from hashlib import sha1, sha256
+from mmap import ACCESS_READ, mmap
+from os import environ, fstat, lstat, path, readlink
+from stat import S_ISDIR, S_ISLNK, S_ISREG
+from struct import Struct, unpack_from
+
+from config import get_config
+from pool import workers
+
+HEADER = Struct(">4sII")
+# ctime s/ns, mtime s/ns, dev, ino, mode, uid, gid, size
+STAT_DATA = Struct(">10I")
+SIGNATURE = b"DIRC"
+
+FLAG_ASSUME_VALID = 0x8000
+FLAG_EXTENDED = 0x4000
+FLAG_STAGE_MASK = 0x3000
+EXT_FLAG_SKIP_WORKTREE = 0x4000
+EXT_FLAG_INTENT_TO_ADD = 0x2000
+
+MODE_GITLINK = 0o160000
+# Attributes under which the index content isn't the working tree file
+CONVERSION_ATTRIBUTES = re.compile(
+    br"(text|eol|crlf|filter|ident|working-tree-encoding)\b")
+# Number of entries checked by a single worker job
+CHUNK_SIZE = 2048
+WORKERS = 4
+
+
+def _read_varint(buf, pos):
+    """Decode the offset varint used by index version 4."""
+    byte = unpack_from(">B", buf, pos)[0]
+    pos += 1
+    value = byte & 0x7f
+    while byte & 0x80:
+        byte = unpack_from(">B", buf, pos)[0]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7f)
+    return value, pos
+
+
+def _read_ewah(buf, pos):
+    """Decode an EWAH bitmap, return the set positions and the end."""
+    bit_size, word_count = unpack_from(">II", buf, pos)
+    pos += 8
+    words = unpack_from(">{0}Q".format(word_count), buf, pos)
+    # Skip the words and the position of the last run length word
+    pos += 8 * word_count + 4
+    bits = []
+    current = 0
+    i = 0
+    while i < word_count:
+        marker = words[i]
+        i += 1
+        running_bit = marker & 1
+        running_length = (marker >> 1) & 0xffffffff
+        literals = marker >> 33
+        if running_bit:
+            bits.extend(range(current, current + running_length * 64))
+        current += running_length * 64
+        for word in words[i:i + literals]:
+            for bit in range(64):
+                if word >> bit & 1:
+                    bits.append(current + bit)
+            current += 64
+        i += literals
+    return [bit for bit in bits if bit < bit_size], pos
+
+
+class IndexEntries:
+    """Entries of an index stored column wise.
+
+    A large index is kept as a handful of arrays instead of one object
+    per entry, 200k entries fit in a few megabytes.
+    """
+    __slots__ = ("mtime", "mtime_ns", "size", "mode", "flags",
+                 "ext_flags", "oids", "oid_size", "_names", "_offsets")
+
+    def __init__(self, oid_size):
+        self.mtime = array("I")
+        self.mtime_ns = array("I")
+        self.size = array("I")
+        self.mode = array("I")
+        self.flags = array("H")
+        self.ext_flags = array("H")
+        self.oids = bytearray()
+        self.oid_size = oid_size
+        self._names = bytearray()
+        self._offsets = array("I", [0])
+
+    def __len__(self):
+        return len(self.mode)
+
+    def append(self, stat_data, oid, flags, ext_flags, name):
+        self.mtime.append(stat_data[2])
+        self.mtime_ns.append(stat_data[3])
+        self.mode.append(stat_data[6])
+        self.size.append(stat_data[9])
+        self.flags.append(flags)
+        self.ext_flags.append(ext_flags)
+        self.oids.extend(oid)
+        self._names.extend(name)
+        self._offsets.append(len(self._names))
+
+    def copy_from(self, other, i, name=None):
+        """Append the i-th entry of another IndexEntries."""
+        stat_data = [0, 0, other.mtime[i], other.mtime_ns[i], 0, 0,
+                     other.mode[i], 0, 0, other.size[i]]
+        self.append(stat_data, other.oid(i), other.flags[i],
+                    other.ext_flags[i], name or other.name(i))
+
+    def name(self, i):
+        """Return the path of the i-th entry, as bytes."""
+        return bytes(self._names[self._offsets[i]:self._offsets[i + 1]])
+
+    def oid(self, i):
+        """Return the raw object id of the i-th entry."""
+        return bytes(self.oids[i * self.oid_size:(i + 1) * self.oid_size])
+
+    def stage(self, i):
+        return (self.flags[i] & FLAG_STAGE_MASK) >> 12
+
+
+class GitIndex:
+    """Memory mapped reader of .git/index, versions 2 to 4."""
+
+    def __init__(self, file_path, oid_size=20):
+        self.file_path = file_path
+        self.oid_size = oid_size
+        self.version = None
+        self.mtime = None
+        # The TREE extension: directory -> oid of its tree, for the
+        # directories whose cached tree is still valid. The root is "".
+        self.tree = {}
+        self.has_untracked_cache = False
+        self.shared_index = None
+        self.entries = self._read(file_path)
+
+    def find_oid(self, name):
+        """Return the hex object id of a stage 0 path, None if absent."""
+        entries = self.entries
+        low, high = 0, len(entries)
+        # Entries are sorted by path
+        while low < high:
+            middle = (low + high) // 2
+            if entries.name(middle) < name:
+                low = middle + 1
+            else:
+                high = middle
+        if (low < len(entries) and entries.name(low) == name and
+                not entries.stage(low)):
+            return hexlify(entries.oid(low)).decode("ascii")
+        return None
+
+    def _read(self, file_path):
+        with open(file_path, 'rb') as obj:
+            fstat_ = fstat(obj.fileno())
+            self.mtime = fstat_.st_mtime
+            if not fstat_.st_size:
+                raise ValueError("empty index")
+            buf = mmap(obj.fileno(), 0, access=ACCESS_READ)
+        try:
+            return self._parse(buf)
+        finally:
+            buf.close()
+
+    def _parse(self, buf):
+        signature, version, count = HEADER.unpack_from(buf, 0)
+        if signature != SIGNATURE or version not in (2, 3, 4):
+            raise ValueError("unsupported index")
+        self.version = version
+        entries = IndexEntries(self.oid_size)
+        oid_size = self.oid_size
+        pos = HEADER.size
+        previous_name = b""
+        for _ in range(count):
+            start = pos
+            stat_data = STAT_DATA.unpack_from(buf, pos)
+            pos += STAT_DATA.size
+            oid = buf[pos:pos + oid_size]
+            pos += oid_size
+            flags = unpack_from(">H", buf, pos)[0]
+            pos += 2
+            ext_flags = 0
+            if flags & FLAG_EXTENDED:
+                ext_flags = unpack_from(">H", buf, pos)[0]
+                pos += 2
+            if version == 4:
+                strip, pos = _read_varint(buf, pos)
+                end = buf.find(b"\0", pos)
+                name = previous_name[:len(previous_name) - strip] + \
+                    buf[pos:end]
+                pos = end + 1
+                previous_name = name
+            else:
+                end = buf.find(b"\0", pos)
+                name = buf[pos:end]
+                # Entries are padded with 1 to 8 NUL bytes
+                pos = start + ((end - start + 8) & ~7)
+            entries.append(stat_data, oid, flags, ext_flags, name)
+
+        link = None
+        end_of_extensions = len(buf) - oid_size
+        while pos + 8 <= end_of_extensions:
+            signature, size = unpack_from(">4sI", buf, pos)
+            pos += 8
+            if signature == b"TREE":
+                self._parse_tree(buf, pos)
+            elif signature == b"UNTR":
+                self.has_untracked_cache = True
+            elif signature == b"link":
+                link = self._parse_link(buf, pos, size)
+            pos += size
+
+        if link is not None:
+            entries = self._merge_shared(entries, *link)
+        return entries
+
+    def _parse_tree(self, buf, pos, prefix=b""):
+        """Read the TREE extension, return the end of the record."""
+        # name NUL entry_count SP subtrees LF [oid], then the subtrees
+        end = buf.find(b"\0", pos)
+        directory = prefix + buf[pos:end]
+        line_end = buf.find(b"\n", end)
+        entry_count, subtrees = buf[end + 1:line_end].split(b" ")
+        pos = line_end + 1
+        if int(entry_count) >= 0:
+            self.tree[directory] = buf[pos:pos + self.oid_size]
+            pos += self.oid_size
+        if directory:
+            directory += b"/"
+        for _ in range(int(subtrees)):
+            pos = self._parse_tree(buf, pos, directory)
+        return pos
+
+    def _parse_link(self, buf, pos, size):
+        """Read the split index link extension."""
+        oid = buf[pos:pos + self.oid_size]
+        deleted, replaced = [], []
+        if size > self.oid_size:
+            deleted, end = _read_ewah(buf, pos + self.oid_size)
+            replaced, _ = _read_ewah(buf, end)
+        return oid, deleted, replaced
+
+    def _merge_shared(self, entries, oid, deleted, replaced):
+        """Apply the entries of a split index on top of its shared index."""
+        hexsha = "".join("{0:02x}".format(byte) for byte in bytearray(oid))
+        shared_path = path.join(path.dirname(self.file_path),
+                                "sharedindex." + hexsha)
+        self.shared_index = shared_path
+        base = GitIndex(shared_path, self.oid_size).entries
+        # Replaced entries come first and have an empty name
+        replacements = dict(zip(replaced, range(len(replaced))))
+        deleted = set(deleted)
+        merged = {}
+        for i in range(len(base)):
+            if i in deleted:
+                continue
+            key = (base.name(i), base.stage(i))
+            if i in replacements:
+                merged[key] = (entries, replacements[i])
+            else:
+                merged[key] = (base, i)
+        for i in range(len(replaced), len(entries)):
+            merged[(entries.name(i), entries.stage(i))] = (entries, i)
+
+        result = IndexEntries(self.oid_size)
+        for key in sorted(merged):
+            source, i = merged[key]
+            # Replacements inherit the name of the entry they replace
+            result.copy_from(source, i, key[0])
+        return result
+
+    def _is_clean(self, entries, i, root, trust_mode, convert):
+        """Whether the i-th entry matches the working tree file.
+
+        None when the content differs but git may convert the file when
+        adding it, only git can tell then.
+        """
+        name = entries.name(i)
+        try:
+            stat_ = lstat(path.join(root, name))
+        except OSError:
+            return False
+        mode = entries.mode[i]
+        if S_ISLNK(mode) != S_ISLNK(stat_.st_mode):
+            return False
+        if S_ISREG(stat_.st_mode) and trust_mode and \
+                bool(mode & 0o100) != bool(stat_.st_mode & 0o100):
+            return False
+        if entries.size[i] != stat_.st_size & 0xffffffff:
+            return False
+        mtime_ns = getattr(stat_, "st_mtime_ns", None)
+        if entries.mtime[i] == int(stat_.st_mtime) and \
+                (not entries.mtime_ns[i] or mtime_ns is None or
+                 entries.mtime_ns[i] == mtime_ns % 1000000000) and \
+                entries.mtime[i] < int(self.mtime):
+            return True
+        # Changed stat data or racily clean, compare the content
+        if self.hash_file(path.join(root, name), stat_) == entries.oid(i):
+            return True
+        return None if convert and S_ISREG(stat_.st_mode) else False
+
+    def hash_file(self, file_path, stat_):
+        """Return the object id the file would have as a blob."""
+        if S_ISLNK(stat_.st_mode):
+            data = readlink(file_path)
+        else:
+            with open(file_path, 'rb') as obj:
+                data = obj.read()
+        hasher = sha256() if self.oid_size == 32 else sha1()
+        hasher.update(("blob {0}\0".format(len(data))).encode("ascii"))
+        hasher.update(data)
+        return hasher.digest()
+
+    def _check_chunk(self, args):
+        start, stop, root, trust_mode, convert = args
+        entries = self.entries
+        changed = []
+        unknown = []
+        for i in range(start, stop):
+            mode = entries.mode[i]
+            if mode == MODE_GITLINK or S_ISDIR(mode) or \
+                    entries.flags[i] & FLAG_ASSUME_VALID or \
+                    entries.ext_flags[i] & EXT_FLAG_SKIP_WORKTREE:
+                continue
+            if entries.stage(i) or \
+                    entries.ext_flags[i] & EXT_FLAG_INTENT_TO_ADD:
+                changed.append(entries.name(i))
+                continue
+            clean = self._is_clean(entries, i, root, trust_mode, convert)
+            if clean is None:
+                unknown.append(entries.name(i))
+            elif not clean:
+                changed.append(entries.name(i))
+        return changed, unknown
+
+    def get_unstaged(self, root, trust_mode=True, workers=WORKERS,
+                     convert=False):
+        """Return the sorted paths differing between index and worktree.
+
+        Stat data is checked on a thread pool, only entries whose stat
+        data changed (or that are racily clean) have their content hashed.
+        With convert, git may convert files when adding them, the paths
+        whose content differs are returned apart as (changed, unknown).
+        """
+        if isinstance(root, type(u"")):
+            root = root.encode("utf-8")
+        jobs = [(start, min(start + CHUNK_SIZE, len(self.entries)),
+                 root, trust_mode, convert)
+                for start in range(0, len(self.entries), CHUNK_SIZE)]
+        if len(jobs) > 1 and workers > 1:
+            # Imported here, multiprocessing is slow to import
+            from multiprocessing.pool import ThreadPool
+            pool = ThreadPool(min(workers, len(jobs)))
+            try:
+                results = pool.map(self._check_chunk, jobs)
+            finally:
+                pool.close()
+        else:
+            results = [self._check_chunk(job) for job in jobs]
+        changed = sorted(set(name for result in results
+                             for name in result[0]))
+        if not convert:
+            return changed
+        return changed, sorted(set(name for result in results
+                                   for name in result[1]))
+
+
+def read_tree(repository, index, oid, directory=b"", files=None):
+    """Return a dict path -> (mode, oid) of the files of a tree.
+
+    Subtrees the index has an identical cached tree for are not read,
+    their files are the same in the index. They are listed with a None
+    value under their directory path.
+    """
+    if files is None:
+        files = {}
+    if index.tree.get(directory) == oid:
+        files[directory] = None
+        return files
+    hexsha = "".join("{0:02x}".format(byte) for byte in bytearray(oid))
+    obj = workers.read_object(repository.root, hexsha)
+    if obj is None:
+        return files
+    content = obj[3]
+    prefix = directory + b"/" if directory else b""
+    pos = 0
+    oid_size = index.oid_size
+    while pos < len(content):
+        end = content.find(b"\0", pos)
+        mode, name = content[pos:end].split(b" ", 1)
+        entry_oid = content[end + 1:end + 1 + oid_size]
+        pos = end + 1 + oid_size
+        mode = int(mode, 8)
+        if S_ISDIR(mode):
+            read_tree(repository, index, entry_oid, prefix + name, files)
+        else:
+            files[prefix + name] = (mode, entry_oid)
+    return files
+
+
+def get_staged(repository, index):
+    """Return the sorted paths differing between HEAD and the index."""
+    entries = index.entries
+    head_tree = workers.rev_parse(repository.root, "HEAD^{tree}")
+    tree = {}
+    if head_tree:
+        tree = read_tree(repository, index,
+                         bytes(bytearray.fromhex(head_tree)))
+    if tree.get(b"", 0) is None:
+        # The cached tree of the whole index matches HEAD
+        return []
+    unchanged = set(name for name, value in tree.items() if value is None)
+    staged = set()
+    seen = set()
+    for i in range(len(entries)):
+        name = entries.name(i)
+        parts = name.split(b"/")
+        if any(b"/".join(parts[:depth]) in unchanged
+               for depth in range(1, len(parts))):
+            continue
+        seen.add(name)
+        if entries.ext_flags[i] & EXT_FLAG_INTENT_TO_ADD:
+            continue
+        if entries.stage(i) or tree.get(name) != (entries.mode[i],
+                                                  entries.oid(i)):
+            staged.add(name)
+    staged.update(name for name, value in tree.items()
+                  if value is not None and name not in seen)
+    return sorted(staged)
+
+
+def read_index(repository):
+    """Return the GitIndex of a repository, None if there's none."""
+    config = get_config(repository)
+    oid_size = 32 if config.get("extensions.objectformat") == "sha256" \
+        else 20
+    try:
+        return GitIndex(path.join(repository.git_dir, "index"), oid_size)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def get_entry_count(repository):
+    """Return the number of entries of the index from its header only.
+
+    With a split index this is the count of the split part, a lower
+    bound good enough to tell how big a repository is.
+    """
+    try:
+        with open(path.join(repository.git_dir, "index"), "rb") as index:
+            header = index.read(HEADER.size)
+    except (IOError, OSError):
+        return 0
+    if len(header) < HEADER.size:
+        return 0
+    signature, _, entries = HEADER.unpack(header)
+    if signature != SIGNATURE:
+        return 0
+    return entries
+
+
+def _get_attributes_files(repository, index):
+    """Return the gitattributes files applying to a repository."""
+    config = get_config(repository)
+    global_file = config.get("core.attributesfile")
+    if global_file is None:
+        xdg_config = environ.get("XDG_CONFIG_HOME",
+                                 path.expanduser("~/.config"))
+        global_file = path.join(xdg_config, "git", "attributes")
+    files = [path.expanduser(global_file),
+             path.join(repository.common_dir, "info", "attributes")]
+    root = repository.root
+    if isinstance(root, type(u"")):
+        root = root.encode("utf-8")
+    entries = index.entries
+    for i in range(len(entries)):
+        name = entries.name(i)
+        if name == b".gitattributes" or name.endswith(b"/.gitattributes"):
+            files.append(path.join(root, name))
+    return files
+
+
+def may_convert(repository, index):
+    """Whether git may change files it adds, for their line endings or
+    through a clean filter, their hash then isn't their blob's."""
+    config = get_config(repository)
+    if config.get_bool("core.autocrlf") or \
+            (config.get("core.autocrlf") or "").lower() == "input":
+        return True
+    for file_path in _get_attributes_files(repository, index):
+        try:
+            with open(file_path, "rb") as obj:
+                content = obj.read()
+        except (IOError, OSError):
+            continue
+        if CONVERSION_ATTRIBUTES.search(content):
+            return True
+    return False
+
+
+def get_converted_unstaged(repository, names):
+    """Return which of names git diff finds changed, for files git
+    converts when adding them."""
+    output = workers.run(["git", "diff", "--name-only", "-z"],
+                         repository.root)
+    names = set(names)
+    return [name for name in output.split(b"\0") if name in names]
+
+
+def get_index_summary(repository):
+    """Return a dict with the staged and unstaged paths and entry count."""
+    index = read_index(repository)
+    if index is None:
+        return {'entries': 0, 'staged': [], 'unstaged': []}
+    config = get_config(repository)
+    trust_mode = config.get_bool("core.filemode", True)
+
+    def decode(names):
+        return [name.decode("utf-8", "replace") for name in names]
+    if may_convert(repository, index):
+        unstaged, unknown = index.get_unstaged(repository.root, trust_mode,
+                                               convert=True)
+        if unknown:
+            # Racily clean or touched files git would convert
+            unstaged = sorted(set(unstaged).union(
+                get_converted_unstaged(repository, unknown)))
+    else:
+        unstaged = index.get_unstaged(repository.root, trust_mode)
+    return {
+        'entries': len(index.entries),
+        'staged': decode(get_staged(repository, index)),
+        'unstaged': decode(unstaged)
+    }
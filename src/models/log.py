@@ -0,0 +1,231 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from collections import namedtuple
+from hashlib import sha1
+from json import dump, load
+from os import environ, listdir, makedirs, path, read, rename
+from shutil import rmtree
+from subprocess import PIPE, Popen
+from sys import path as sys_path
+from threading import RLock
+from time import time
+
+sys_path.insert(0, environ["SRC_DIR"])
+import tracing
+from utils import get_current_cancellable
+from pool import workers
+from refs import resolve_ref
+
+# Commits are NUL separated, their fields by the unit separator
+FIELDS = ["oid", "parents", "author", "date", "subject"]
+LOG_FORMAT = "%x1f".join(["%H", "%P", "%an", "%at", "%s"])
+PAGE_SIZE = 200
+# Pages kept on disk for the current HEAD of a repository
+MAX_CACHED_PAGES = 50
+READ_SIZE = 65536
+
+Commit = namedtuple("Commit", FIELDS)
+
+
+def get_cache_dir():
+    """Return the directory of the on disk history pages."""
+    cache_home = environ.get("XDG_CACHE_HOME") or \
+        path.join(path.expanduser("~"), ".cache")
+    return path.join(cache_home, "nautilus-git", "history")
+
+
+def has_commit_graph(repository):
+    """Whether the repository has a commit-graph file to walk with."""
+    info_dir = path.join(repository.common_dir, "objects", "info")
+    return (path.exists(path.join(info_dir, "commit-graph")) or
+            path.exists(path.join(info_dir, "commit-graphs",
+                                  "commit-graph-chain")))
+
+
+def parse_commit(record):
+    """Parse a single record of LOG_FORMAT into a Commit."""
+    oid, parents, author, date, subject = record.split("\x1f", 4)
+    return Commit(oid, parents.split(), author, int(date), subject)
+
+
+class PageCache:
+    """Parsed pages of the history of a repository, on disk.
+
+    Pages are stored per HEAD oid, with the commits left to walk after
+    them, so a later session continues from the last cached page. Only
+    the pages of the latest HEAD are kept.
+    """
+
+    def __init__(self, root, head, cache_dir=None):
+        key = sha1(root.encode("utf-8")).hexdigest()
+        self._repository_dir = path.join(cache_dir or get_cache_dir(), key)
+        self._dir = path.join(self._repository_dir, head)
+
+    def _page_path(self, number):
+        return path.join(self._dir, "{0}.json".format(number))
+
+    def get(self, number):
+        """Return (commits, frontier) of a page, None if not cached."""
+        try:
+            with open(self._page_path(number)) as obj:
+                page = load(obj)
+        except (IOError, OSError, ValueError):
+            return None
+        return [Commit(*commit) for commit in page["commits"]], \
+            page["frontier"]
+
+    def put(self, number, commits, frontier):
+        """Store a page, dropping the pages of other HEADs."""
+        if number >= MAX_CACHED_PAGES:
+            return
+        try:
+            if number == 0:
+                self._drop_other_heads()
+            if not path.isdir(self._dir):
+                makedirs(self._dir)
+            # Written aside then renamed, readers never see half a page
+            temporary = self._page_path(number) + ".tmp"
+            with open(temporary, "w") as obj:
+                dump({"commits": commits, "frontier": frontier}, obj)
+            rename(temporary, self._page_path(number))
+        except (IOError, OSError):
+            pass
+
+    def _drop_other_heads(self):
+        try:
+            heads = listdir(self._repository_dir)
+        except OSError:
+            return
+        for head in heads:
+            head_dir = path.join(self._repository_dir, head)
+            if head_dir != self._dir:
+                rmtree(head_dir, ignore_errors=True)
+
+
+class History:
+    """The commits reachable from HEAD, read a page at a time.
+
+    A single `git log` is streamed, each page reading the next commits
+    of its output. Pages found in the PageCache are used instead, and
+    the walk resumes from the commits left after the last one (the
+    frontier) instead of walking from HEAD again.
+    """
+
+    def __init__(self, git, cache_dir=None):
+        self._git = git
+        self._lock = RLock()
+        self._head = resolve_ref(git.repository, "HEAD") or \
+            workers.rev_parse(git.dir, "HEAD")
+        self._cache = PageCache(git.dir, self._head, cache_dir) \
+            if self._head else None
+        self._process = None
+        self._buffer = b""
+        self._pending = set()
+        self._pages = 0
+        self._frontier = [self._head] if self._head else []
+        self.finished = not self._head
+
+    @property
+    def uses_commit_graph(self):
+        return has_commit_graph(self._git.repository)
+
+    def get_page(self):
+        """Return the next page of commits, [] once at the end."""
+        with self._lock:
+            if self.finished:
+                return []
+            cached = self._cache.get(self._pages)
+            if cached is not None:
+                commits, self._frontier = cached
+                self._stop()
+            else:
+                commits = self._read_page()
+                if commits is None:
+                    # Cancelled, the walk restarts from the frontier
+                    return []
+                self._cache.put(self._pages, commits, self._frontier)
+            self._pages += 1
+            self.finished = not self._frontier
+            return commits
+
+    def _start(self):
+        cmd = ["git", "-c", "core.commitGraph=true", "log", "-z",
+               "--format=" + LOG_FORMAT] + self._frontier + ["--"]
+        self._process = Popen(cmd, stdout=PIPE, stderr=PIPE,
+                              cwd=self._git.dir)
+        self._buffer = b""
+        self._pending = set(self._frontier)
+
+    def _read_page(self):
+        """Parse the next PAGE_SIZE commits of the running git log."""
+        if self._process is None:
+            self._start()
+        process = self._process
+        started = time()
+        cancellable = get_current_cancellable()
+        if cancellable:
+            cancellable.connect(process.kill)
+        records = []
+        size = 0
+        try:
+            while len(records) < PAGE_SIZE:
+                position = self._buffer.find(b"\0")
+                if position == -1:
+                    data = read(process.stdout.fileno(), READ_SIZE)
+                    if not data:
+                        break
+                    size += len(data)
+                    self._buffer += data
+                    continue
+                records.append(self._buffer[:position])
+                self._buffer = self._buffer[position + 1:].lstrip(b"\n")
+        finally:
+            if cancellable:
+                cancellable.disconnect(process.kill)
+        if cancellable and cancellable.is_cancelled():
+            self._stop()
+            return None
+        commits = []
+        for record in records:
+            commit = parse_commit(record.decode("utf-8", "replace"))
+            commits.append(commit)
+            # Commits left to walk after this one
+            self._pending.discard(commit.oid)
+            self._pending.update(commit.parents)
+        if len(records) < PAGE_SIZE:
+            self._pending.clear()
+            self._stop()
+        self._frontier = sorted(self._pending)
+        tracing.record(["git", "log"], self._git.dir, time() - started, size)
+        return commits
+
+    def _stop(self):
+        """Kill the running git log, if any."""
+        process, self._process = self._process, None
+        if process is not None:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            process.stdout.close()
+            process.stderr.close()
+
+    def close(self):
+        with self._lock:
+            self._stop()
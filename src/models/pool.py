@@ -0,0 +1,197 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from os import environ
+from subprocess import PIPE, Popen
+from sys import path as sys_path
+from threading import BoundedSemaphore, Lock, Thread
+from time import sleep, time
+
+sys_path.insert(0, environ["SRC_DIR"])
+import tracing
+from utils import execute_raw
+
+# Seconds after which an unused cat-file process is stopped
+IDLE_TIMEOUT = 60
+# Maximum number of git commands running at the same time
+MAX_RUNNERS = 4
+
+
+class CallStats:
+    """Number of calls and total time spent, per kind of call."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = Lock()
+
+    def record(self, kind, elapsed):
+        with self._lock:
+            calls, total = self._stats.get(kind, (0, 0.0))
+            self._stats[kind] = (calls + 1, total + elapsed)
+
+    def get(self):
+        """Return a dict of kind -> calls, total and average milliseconds."""
+        with self._lock:
+            return dict((kind, {'calls': calls,
+                                'total_ms': total * 1000,
+                                'average_ms': total * 1000 / calls})
+                        for kind, (calls, total) in self._stats.items())
+
+
+stats = CallStats()
+
+
+class CatFile:
+    """A long lived `git cat-file --batch` process of a repository."""
+
+    def __init__(self, root, mode="--batch"):
+        self.root = root
+        self.mode = mode
+        self.last_used = time()
+        self._lock = Lock()
+        started = time()
+        self._process = Popen(["git", "cat-file", mode], stdin=PIPE,
+                              stdout=PIPE, stderr=PIPE, cwd=root)
+        stats.record("cat-file start", time() - started)
+
+    @property
+    def alive(self):
+        return self._process.poll() is None
+
+    def query(self, name):
+        """Return (oid, type, size, content) of an object, None if missing.
+
+        content is None for --batch-check processes.
+        """
+        started = time()
+        with self._lock:
+            self.last_used = started
+            self._process.stdin.write(name.encode("utf-8") + b"\n")
+            self._process.stdin.flush()
+            header = self._process.stdout.readline().split()
+            if len(header) != 3:
+                result = None
+            else:
+                oid, type_, size = header
+                content = None
+                if self.mode == "--batch":
+                    content = self._process.stdout.read(int(size))
+                    # Trailing newline
+                    self._process.stdout.read(1)
+                result = (oid.decode("ascii"), type_.decode("ascii"),
+                          int(size), content)
+        elapsed = time() - started
+        stats.record("cat-file " + self.mode, elapsed)
+        tracing.record(["git", "cat-file", self.mode, name], self.root,
+                       elapsed, result[2] if result else 0,
+                       0 if result else 1)
+        return result
+
+    def close(self):
+        """Stop the process."""
+        with self._lock:
+            if self.alive:
+                self._process.stdin.close()
+                self._process.wait()
+
+
+class WorkerPool:
+    """Long lived git processes per repository and bounded command runners.
+
+    Object and ref lookups go through persistent cat-file processes,
+    paying git startup once per repository instead of once per call.
+    Processes unused for IDLE_TIMEOUT seconds are stopped.
+    """
+
+    def __init__(self, max_runners=MAX_RUNNERS):
+        self._workers = {}
+        self._lock = Lock()
+        self._runners = BoundedSemaphore(max_runners)
+        self._reaper = None
+
+    def _get_worker(self, root, mode):
+        with self._lock:
+            worker = self._workers.get((root, mode))
+            if worker is None or not worker.alive:
+                worker = CatFile(root, mode)
+                self._workers[(root, mode)] = worker
+            if self._reaper is None:
+                self._reaper = Thread(target=self._reap)
+                self._reaper.daemon = True
+                self._reaper.start()
+            return worker
+
+    def _reap(self):
+        """Stop idle workers, until there's none left."""
+        while True:
+            sleep(IDLE_TIMEOUT / 2.0)
+            with self._lock:
+                now = time()
+                for key, worker in list(self._workers.items()):
+                    if now - worker.last_used > IDLE_TIMEOUT:
+                        del self._workers[key]
+                        worker.close()
+                if not self._workers:
+                    self._reaper = None
+                    return
+
+    def _query(self, root, mode, name):
+        try:
+            return self._get_worker(root, mode).query(name)
+        except (IOError, OSError, ValueError):
+            # The process died or got reaped meanwhile, start a new one
+            return self._get_worker(root, mode).query(name)
+
+    def read_object(self, root, name):
+        """Return (oid, type, size, content) of an object, None if missing."""
+        return self._query(root, "--batch", name)
+
+    def object_info(self, root, name):
+        """Return (oid, type, size, None) of an object, None if missing."""
+        return self._query(root, "--batch-check", name)
+
+    def rev_parse(self, root, name):
+        """Return the oid a revision (e.g. HEAD^{tree}) resolves to."""
+        info = self.object_info(root, name)
+        return info[0] if info else None
+
+    def run(self, cmd, working_dir, low_priority=False):
+        """Execute a command, at most max_runners of them at once."""
+        started = time()
+        with self._runners:
+            output = execute_raw(cmd, working_dir, low_priority)
+        stats.record("command", time() - started)
+        return output
+
+    def close(self, root):
+        """Stop the processes of a repository."""
+        with self._lock:
+            for key in list(self._workers):
+                if key[0] == root:
+                    self._workers.pop(key).close()
+
+    def close_all(self):
+        """Stop every process."""
+        with self._lock:
+            for worker in self._workers.values():
+                worker.close()
+            self._workers.clear()
+
+
+workers = WorkerPool()
@@ -0,0 +1,140 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from os import path, sep, stat, walk
+from threading import Lock
+
+# Refs stored in the worktree own git directory rather than the common one
+PER_WORKTREE_REFS = ("refs/bisect/", "refs/worktree/", "refs/rewritten/")
+# HEAD of repositories using the reftable backend, unreadable from here
+REFTABLE_HEAD = "refs/heads/.invalid"
+MAX_SYMREF_DEPTH = 5
+
+
+def _read_line(file_path):
+    try:
+        with open(file_path, 'r') as obj:
+            return obj.readline().strip()
+    except (IOError, OSError):
+        return None
+
+
+class PackedRefs:
+    """Content of packed-refs files, reparsed only when they change."""
+
+    def __init__(self):
+        self._files = {}
+        self._lock = Lock()
+
+    def get(self, common_dir):
+        """Return a dict of refname -> oid."""
+        file_path = path.join(common_dir, "packed-refs")
+        try:
+            fstat = stat(file_path)
+            stamp = fstat.st_mtime, fstat.st_size, fstat.st_ino
+        except OSError:
+            return {}
+        with self._lock:
+            cached = self._files.get(file_path)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+        refs = {}
+        try:
+            with open(file_path, 'r') as obj:
+                for line in obj:
+                    # Skip the header and peeled tags
+                    if line[0] in "#^":
+                        continue
+                    oid, _, refname = line.strip().partition(" ")
+                    refs[refname] = oid
+        except (IOError, OSError):
+            return {}
+        with self._lock:
+            self._files[file_path] = (stamp, refs)
+        return refs
+
+
+packed_refs = PackedRefs()
+
+
+def _ref_dir(repository, refname):
+    """Return the directory a ref is stored in."""
+    if "/" not in refname or refname.startswith(PER_WORKTREE_REFS):
+        return repository.git_dir
+    return repository.common_dir
+
+
+def get_head(repository):
+    """Return what HEAD points to: a refname, or an oid when detached.
+
+    Returns None if HEAD can't be read natively (e.g. reftable).
+    """
+    content = _read_line(path.join(repository.git_dir, "HEAD"))
+    if not content:
+        return None
+    if content.startswith("ref:"):
+        content = content[4:].strip()
+        if content == REFTABLE_HEAD:
+            return None
+    return content
+
+
+def resolve_ref(repository, refname):
+    """Return the oid a ref points to, following symbolic refs."""
+    for _ in range(MAX_SYMREF_DEPTH):
+        content = _read_line(path.join(_ref_dir(repository, refname),
+                                       refname))
+        if content is None:
+            return packed_refs.get(repository.common_dir).get(refname)
+        if not content.startswith("ref:"):
+            return content
+        refname = content[4:].strip()
+    return None
+
+
+def get_branch(repository):
+    """Return the current branch name, None when detached or unknown."""
+    head = get_head(repository)
+    if head and head.startswith("refs/heads/"):
+        return head[len("refs/heads/"):]
+    return None
+
+
+def is_detached(repository):
+    """Whether HEAD points directly to a commit."""
+    head = get_head(repository)
+    return bool(head) and not head.startswith("refs/")
+
+
+def list_refs(repository, prefix="refs/heads/"):
+    """Return a dict of refname -> oid of every ref under prefix."""
+    refs = dict((refname, oid) for refname, oid in
+                packed_refs.get(repository.common_dir).items()
+                if refname.startswith(prefix))
+    base = path.join(repository.common_dir, prefix.rstrip("/"))
+    for directory, _, files in walk(base):
+        for filename in files:
+            if filename.endswith(".lock"):
+                continue
+            file_path = path.join(directory, filename)
+            refname = file_path[len(repository.common_dir) + 1:]
+            content = _read_line(file_path)
+            if content and not content.startswith("ref:"):
+                refs[refname.replace(sep, "/")] = content
+    return refs
@@ -0,0 +1,203 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from os import environ
+from sys import path as sys_path
+
+from gi.repository import GObject
+
+sys_path.insert(0, environ["SRC_DIR"])
+from diff import prefetch_patches
+from git import Git
+from tasks import run_async, run_in_background
+from watchdog import subscribe, unsubscribe
+
+
+class Request:
+    """A consumer waiting for a shared computation."""
+
+    def __init__(self, model, key, callback, error_callback=None):
+        self._model = model
+        self.key = key
+        self.callback = callback
+        self.error_callback = error_callback
+        self.done = False
+
+    def cancel(self):
+        """Stop waiting, the computation stops if nobody else waits."""
+        self._model._cancel(self)
+
+
+class RepositoryModel(GObject.GObject):
+    """State of a repository shared by every widget showing it.
+
+    Computations are keyed: requesting one already in flight waits for
+    it instead of starting another. Must be used from the main thread.
+    """
+    __gsignals__ = {
+        'changed': (GObject.SIGNAL_RUN_FIRST, None, ())
+    }
+
+    def __init__(self, git):
+        GObject.GObject.__init__(self)
+        self.git = git
+        self.consumers = 0
+        # key -> [task, func, requests]
+        self._pending = {}
+        self._prefetch = None
+        self._watch = subscribe(git.dir, self._on_refresh)
+
+    @property
+    def root(self):
+        return self.git.dir
+
+    def request(self, key, func, callback, error_callback=None):
+        """Call callback with func() computed in a worker thread.
+
+        error_callback is called with the exception func raised instead.
+        """
+        request = Request(self, key, callback, error_callback)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = [self._start(key, func), func, []]
+            self._pending[key] = pending
+        pending[2].append(request)
+        return request
+
+    def load_state(self, callback, error_callback=None):
+        """Request the branch and the changes of the repository."""
+        return self.request("state", self._get_state, callback,
+                            error_callback)
+
+    def load_index_summary(self, callback, error_callback=None):
+        """Request the staged and unstaged files read from the index."""
+        return self.request("index_summary", self.git.get_index_summary,
+                            callback, error_callback)
+
+    def prefetch_patches(self, state):
+        """Compute the patches of the changed files in the background.
+
+        Runs on its own low priority worker, replacing the prefetch of
+        an older state. Return the task, to cancel it.
+        """
+        self.cancel_prefetch()
+        renamed = set(state['status']['renamed'])
+        paths = [file_path for file_path in state['modified']
+                 if file_path not in renamed]
+        self._prefetch = run_in_background(prefetch_patches, self.git,
+                                           paths)
+        return self._prefetch
+
+    def cancel_prefetch(self):
+        """Stop computing patches ahead of time."""
+        if self._prefetch is not None:
+            self._prefetch.cancel()
+            self._prefetch = None
+
+    def _get_state(self):
+        try:
+            remote_url = self.git.get_remote_url()
+        except RuntimeWarning:
+            remote_url = None
+        # A single snapshot, every field then describes the same state
+        snapshot = self.git.get_snapshot()
+        return {
+            'branch': self.git.get_branch(snapshot),
+            'project_branch': self.git.get_project_branch(snapshot),
+            'remote_url': remote_url,
+            'modified': self.git.get_modified(snapshot),
+            'status': self.git.get_status(snapshot),
+            'mode': snapshot.mode,
+            'slow': self.git.would_benefit_from_caches()
+        }
+
+    def _start(self, key, func):
+        return run_async(func,
+                         callback=lambda result: self._done(key, result),
+                         error_callback=lambda error: self._failed(key,
+                                                                   error))
+
+    def _done(self, key, result):
+        _, _, requests = self._pending.pop(key)
+        for request in requests:
+            request.done = True
+            request.callback(result)
+
+    def _failed(self, key, error):
+        """Let the consumers know, the next request starts over."""
+        _, _, requests = self._pending.pop(key)
+        for request in requests:
+            request.done = True
+            if request.error_callback:
+                request.error_callback(error)
+
+    def _cancel(self, request):
+        pending = self._pending.get(request.key)
+        if pending is None or request not in pending[2]:
+            return
+        pending[2].remove(request)
+        if not pending[2]:
+            pending[0].cancel()
+            del self._pending[request.key]
+
+    def _on_refresh(self, watchdog):
+        self.reload()
+
+    def reload(self):
+        """Restart what's in flight, it may have read the old state."""
+        self.cancel_prefetch()
+        for key, pending in self._pending.items():
+            pending[0].cancel()
+            pending[0] = self._start(key, pending[1])
+        self.emit("changed")
+
+    def close(self):
+        """Stop watching the repository and computing anything."""
+        unsubscribe(self._watch)
+        self.cancel_prefetch()
+        for pending in self._pending.values():
+            pending[0].cancel()
+        self._pending.clear()
+
+
+_models = {}
+
+
+def acquire(uri, on_changed):
+    """Return the shared model of the repository at uri.
+
+    on_changed is called when the repository changes, release the model
+    with the returned handler once done with it.
+    """
+    git = Git(uri)
+    model = _models.get(git.dir)
+    if model is None:
+        model = RepositoryModel(git)
+        _models[git.dir] = model
+    model.consumers += 1
+    return model, model.connect("changed", on_changed)
+
+
+def release(model, handler_id):
+    """Release a model, closing it with its last consumer."""
+    model.disconnect(handler_id)
+    model.consumers -= 1
+    if model.consumers <= 0:
+        model.close()
+        _models.pop(model.root, None)
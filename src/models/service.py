@@ -0,0 +1,168 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+import socket
+from json import dumps, loads
+from os import environ, getuid, lstat, path
+from stat import S_ISDIR, S_IMODE
+from sys import path as sys_path
+from tempfile import gettempdir
+from threading import Thread, local
+from time import time
+
+sys_path.insert(0, environ["SRC_DIR"])
+import tracing
+from pool import stats
+
+# Seconds an answer may take, the service applies the status time budget
+# itself so this is only reached when it hangs.
+CALL_TIMEOUT = 5
+# Seconds to wait for a running git status to finish
+WAIT_TIMEOUT = 60
+# Seconds during which a service found not running isn't tried again
+RETRY_DELAY = 10
+
+
+def get_runtime_dir():
+    """Return the private directory of the service socket."""
+    runtime_dir = environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return path.join(runtime_dir, "nautilus-git")
+    return path.join(gettempdir(), "nautilus-git-{0}".format(getuid()))
+
+
+def is_private(directory):
+    """Whether a directory is owned by the user and only accessible to it.
+
+    Otherwise another user could have created it, e.g. in /tmp, and
+    listen on the socket instead of the service.
+    """
+    try:
+        dstat = lstat(directory)
+    except OSError:
+        return False
+    return (S_ISDIR(dstat.st_mode) and dstat.st_uid == getuid() and
+            not S_IMODE(dstat.st_mode) & 0o077)
+
+
+def get_socket_path():
+    """Return the path of the socket the status service listens on."""
+    return path.join(get_runtime_dir(), "status.sock")
+
+
+def encode(message):
+    """Encode a request or answer, one JSON document per line."""
+    return dumps(message, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def decode(line):
+    return loads(line.decode("utf-8"))
+
+
+class ServiceClient:
+    """Connection to the status service shared by file manager processes.
+
+    Every thread keeps its own connection. call returns None whenever
+    the service isn't running or fails, callers then compute the answer
+    in-process; it isn't tried again before RETRY_DELAY seconds.
+    """
+
+    def __init__(self, socket_path=None):
+        self.enabled = True
+        self._socket_path = socket_path
+        self._local = local()
+        self._retry_at = 0
+
+    def _connect(self, timeout):
+        socket_path = self._socket_path or get_socket_path()
+        if not is_private(path.dirname(socket_path)):
+            raise IOError("The status service directory isn't private")
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(timeout)
+        try:
+            connection.connect(socket_path)
+        except (socket.error, IOError, OSError):
+            connection.close()
+            raise
+        return connection, connection.makefile("rb")
+
+    def _disconnect(self):
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection is not None:
+            connection[1].close()
+            connection[0].close()
+
+    def _send(self, request, timeout):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect(timeout)
+            self._local.connection = connection
+        connection[0].settimeout(timeout)
+        connection[0].sendall(request)
+        line = connection[1].readline()
+        if not line:
+            raise IOError("The status service closed the connection")
+        return line
+
+    def call(self, method, timeout=CALL_TIMEOUT, **params):
+        """Return the result of a method of the service, None on failure."""
+        if not self.enabled or time() < self._retry_at:
+            return None
+        params["method"] = method
+        request = encode(params)
+        started = time()
+        try:
+            try:
+                line = self._send(request, timeout)
+            except socket.timeout:
+                raise
+            except (socket.error, IOError, OSError):
+                # The service may have restarted since the last call
+                self._disconnect()
+                line = self._send(request, timeout)
+            answer = decode(line)
+        except (socket.error, IOError, OSError, ValueError):
+            self._disconnect()
+            self._retry_at = time() + RETRY_DELAY
+            return None
+        elapsed = time() - started
+        stats.record("service " + method, elapsed)
+        tracing.record(["nautilus-git-service", method],
+                       params.get("root"), elapsed, len(line),
+                       1 if "error" in answer else 0)
+        return answer.get("result")
+
+    def call_later(self, callback, method, **params):
+        """Call a method from a thread, then callback with its result.
+
+        Meant for the long ones, e.g. waiting for git status; callback
+        is called from that thread, with None if the call failed.
+        """
+        def run():
+            result = self.call(method, WAIT_TIMEOUT + CALL_TIMEOUT,
+                               **params)
+            self._disconnect()
+            callback(result)
+        thread = Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+
+client = ServiceClient()
@@ -0,0 +1,104 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from os import path
+
+# Statuses by increasing priority, a directory shows its highest one
+UNTRACKED = "untracked"
+STAGED = "staged"
+MODIFIED = "modified"
+CONFLICTED = "conflicted"
+PRIORITY = [UNTRACKED, STAGED, MODIFIED, CONFLICTED]
+
+
+def get_entry_status(entry):
+    """Return the status of a StatusEntry."""
+    if entry.index == "?":
+        return UNTRACKED
+    if entry.index == "U" or entry.worktree == "U" or \
+            entry.index + entry.worktree in ("AA", "DD"):
+        return CONFLICTED
+    if entry.worktree != ".":
+        return MODIFIED
+    return STAGED
+
+
+class StatusIndex:
+    """Status of every changed file and directory of a repository.
+
+    Built once from a StatusSnapshot, it answers the status of any path
+    with a dict lookup, directories getting the status of their most
+    important change.
+    """
+
+    def __init__(self, root, snapshot):
+        self.root = root
+        self._paths = {}
+        # Wholly untracked directories, reported as "dir/" by git status
+        self._untracked_dirs = set()
+        for entry in snapshot.entries:
+            status = get_entry_status(entry)
+            file_path = entry.path.rstrip("/")
+            if entry.path.endswith("/"):
+                self._untracked_dirs.add(file_path)
+            self._paths[file_path] = status
+            # Propagate the status to the parent directories
+            parent = path.dirname(file_path)
+            while parent:
+                current = self._paths.get(parent)
+                if current is not None and \
+                        PRIORITY.index(current) >= PRIORITY.index(status):
+                    break
+                self._paths[parent] = status
+                parent = path.dirname(parent)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def _relative(self, file_path):
+        if file_path == self.root:
+            return ""
+        if not file_path.startswith(self.root + "/"):
+            return None
+        return file_path[len(self.root) + 1:].rstrip("/")
+
+    def get(self, file_path):
+        """Return the status of an absolute path, None if unchanged."""
+        relative = self._relative(file_path)
+        if not relative:
+            return None
+        status = self._paths.get(relative)
+        if status is None and self._untracked_dirs:
+            parent = path.dirname(relative)
+            while parent:
+                if parent in self._untracked_dirs:
+                    return UNTRACKED
+                parent = path.dirname(parent)
+        return status
+
+    def changed_paths(self, other):
+        """Return the absolute paths whose status differs from other's."""
+        paths = set(self._paths) | set(other._paths) if other else \
+            set(self._paths)
+        changed = set()
+        for relative in paths:
+            old = other._paths.get(relative) if other else None
+            if self._paths.get(relative) != old:
+                changed.add(path.join(self.root, relative))
+        return changed
@@ -0,0 +1,156 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from os import environ
+from sys import path as sys_path
+from threading import Lock, Thread
+from traceback import print_exc
+
+# Try Python2 imports
+try:
+    from Queue import Queue
+
+# Python3 imports
+except ImportError:
+    from queue import Queue
+
+from gi.repository import GLib
+
+sys_path.insert(0, environ["SRC_DIR"])
+import tracing
+from utils import Cancellable, set_current_cancellable
+
+MAX_WORKERS = 4
+# Threads of the pool running work nobody waits for, e.g. prefetching
+MAX_BACKGROUND_WORKERS = 1
+
+
+class Task:
+    """A function running on a worker thread."""
+
+    def __init__(self, func, args, callback, error_callback=None):
+        self._func = func
+        self._args = args
+        self._callback = callback
+        self._error_callback = error_callback
+        self.cancellable = Cancellable()
+        self.done = False
+        self._origin = None
+        if tracing.enabled:
+            # Attribute the commands of the task to the submitting widget
+            caller = tracing.get_origin() or tracing.find_caller()
+            self._origin = caller.split(".")[0] if caller else None
+
+    def cancel(self):
+        """Cancel the task, killing the command it may be running.
+
+        The callbacks are never called once the task has been cancelled.
+        """
+        self.cancellable.cancel()
+
+    @property
+    def cancelled(self):
+        return self.cancellable.is_cancelled()
+
+    def run(self):
+        """Run the task, to be called from a worker thread."""
+        if self.cancelled:
+            self.done = True
+            return
+        set_current_cancellable(self.cancellable)
+        tracing.set_origin(self._origin)
+        try:
+            result = self._func(*self._args)
+        except Exception as error:
+            if self.cancelled:
+                self.done = True
+                return
+            print_exc()
+            if self._error_callback:
+                GLib.idle_add(self._fail, error)
+            else:
+                self.done = True
+            return
+        finally:
+            set_current_cancellable(None)
+            tracing.set_origin(None)
+        if self._callback:
+            GLib.idle_add(self._finish, result)
+        else:
+            self.done = True
+
+    def _finish(self, result):
+        """Hand the result over to the callback in the main thread."""
+        self.done = True
+        if not self.cancelled:
+            self._callback(result)
+        return False
+
+    def _fail(self, error):
+        """Hand the error over to the error callback in the main thread."""
+        self.done = True
+        if not self.cancelled:
+            self._error_callback(error)
+        return False
+
+
+class WorkerPool:
+    """A bounded set of threads running tasks in submission order."""
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._max_workers = max_workers
+        self._queue = Queue()
+        self._workers = []
+        self._lock = Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """Run func(*args) off the main thread.
+
+        The optional callback keyword is called in the GTK main thread
+        with the value returned by func, error_callback with the
+        exception it raised.
+        """
+        task = Task(func, args, kwargs.get("callback"),
+                    kwargs.get("error_callback"))
+        self._queue.put(task)
+        with self._lock:
+            if len(self._workers) < self._max_workers:
+                worker = Thread(target=self._work)
+                worker.daemon = True
+                worker.start()
+                self._workers.append(worker)
+        return task
+
+    def _work(self):
+        while True:
+            self._queue.get().run()
+
+
+pool = WorkerPool()
+background_pool = WorkerPool(MAX_BACKGROUND_WORKERS)
+
+
+def run_async(func, *args, **kwargs):
+    """Submit a task to the shared worker pool."""
+    return pool.submit(func, *args, **kwargs)
+
+
+def run_in_background(func, *args, **kwargs):
+    """Submit a task nobody waits for, kept off the shared worker pool."""
+    return background_pool.submit(func, *args, **kwargs)
@@ -17,40 +17,151 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
 """
-from os import path, stat
-from threading import Thread
-from time import sleep
+from os import path, walk
 
-from gi.repository import GLib, GObject
+from gi.repository import Gio, GLib, GObject
 
+from budget import budget
+from cache import repository_cache
+from discovery import find_repository
+from pool import workers
 
-class WatchDog(Thread, GObject.GObject):
+# Files directly under the git directories whose change means the
+# repository changed.
+WATCHED_FILES = ["HEAD", "index", "packed-refs"]
+# Events are coalesced until nothing happened for DEBOUNCE_MS, but a
+# refresh is never delayed more than MAX_DELAY_MS (e.g. a long rebase).
+DEBOUNCE_MS = 300
+MAX_DELAY_MS = 2000
+
+
+class WatchDog(GObject.GObject):
+    """Kernel backed monitor of a repository shared by every subscriber."""
     __gsignals__ = {
         'refresh': (GObject.SIGNAL_RUN_FIRST, None, ())
     }
 
     def __init__(self, git_path):
-        Thread.__init__(self)
         GObject.GObject.__init__(self)
-        self.daemon = True
         self.name = git_path
-        self._to_watch = path.join(git_path, ".git", "HEAD")
-        self.alive = path.exists(self._to_watch)
-        self._modified_time = None
-        self.start()
-
-    def emit(self, *args):
-        GLib.idle_add(GObject.GObject.emit, self, *args)
-
-    def run(self):
-        while self.alive:
-            fstat = stat(self._to_watch)
-            modified = fstat.st_mtime
-            if modified and modified != self._modified_time:
-                if self._modified_time is not None:
-                    self.emit("refresh")
-                self._modified_time = modified
-            sleep(1)
+        self.subscribers = 0
+        repository = find_repository(git_path)
+        if repository:
+            self._git_dirs = set([repository.git_dir, repository.common_dir])
+            self._refs_dir = path.join(repository.common_dir, "refs")
+        else:
+            self._git_dirs = set()
+            self._refs_dir = path.join(git_path, ".git", "refs")
+        self._monitors = {}
+        self._timeout_id = None
+        self._first_event = None
+
+        for git_dir in self._git_dirs:
+            self._monitor(git_dir)
+        for directory, _, _ in walk(self._refs_dir):
+            self._monitor(directory)
+
+    def _monitor(self, directory):
+        """Start monitoring a directory, if not already done."""
+        if directory in self._monitors or not path.isdir(directory):
+            return
+        try:
+            monitor = Gio.File.new_for_path(directory).monitor_directory(
+                Gio.FileMonitorFlags.NONE, None)
+        except GLib.Error:
+            return
+        monitor.connect("changed", self._on_changed)
+        self._monitors[directory] = monitor
+
+    def _is_relevant(self, file_path):
+        """Whether a changed path affects the repository state."""
+        if file_path.endswith(".lock"):
+            return False
+        if file_path.startswith(self._refs_dir + path.sep):
+            return True
+        return path.basename(file_path) in WATCHED_FILES and \
+            path.dirname(file_path) in self._git_dirs
+
+    def _on_changed(self, monitor, file_, other_file, event_type):
+        file_path = file_.get_path()
+        if not file_path or not self._is_relevant(file_path):
+            return
+        if event_type == Gio.FileMonitorEvent.CREATED and \
+                path.isdir(file_path):
+            for directory, _, _ in walk(file_path):
+                self._monitor(directory)
+        self._schedule()
+
+    def _schedule(self):
+        """Debounce the refresh signal."""
+        now = GLib.get_monotonic_time() // 1000
+        if self._timeout_id is not None:
+            if now - self._first_event >= MAX_DELAY_MS:
+                return
+            GLib.source_remove(self._timeout_id)
+        else:
+            self._first_event = now
+        self._timeout_id = GLib.timeout_add(DEBOUNCE_MS, self._fire)
+
+    def _fire(self):
+        self._timeout_id = None
+        self._first_event = None
+        repository_cache.invalidate(self.name)
+        self.emit("refresh")
+        return False
 
     def kill(self):
-        self.alive = False
+        """Stop monitoring the repository."""
+        if self._timeout_id is not None:
+            GLib.source_remove(self._timeout_id)
+            self._timeout_id = None
+        for monitor in self._monitors.values():
+            monitor.cancel()
+        self._monitors.clear()
+
+
+_watchdogs = {}
+
+
+def _notify(git_path):
+    """Let the subscribers know without dropping the cached values."""
+    watchdog = _watchdogs.get(git_path)
+    if watchdog is not None:
+        watchdog.emit("refresh")
+    return False
+
+
+def _on_late_result(repository, key, result):
+    """A computation which exceeded its budget finished."""
+    GLib.idle_add(_notify, repository.root)
+
+
+budget.add_listener(_on_late_result)
+
+
+def subscribe(git_path, callback):
+    """Call callback on every change of the repository.
+
+    Returns a token to pass to unsubscribe once the caller goes away.
+    """
+    watchdog = _watchdogs.get(git_path)
+    if watchdog is None:
+        watchdog = WatchDog(git_path)
+        _watchdogs[git_path] = watchdog
+    watchdog.subscribers += 1
+    return git_path, watchdog.connect("refresh", callback)
+
+
+def unsubscribe(token):
+    """Stop a subscription, the monitor goes away with its last one."""
+    git_path, handler_id = token
+    watchdog = _watchdogs.get(git_path)
+    if watchdog is None:
+        return
+    watchdog.disconnect(handler_id)
+    watchdog.subscribers -= 1
+    if watchdog.subscribers <= 0:
+        watchdog.kill()
+        del _watchdogs[git_path]
+        # Nobody looks at the repository anymore
+        workers.close(git_path)
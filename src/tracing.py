@@ -0,0 +1,222 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from atexit import register
+from json import dump
+from logging import getLogger
+from os import environ, path
+from sys import _getframe
+from threading import Lock, local
+from time import time
+
+# Set NAUTILUS_GIT_TRACE=1 to record every git command, the summary is
+# written to NAUTILUS_GIT_TRACE_FILE (or logged) at exit and on SIGUSR1.
+enabled = environ.get("NAUTILUS_GIT_TRACE", "") not in ("", "0")
+TRACE_FILE = environ.get("NAUTILUS_GIT_TRACE_FILE")
+SLOW_MS = float(environ.get("NAUTILUS_GIT_SLOW_MS", "200"))
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+MAX_SLOW_CALLS = 100
+# Modules plumbing commands, callers are looked for above them
+PLUMBING = ("utils.py", "tracing.py", "pool.py", "tasks.py", "cache.py",
+            "repository.py", "threading.py", "checkout.py", "service.py")
+
+logger = getLogger("nautilus-git")
+_local = local()
+
+
+def get_origin():
+    """Return the widget the current thread works for."""
+    return getattr(_local, "origin", None)
+
+
+def set_origin(origin):
+    """Attribute the commands of this thread to a widget."""
+    _local.origin = origin
+
+
+def find_caller(depth=2):
+    """Return Class.method (or function) of the first non plumbing frame.
+
+    Private helpers, lambdas and closures are skipped in favour of the
+    public method using them, when there's one.
+    """
+    try:
+        frame = _getframe(depth)
+    except ValueError:
+        return None
+    caller = None
+    while frame is not None:
+        filename = path.basename(frame.f_code.co_filename)
+        if filename not in PLUMBING:
+            instance = frame.f_locals.get("self")
+            name = frame.f_code.co_name
+            if instance is not None:
+                current = "{0}.{1}".format(type(instance).__name__, name)
+            else:
+                current = "{0}:{1}".format(filename, name)
+            caller = caller or current
+            if not name.startswith(("_", "<")) and name != "compute":
+                return current
+        frame = frame.f_back
+    return caller
+
+
+def get_kind(cmd):
+    """Return the type of a command, e.g. "status" for git status."""
+    if isinstance(cmd, (list, tuple)):
+        words = [word for word in cmd if not word.startswith("-")]
+    else:
+        words = cmd.split()
+    if len(words) > 1 and words[0] == "git":
+        return words[1]
+    return words[0] if words else ""
+
+
+class Histogram:
+    """Latencies of one type of command."""
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.output_bytes = 0
+        self.failures = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, elapsed_ms, output_bytes, status):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.output_bytes += output_bytes
+        if status:
+            self.failures += 1
+        for i, bound in enumerate(BUCKETS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def to_dict(self):
+        labels = ["<={0}ms".format(bound) for bound in BUCKETS] + \
+            [">{0}ms".format(BUCKETS[-1])]
+        return {
+            'calls': self.calls,
+            'total_ms': self.total_ms,
+            'average_ms': self.total_ms / self.calls if self.calls else 0,
+            'max_ms': self.max_ms,
+            'output_bytes': self.output_bytes,
+            'failures': self.failures,
+            'histogram': dict(zip(labels, self.buckets))
+        }
+
+
+class Tracer:
+    """Per command type histograms and the list of slow calls."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._histograms = {}
+        self._callers = {}
+        self.slow_calls = []
+
+    def record(self, cmd, working_dir, elapsed, output_bytes, status,
+               caller=None):
+        elapsed_ms = elapsed * 1000
+        kind = get_kind(cmd)
+        caller = caller or find_caller(3)
+        origin = get_origin()
+        with self._lock:
+            self._histograms.setdefault(kind, Histogram()).add(
+                elapsed_ms, output_bytes, status)
+            self._callers.setdefault(caller, Histogram()).add(
+                elapsed_ms, output_bytes, status)
+            if elapsed_ms < SLOW_MS:
+                return
+            call = {
+                'command': cmd if isinstance(cmd, str) else " ".join(cmd),
+                'repository': working_dir,
+                'caller': caller,
+                'widget': origin,
+                'elapsed_ms': elapsed_ms,
+                'output_bytes': output_bytes,
+                'status': status,
+                'time': time()
+            }
+            self.slow_calls.append(call)
+            del self.slow_calls[:-MAX_SLOW_CALLS]
+        logger.warning("Slow git call (%.0f ms) from %s in %s: %s",
+                       elapsed_ms, origin or caller, working_dir,
+                       call['command'])
+
+    def summary(self):
+        """Return the collected data as a dict."""
+        with self._lock:
+            return {
+                'commands': dict((kind, histogram.to_dict()) for
+                                 kind, histogram in self._histograms.items()),
+                'callers': dict((str(caller), histogram.to_dict()) for
+                                caller, histogram in self._callers.items()),
+                'slow_calls': list(self.slow_calls)
+            }
+
+    def dump(self, file_path=None):
+        """Write the summary to a JSON file, or log it."""
+        summary = self.summary()
+        file_path = file_path or TRACE_FILE
+        if file_path:
+            with open(file_path, 'w') as obj:
+                dump(summary, obj, indent=2, sort_keys=True)
+            return
+        for kind, histogram in sorted(summary['commands'].items()):
+            logger.warning("git %s: %d calls, %.1f ms average, %.1f ms max",
+                           kind, histogram['calls'], histogram['average_ms'],
+                           histogram['max_ms'])
+
+
+tracer = Tracer()
+
+
+def record(cmd, working_dir, elapsed, output_bytes=0, status=0,
+           caller=None):
+    """Record a finished command, when tracing is enabled."""
+    if enabled:
+        tracer.record(cmd, working_dir, elapsed, output_bytes, status,
+                      caller)
+
+
+def dump_summary(*args):
+    """Dump the summary, usable as a signal handler."""
+    tracer.dump()
+    return True
+
+
+def _install():
+    register(dump_summary)
+    try:
+        from signal import SIGUSR1
+        from gi.repository import GLib
+        GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, SIGUSR1, dump_summary)
+    except (ImportError, AttributeError):
+        pass
+
+
+if enabled:
+    _install()
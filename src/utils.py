@@ -17,17 +17,82 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
 """
-from os import path
+from os import environ, nice
 from subprocess import PIPE, Popen
+from sys import path as sys_path
+from threading import Event, Lock, local
+from time import time
 
 # Try Python2 imports
 try:
-    from urllib2 import unquote
+    from urllib2 import quote, unquote
     from urlparse import urlsplit
 
 # Python3 imports
 except ImportError or ModuleNotFoundError:
-    from urllib.parse import urlsplit, unquote
+    from urllib.parse import quote, urlsplit, unquote
+
+import tracing
+
+# Niceness added to low priority commands, e.g. prefetching
+LOW_PRIORITY_NICENESS = 10
+
+sys_path.insert(0, environ["MODELS_DIR"])
+from discovery import find_repository
+
+
+_local = local()
+
+
+class Cancelled(Exception):
+    """The command was killed because its operation got cancelled."""
+
+
+class Cancellable:
+    """Thread safe cancellation flag with cancel callbacks."""
+
+    def __init__(self):
+        self._event = Event()
+        self._lock = Lock()
+        self._callbacks = []
+
+    def cancel(self):
+        """Cancel the operation and run the registered callbacks."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback()
+
+    def is_cancelled(self):
+        """Whether cancel was called."""
+        return self._event.is_set()
+
+    def connect(self, callback):
+        """Call callback on cancel, right away if already cancelled."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def disconnect(self, callback):
+        """Remove a callback added with connect."""
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+def get_current_cancellable():
+    """Return the Cancellable of the operation running in this thread."""
+    return getattr(_local, "cancellable", None)
+
+
+def set_current_cancellable(cancellable):
+    """Make every command executed from this thread cancellable."""
+    _local.cancellable = cancellable
 
 
 def get_file_path(uri):
@@ -38,34 +103,68 @@ def get_file_path(uri):
     return None
 
 
+def get_uri(file_path):
+    """Return the file uri of a path."""
+    return "file://" + quote(file_path)
+
+
 def is_git(folder_path):
     """Verify if the current folder_path is a git directory."""
     folder_path = get_file_path(folder_path)
     if folder_path:
-        output = execute('git rev-parse --is-inside-work-tree',
-                         folder_path).lower()
-        return output == "true"
+        return find_repository(folder_path) is not None
     return None
 
 
 def get_real_git_dir(directory):
-    """Return the absolute path of the .git folder."""
-    dirs = directory.split("/")
-    current_path = ""
-    for i in range(len(dirs) - 1, 0, -1):
-        current_path = "/".join(dirs[0:i])
-        git_folder = path.join(current_path, ".git")
-        if path.exists(git_folder):
-            return current_path
+    """Return the absolute path of the working tree root."""
+    repository = find_repository(directory)
+    if repository:
+        return repository.root
     return None
 
 
 def execute(cmd, working_dir=None):
     """Execute a shell command."""
+    return execute_raw(cmd, working_dir).decode("utf-8").strip()
+
+
+def _lower_priority():
+    """Run in the child process before a low priority command."""
+    nice(LOW_PRIORITY_NICENESS)
+
+
+def execute_raw(cmd, working_dir=None, low_priority=False):
+    """Execute a command and return its raw output.
+
+    A list of arguments is executed directly without going through the
+    shell, which is what commands parsing NUL separated output should use.
+    Low priority commands yield the CPU to everything else. Cancelled
+    raises Cancelled, the output of a killed command being partial.
+    """
+    shell = not isinstance(cmd, (list, tuple))
+    started = time()
+    preexec_fn = _lower_priority if low_priority else None
     if working_dir:
-        command = Popen(cmd, shell=True, stdout=PIPE,
-                        stderr=PIPE, cwd=working_dir)
+        command = Popen(cmd, shell=shell, stdout=PIPE, stderr=PIPE,
+                        cwd=working_dir, preexec_fn=preexec_fn)
+    else:
+        command = Popen(cmd, stdout=PIPE, stderr=PIPE,
+                        preexec_fn=preexec_fn)
+    cancellable = get_current_cancellable()
+    if cancellable is None:
+        output = command.communicate()[0]
     else:
-        command = Popen(cmd, stdout=PIPE, stderr=PIPE)
-    output = command.communicate()[0]
-    return output.decode("utf-8").strip()
+        def kill():
+            if command.poll() is None:
+                command.kill()
+        cancellable.connect(kill)
+        try:
+            output = command.communicate()[0]
+        finally:
+            cancellable.disconnect(kill)
+    tracing.record(cmd, working_dir, time() - started, len(output),
+                   command.returncode)
+    if cancellable is not None and cancellable.is_cancelled():
+        raise Cancelled(cmd)
+    return output
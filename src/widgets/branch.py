@@ -17,30 +17,55 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
 """
+from gettext import gettext as _
+from os import environ
+from sys import path as sys_path
 from gi import require_version
 require_version("Gtk", "3.0")
-from gi.repository import GObject, Gtk
+from gi.repository import GLib, GObject, Gtk, Pango
+
+sys_path.insert(0, environ["MODELS_DIR"])
+from tasks import run_async
+
+# Store columns
+NAME, VISIBLE, WEIGHT = range(3)
 
 
 class BranchWidget(GObject.GObject):
     __gsignals__ = {
-        'refresh': (GObject.SIGNAL_RUN_FIRST, None, ())
+        'refresh': (GObject.SIGNAL_RUN_FIRST, None, ()),
+        'branch-changed': (GObject.SIGNAL_RUN_FIRST, None, (str,))
     }
 
     def __init__(self, git_uri, window):
         GObject.GObject.__init__(self)
         self._git = git_uri
+        self._current_branch = None
+        self._branches = []
+        self._visible = []
+        self._query = ""
+        self._selecting = False
+        self._task = None
+        self._checkout = None
+        self._destroyed = False
 
         self._builder = Gtk.Builder()
         self._builder.add_from_resource('/com/nautilus/git/ui/branch.ui')
         self._builder.connect_signals({
             "on_cancel": self._close_window,
             "on_apply": self._update_branch,
-            "branch_changed": self._validate_branch_name
+            "branch_changed": self._on_branch_changed,
+            "branch_selected": self._on_branch_selected,
+            "branch_activated": self._on_branch_activated
         })
 
+        self._store = self._builder.get_object("branches_store")
+        self._filter = self._builder.get_object("branches_filter")
+        self._filter.set_visible_column(VISIBLE)
+
         self._window = self._builder.get_object("window")
         self._window.set_transient_for(window)
+        self._window.connect("destroy", self._on_destroy)
         self._build_main_widget()
         self._window.show_all()
 
@@ -49,32 +74,79 @@ class BranchWidget(GObject.GObject):
         headerbar = self._builder.get_object("headerbar")
         # Set the title of the headerbar
         headerbar.set_title(self._git.get_project_branch())
+        self._builder.get_object("branch").grab_focus()
+        self._task = run_async(self._load, callback=self._on_loaded,
+                               error_callback=self._on_load_failed)
+
+    def _load(self):
+        """Get the current branch and the branches list, in a worker."""
+        return self._git.get_branch(), self._git.get_branch_list()
+
+    def _on_loaded(self, result):
+        """Fill in the branches list."""
+        self._task = None
+        self._current_branch, self._branches = result
+        view = self._builder.get_object("branches")
+        # Detach the model while filling it, views update row by row
+        view.set_model(None)
+        for branch in self._branches:
+            if branch == self._current_branch:
+                weight = Pango.Weight.BOLD
+            else:
+                weight = Pango.Weight.NORMAL
+            self._store.append([branch, True, weight])
+        view.set_model(self._filter)
+        self._visible = list(range(len(self._branches)))
+        self._filter_branches(self._query)
+
+    def _on_load_failed(self, error):
+        """Leave the list empty, a new branch can still be entered."""
+        self._task = None
+
+    def _filter_branches(self, query):
+        """Show only the branches containing the query.
+
+        When the query extends the previous one, only the rows matching
+        so far need to be checked again.
+        """
+        query = query.lower()
+        if query.startswith(self._query):
+            candidates = self._visible
+        else:
+            candidates = range(len(self._branches))
+        visible = [i for i in candidates
+                   if query in self._branches[i].lower()]
+        # Only touch the rows whose visibility changed
+        shown = set(visible)
+        for i in set(self._visible).symmetric_difference(shown):
+            self._store[i][VISIBLE] = i in shown
+        self._visible = visible
+        self._query = query
 
-        branch_entry = self._builder.get_object("branch")
-
-        # Get a list of availables branches
-        branches = self._git.get_branch_list()
-        # Get current branch
-        current_branch = self._git.get_branch()
-
-        # fill in the the branch entry
-        branch_entry.set_entry_text_column(0)
-        i = 0
-        for branch in branches:
-            if branch == current_branch:
-                active_id = i
-            branch_entry.append_text(branch)
-            i += 1
-        # Select the active one (current branch)
-        branch_entry.set_active(active_id)
-        branch_entry.grab_focus()
+    def _on_branch_changed(self, entry):
+        """Filter the list and validate the entred branch name."""
+        if not self._selecting:
+            self._filter_branches(entry.get_text().strip())
+        self._validate_branch_name(entry)
+
+    def _on_branch_selected(self, selection):
+        """Copy the selected branch in the entry, keeping the filter."""
+        model, tree_iter = selection.get_selected()
+        if tree_iter is not None:
+            self._selecting = True
+            self._builder.get_object("branch").set_text(model[tree_iter][NAME])
+            self._selecting = False
+
+    def _on_branch_activated(self, view, tree_path, column):
+        """Checkout the activated branch."""
+        self._update_branch()
 
     def _validate_branch_name(self, entry):
         """Validate the entred branch name."""
-        branch = entry.get_active_text().strip()
+        branch = entry.get_text().strip()
         apply_button = self._builder.get_object("applyButton")
         valid = True
-        if branch == self._git.get_branch() or not branch:
+        if branch == self._current_branch or not branch:
             valid = False
         else:
             valid = self._git.check_branch_name(branch)
@@ -86,11 +158,73 @@ class BranchWidget(GObject.GObject):
             entry.get_style_context().add_class("error")
 
     def _update_branch(self, *args):
-        """Update the branch."""
-        branch = self._builder.get_object("branch").get_active_text().strip()
-        self._git.update_branch(branch)
+        """Checkout the branch in a worker, showing git's progress."""
+        if (self._checkout is not None or
+                not self._builder.get_object("applyButton").get_sensitive()):
+            return
+        branch = self._builder.get_object("branch").get_text().strip()
+        self._set_busy(True)
+        progress = self._builder.get_object("progress")
+        progress.set_fraction(0)
+        progress.set_text(_("Switching to {0}").format(branch))
+        progress.show()
+        self._builder.get_object("error").hide()
+        # The location bar shows the new branch while git checks it out
+        self.emit("branch-changed", branch)
+        self._checkout = run_async(self._git.update_branch, branch,
+                                   self._on_progress,
+                                   callback=self._on_updated,
+                                   error_callback=self._on_update_failed)
+
+    def _on_progress(self, phase, fraction):
+        """Called from the worker, hand the progress to the main thread."""
+        GLib.idle_add(self._set_progress, phase, fraction)
+
+    def _set_progress(self, phase, fraction):
+        if self._checkout is not None and not self._destroyed:
+            progress = self._builder.get_object("progress")
+            progress.set_fraction(fraction)
+            progress.set_text("{0}: {1:.0%}".format(phase, fraction))
+        return False
+
+    def _on_updated(self, error):
+        """Close once checked out, show git's error otherwise."""
+        self._checkout = None
+        # Even if the window is gone, the branch shown optimistically has
+        # to be replaced by the actual one
         self.emit("refresh")
-        self._close_window()
+        if self._destroyed:
+            return
+        if error is None:
+            self._close_window()
+            return
+        self._builder.get_object("progress").hide()
+        label = self._builder.get_object("error")
+        label.set_text(error)
+        label.show()
+        self._set_busy(False)
+        self._validate_branch_name(self._builder.get_object("branch"))
+
+    def _on_update_failed(self, error):
+        """The checkout didn't even run, e.g. git is missing."""
+        self._on_updated(str(error) or error.__class__.__name__)
+
+    def _set_busy(self, busy):
+        """Lock the dialog while a checkout runs."""
+        for widget_name in ("branch", "branches", "applyButton",
+                            "cancelButton"):
+            self._builder.get_object(widget_name).set_sensitive(not busy)
+
+    def _on_destroy(self, *args):
+        """Stop loading the branches.
+
+        A checkout is left running, killing it would leave the working
+        tree half updated, and it still refreshes the repository once
+        done.
+        """
+        self._destroyed = True
+        if self._task:
+            self._task.cancel()
 
     def _close_window(self, *args):
         """Close the window."""
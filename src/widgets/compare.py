@@ -18,11 +18,25 @@ You should have received a copy of the GNU General Public License
 along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
 """
 from gettext import gettext as _
+from os import environ
+from sys import path as sys_path
 
 from gi import require_version
 require_version("Gtk", "3.0")
 require_version("GtkSource", "3.0")
-from gi.repository import Gio, GObject, Gtk, GtkSource
+from gi.repository import Gio, GLib, GObject, Gtk, GtkSource
+
+sys_path.insert(0, environ["MODELS_DIR"])
+
+from diff import format_stat
+from tasks import run_async
+
+# Bytes inserted in the buffer per idle callback
+CHUNK_SIZE = 65536
+# Patches bigger than this are shown without syntax highlighting
+MAX_HIGHLIGHT_SIZE = 512 * 1024
+# Bytes loaded before asking the user to load more
+PAGE_SIZE = 4 * 1024 * 1024
 
 
 class NautilusGitCompare:
@@ -31,13 +45,23 @@ class NautilusGitCompare:
     def __init__(self, git):
         GObject.type_register(GtkSource.View)
         self._git = git
+        self._diff = git.get_diff_set()
+        self._files = {}
+        self._current = None
+        self._tasks = []
+        self._reader = None
+        self._loaded = 0
+        self._idle_id = None
+        self._languages = GtkSource.LanguageManager.get_default()
         self._builder = Gtk.Builder()
         self._builder.add_from_resource('/com/nautilus/git/ui/compare.ui')
         self._builder.connect_signals({
-            "file_changed": self._on_file_changed
+            "file_changed": self._on_file_changed,
+            "load_more_clicked": self._on_load_more
         })
 
         self._window = self._builder.get_object("window")
+        self._window.connect("destroy", self._on_destroy)
 
         self._build_widgets()
         self._window.show_all()
@@ -51,25 +75,33 @@ class NautilusGitCompare:
         header_bar.set_title(title)
 
         self._stats = self._builder.get_object("stats")
-
-        # Build list of modified files
         self._source = self._builder.get_object("source")
-        files = self._git.get_modified()
-        files.sort()
-        liststore = Gtk.ListStore(str)
-        for filename in files:
-            liststore.append([filename])
+        self._load_more = self._builder.get_object("load_more")
 
         combobox = self._builder.get_object("files")
-        combobox.set_model(liststore)
-
         renderer_text = Gtk.CellRendererText()
         combobox.pack_start(renderer_text, True)
         combobox.add_attribute(renderer_text, "text", 0)
 
-        combobox.set_active(0)
+        # Build list of modified files
+        self._run(self._diff.get_files, callback=self._on_files_loaded)
+
+    def _run(self, func, *args, **kwargs):
+        """Run func on a worker, cancelled if the window goes away."""
+        self._tasks = [task for task in self._tasks if not task.done]
+        self._tasks.append(run_async(func, *args, **kwargs))
+
+    def _on_files_loaded(self, files):
+        """Fill the files list with the numstat results."""
+        self._files = dict((diff_file.path, diff_file) for diff_file in files)
+        liststore = Gtk.ListStore(str)
+        for filename in sorted(self._files):
+            liststore.append([filename])
+
+        combobox = self._builder.get_object("files")
+        combobox.set_model(liststore)
         # Load the buffer of the first file on the list
-        self._set_buffer(files[0])
+        combobox.set_active(0)
 
     def _on_file_changed(self, combobox):
         """File selection changed signal handler."""
@@ -81,16 +113,75 @@ class NautilusGitCompare:
 
     def _set_buffer(self, file_name):
         """Set the current content to the buffer of the file."""
-        lang_manager = GtkSource.LanguageManager()
-        language = lang_manager.guess_language(file_name, None)
-        diff = self._git.get_diff(file_name)
-        buff = GtkSource.Buffer()
-        buff.set_highlight_syntax(True)
-        buff.set_highlight_matching_brackets(True)
-        buff.set_language(language)
-        buff.props.text = diff
-        self._source.set_buffer(buff)
-        stat = self._git.get_stat(file_name)
+        stat = format_stat(self._files[file_name])
         if stat:
             self._stats.set_text(stat)
             self._stats.show()
+        else:
+            self._stats.hide()
+        # The first call starts streaming the diff, don't cancel it when
+        # the selection changes meanwhile
+        self._current = file_name
+        self._stop_loading()
+        self._run(self._diff.open_patch, file_name,
+                  callback=lambda reader: self._show_diff(file_name, reader))
+
+    def _show_diff(self, file_name, reader):
+        """Start streaming the patch of a file into a new buffer."""
+        if file_name != self._current:
+            return
+        buff = GtkSource.Buffer()
+        buff.set_highlight_matching_brackets(True)
+        if reader and reader.size <= MAX_HIGHLIGHT_SIZE:
+            buff.set_highlight_syntax(True)
+            buff.set_language(self._languages.guess_language(file_name,
+                                                             None))
+        else:
+            buff.set_highlight_syntax(False)
+        self._source.set_buffer(buff)
+        self._reader = reader
+        if reader:
+            self._load_page()
+
+    def _load_page(self):
+        """Insert the next page of the patch, chunk by chunk."""
+        self._loaded = 0
+        self._load_more.hide()
+        self._idle_id = GLib.idle_add(self._insert_chunk,
+                                      priority=GLib.PRIORITY_LOW)
+
+    def _insert_chunk(self):
+        """Idle callback appending a chunk to the buffer."""
+        text = self._reader.read(CHUNK_SIZE)
+        if text:
+            buff = self._source.get_buffer()
+            buff.insert(buff.get_end_iter(), text)
+            self._loaded += CHUNK_SIZE
+        if not self._reader.remaining:
+            self._idle_id = None
+            return False
+        if self._loaded >= PAGE_SIZE:
+            self._idle_id = None
+            self._load_more.show()
+            return False
+        return True
+
+    def _on_load_more(self, *args):
+        """Continue loading a patch bigger than a page."""
+        if self._reader and self._reader.remaining:
+            self._load_page()
+
+    def _stop_loading(self):
+        """Stop streaming the current patch."""
+        if self._idle_id is not None:
+            GLib.source_remove(self._idle_id)
+            self._idle_id = None
+        self._reader = None
+        self._load_more.hide()
+
+    def _on_destroy(self, *args):
+        """Cancel pending work and drop the spooled diff."""
+        for task in self._tasks:
+            task.cancel()
+        self._stop_loading()
+        self._diff.close()
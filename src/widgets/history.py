@@ -0,0 +1,111 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from datetime import datetime
+from gettext import gettext as _, ngettext
+from os import environ
+from sys import path as sys_path
+
+from gi import require_version
+require_version("Gtk", "3.0")
+from gi.repository import Gtk
+
+sys_path.insert(0, environ["MODELS_DIR"])
+
+from log import History
+from tasks import run_async
+
+# Pixels left below the visible rows from which the next page is loaded
+LOAD_THRESHOLD = 400
+
+
+class NautilusGitHistory:
+    """Commit history window, loaded a page at a time while scrolling."""
+
+    def __init__(self, git):
+        self._git = git
+        self._history = History(git)
+        self._task = None
+        self._count = 0
+
+        self._builder = Gtk.Builder()
+        self._builder.add_from_resource('/com/nautilus/git/ui/history.ui')
+        self._store = self._builder.get_object("store")
+        self._window = self._builder.get_object("window")
+        self._window.connect("destroy", self._on_destroy)
+
+        self._build_widgets()
+        self._window.show_all()
+
+    def _build_widgets(self):
+        """Generate the headerbar and load the first page."""
+        header_bar = self._builder.get_object("headerbar")
+        header_bar.set_title(_("History of {0}").format(
+            self._git.get_project_branch()))
+        if not self._history.uses_commit_graph:
+            header_bar.set_tooltip_text(
+                _("Writing a commit-graph makes the history faster to "
+                  "load:\ngit commit-graph write --reachable"))
+        adjustment = self._builder.get_object("scrolled").get_vadjustment()
+        adjustment.connect("value-changed", self._on_scrolled)
+        adjustment.connect("changed", self._on_scrolled)
+        self._load_page()
+
+    def _load_page(self):
+        """Request the next page unless one is already loading."""
+        if self._task is None and not self._history.finished:
+            self._builder.get_object("headerbar").set_subtitle(
+                _("Loading..."))
+            self._task = run_async(self._history.get_page,
+                                   callback=self._on_page_loaded,
+                                   error_callback=self._on_page_failed)
+
+    def _on_page_loaded(self, commits):
+        """Append a page of commits to the list."""
+        self._task = None
+        for commit in commits:
+            date = datetime.fromtimestamp(commit.date)
+            self._store.append([commit.subject, commit.author,
+                                date.strftime("%Y-%m-%d %H:%M"),
+                                commit.oid[:7]])
+        self._count += len(commits)
+        self._builder.get_object("headerbar").set_subtitle(
+            ngettext("{0} commit", "{0} commits", self._count).format(
+                self._count))
+        # The first pages may not even fill the window
+        self._on_scrolled(
+            self._builder.get_object("scrolled").get_vadjustment())
+
+    def _on_page_failed(self, error):
+        """Say so, scrolling tries again."""
+        self._task = None
+        self._builder.get_object("headerbar").set_subtitle(
+            _("The history could not be loaded"))
+
+    def _on_scrolled(self, adjustment):
+        """Load the next page when getting close to the last rows."""
+        bottom = adjustment.get_value() + adjustment.get_page_size()
+        if bottom >= adjustment.get_upper() - LOAD_THRESHOLD:
+            self._load_page()
+
+    def _on_destroy(self, *args):
+        """Stop loading, the git log is stopped off the main thread."""
+        if self._task:
+            self._task.cancel()
+        run_async(self._history.close)
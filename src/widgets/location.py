@@ -17,7 +17,8 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
 """
-from os import environ
+from gettext import gettext as _
+from os import environ, path
 from sys import path as sys_path
 from gi import require_version
 require_version("Gtk", "3.0")
@@ -27,10 +28,14 @@ from gi.repository import Gtk, Gio
 sys_path.insert(0, environ["MODELS_DIR"])
 sys_path.insert(0, environ["WIDGETS_DIR"])
 
-from git import Git
-from watchdog import WatchDog
-from branch import BranchWidget
-from compare import NautilusGitCompare
+from git import MODE_BRANCH, MODE_NO_UNTRACKED, MODE_STALE
+from repository import acquire, release
+
+# Files added to a popover list at once, more are added on demand
+PAGE_SIZE = 200
+# Rows visible before the list scrolls
+VISIBLE_ROWS = 12
+FILE_LISTS = ["added", "modified", "removed"]
 
 
 class NautilusLocation:
@@ -38,9 +43,11 @@ class NautilusLocation:
 
     def __init__(self, git_uri, window):
         self._window = window
-        self._git = Git(git_uri)
-        self._watchdog = WatchDog(self._git.dir)
-        self._watchdog.connect("refresh", self._refresh)
+        self._repository, self._handler = acquire(git_uri, self._refresh)
+        self._git = self._repository.git
+        self._task = None
+        self._remote_url = None
+        self._files = dict((name, []) for name in FILE_LISTS)
 
         self._builder = Gtk.Builder()
 
@@ -48,76 +55,220 @@ class NautilusLocation:
         self._builder.connect_signals({
             "open_remote_clicked": self._open_remote_browser,
             "compare_commits_clicked": self._compare_commits,
+            "history_clicked": self._show_history,
             "popover_clicked": self._trigger_popover,
-            "branch_clicked": self._update_branch
+            "branch_clicked": self._update_branch,
+            "show_more_clicked": self._show_more
         })
         self._build_widgets()
+        self.main.connect("destroy", self._on_destroy)
 
     def _build_widgets(self):
-        """Build needed widgets."""
+        """Build a placeholder and load the repository state."""
         self._popover = self._builder.get_object("popover")
-        project_branch = self._git.get_project_branch()
-        self._builder.get_object("branch").set_label(project_branch)
-        remote_url = self._git.get_remote_url()
+        self._builder.get_object("branch").set_label(_("Loading..."))
+        self._builder.get_object("more_button").set_sensitive(False)
+        for widget_name in FILE_LISTS:
+            self._builder.get_object(widget_name).hide()
+        self._task = self._repository.load_state(self._on_loaded,
+                                                 self._on_failed)
+
+    def _on_loaded(self, state):
+        """Apply the repository state to the widgets.
+
+        Called for the first load and on every change of the repository,
+        only what differs from the displayed state is updated.
+        """
+        self._task = None
+        branch = self._builder.get_object("branch")
+        if branch.get_label() != state['project_branch']:
+            branch.set_label(state['project_branch'])
+        # Say why the changes shown may be incomplete
+        if state['mode'] == MODE_STALE:
+            hint = _("Showing the last known changes, "
+                     "the current ones are being computed")
+        elif state['mode'] == MODE_BRANCH:
+            hint = _("The changes are being computed")
+        elif state['mode'] == MODE_NO_UNTRACKED:
+            hint = _("Untracked files aren't listed in large repositories")
+        else:
+            hint = None
+        if state['slow']:
+            hint = (hint + "\n" if hint else "") + _(
+                "Git status is slow here, it could be sped up with\n"
+                "git config nautilus-git.untrackedCache true\n"
+                "git config nautilus-git.fsmonitor true")
+        branch.set_tooltip_text(hint)
+        self._remote_url = state['remote_url']
         # Show the open remote button only if it's a url
-        has_remote = False
-        if remote_url.lower().startswith(("http://", "https://", "wwww")):
-            self._builder.get_object("open_remote").show()
-            has_remote = True
+        has_remote = bool(self._remote_url and
+                          self._remote_url.lower().startswith(
+                              ("http://", "https://", "wwww")))
+        self._builder.get_object("open_remote").set_visible(has_remote)
 
-        files = self._git.get_modified()
         # Show the compare commits button only if there's any modification
-        has_files = False
-        if files:
-            self._builder.get_object("compare_commits").show()
-            has_files = True
-
-        if not has_files and not has_remote:
-            self._builder.get_object("more_button").set_sensitive(False)
-
-        status = self._git.get_status()
-        widgets = ["added", "modified", "removed"]
-        for widget_name in widgets:
-            files = status[widget_name]
-            files.sort()
+        has_files = bool(state['modified'])
+        self._builder.get_object("compare_commits").set_visible(has_files)
+        if has_files:
+            # The compare window then opens on cached patches, the model
+            # stops the prefetch once its last consumer is gone
+            self._repository.prefetch_patches(state)
+
+        # The history is always available
+        self._builder.get_object("more_button").set_sensitive(True)
+
+        status = state['status']
+        for widget_name in FILE_LISTS:
+            files = sorted(status[widget_name])
+            self._update_files(widget_name, files)
             widget = self._builder.get_object(widget_name)
             if files:
-                widget.set_label(str(len(files)))
-                box = self._builder.get_object(widget_name + "_content")
-                for file_ in files:
-                    file_label = Gtk.Label(file_)
-                    file_label.set_halign(Gtk.Align.START)
-                    file_label.show()
-                    box.pack_start(file_label, False, False, 6)
+                if widget.get_label() != str(len(files)):
+                    widget.set_label(str(len(files)))
+                widget.show()
             else:
                 widget.hide()
+                self._builder.get_object(widget_name + "_popover").hide()
+
+    def _on_failed(self, error):
+        """Stop showing the loading state, the next refresh tries again."""
+        self._task = None
+        branch = self._builder.get_object("branch")
+        if branch.get_label() == _("Loading..."):
+            branch.set_label(path.basename(self._git.dir))
+        branch.set_tooltip_text(
+            _("The repository could not be read:\n{0}").format(error))
+
+    def _update_files(self, widget_name, files):
+        """Replace the files of a list, touching only the changed rows.
+
+        Lists are only filled when their popover is opened, the shown
+        rows are kept in sync with the sorted files list.
+        """
+        old_files = self._files[widget_name]
+        self._files[widget_name] = files
+        store = self._builder.get_object(widget_name + "_store")
+        shown = len(store)
+        if not shown:
+            return
+        # Only files sorted before the last shown one belong to the list,
+        # unless everything was shown already.
+        if shown < len(old_files):
+            last = store[shown - 1][0]
+        else:
+            last = None
+        limit = max(shown, PAGE_SIZE)
+
+        current = set(files)
+        tree_iter = store.get_iter_first()
+        while tree_iter is not None:
+            if store[tree_iter][0] in current:
+                tree_iter = store.iter_next(tree_iter)
+            elif not store.remove(tree_iter):
+                tree_iter = None
+
+        # Rows are now a sorted subset of files, merge the missing ones in
+        position = 0
+        for file_ in files:
+            if (last is not None and file_ > last) or position >= limit:
+                break
+            if position >= len(store) or store[position][0] != file_:
+                store.insert(position, [file_])
+            position += 1
+        while len(store) > position:
+            store.remove(store.get_iter(position))
+
+        more = self._builder.get_object(widget_name + "_more")
+        more.set_visible(len(store) < len(files))
+
+    def _show_more(self, button):
+        """Show more button of a files list clicked."""
+        self._fill_files(button.get_name())
+
+    def _fill_files(self, widget_name):
+        """Add the next page of files to a list."""
+        files = self._files[widget_name]
+        store = self._builder.get_object(widget_name + "_store")
+        view = self._builder.get_object(widget_name + "_view")
+        start = len(store)
+        # Detach the model while filling it, views update row by row
+        view.set_model(None)
+        for file_ in files[start:start + PAGE_SIZE]:
+            store.append([file_])
+        view.set_model(store)
+
+        more = self._builder.get_object(widget_name + "_more")
+        more.set_visible(len(store) < len(files))
+        if start == 0:
+            # Fit short lists, scroll long ones
+            renderer = view.get_column(0).get_cells()[0]
+            row_height = renderer.get_preferred_height(view)[1]
+            scrolled = self._builder.get_object(widget_name + "_scrolled")
+            scrolled.set_min_content_height(
+                min(len(store), VISIBLE_ROWS) * row_height)
 
     @property
     def main(self):
         return self._builder.get_object("main")
 
+    def _on_destroy(self, *args):
+        """Stop watching the repository once the widget is gone."""
+        if self._task:
+            self._task.cancel()
+        release(self._repository, self._handler)
+
     def _update_branch(self, button):
         """Open the branch widget."""
+        from branch import BranchWidget
         branch_ = BranchWidget(self._git, self._window)
-        branch_.connect("refresh", self._refresh)
+        branch_.connect("branch-changed", self._on_branch_changed)
+        branch_.connect("refresh", self._on_branch_updated)
+
+    def _on_branch_changed(self, widget, branch):
+        """Show the new branch right away, while git checks it out."""
+        project_name = self._git.get_project_name()
+        if project_name:
+            branch = project_name + "/" + branch
+        self._builder.get_object("branch").set_label(branch)
+
+    def _on_branch_updated(self, *args):
+        """Reload the state of every widget showing the repository."""
+        self._repository.reload()
 
-    def _refresh(self, event):
-        action = self._window.lookup_action("reload")
-        action.emit("activate", None)
+    def _refresh(self, *args):
+        """Load the repository state again and update the widgets."""
+        # A load in flight is restarted by the repository model
+        if self._task is None:
+            self._task = self._repository.load_state(self._on_loaded,
+                                                     self._on_failed)
 
     def _trigger_popover(self, popover):
         """Show/hide popover."""
         if popover.get_visible():
             popover.hide()
         else:
+            for widget_name in FILE_LISTS:
+                store = self._builder.get_object(widget_name + "_store")
+                if (popover is self._builder.get_object(widget_name +
+                                                        "_popover") and
+                        not len(store)):
+                    self._fill_files(widget_name)
             popover.show()
 
     def _compare_commits(self, *args):
         """Compare commits widget creation."""
+        # Imported on first use, it loads GtkSource
+        from compare import NautilusGitCompare
         widget = NautilusGitCompare(self._git)
         self._popover.hide()
 
+    def _show_history(self, *args):
+        """History window creation."""
+        from history import NautilusGitHistory
+        NautilusGitHistory(self._git)
+        self._popover.hide()
+
     def _open_remote_browser(self, *args):
         """Open the remote url on the default browser."""
-        Gio.app_info_launch_default_for_uri(self._git.get_remote_url())
+        Gio.app_info_launch_default_for_uri(self._remote_url)
         self._popover.hide()
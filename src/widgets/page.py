@@ -27,37 +27,83 @@ from gi.repository import Gtk
 
 sys_path.insert(0, environ["MODELS_DIR"])
 
-from git import Git
-from watchdog import WatchDog
+from repository import acquire, release
 
 class NautilusPropertyPage:
     """Property page main widget class."""
 
     def __init__(self, git_uri):
-        self._git = Git(git_uri)
-        self._watchdog = WatchDog(self._git.dir)
-        self._watchdog.connect("refresh", self._refresh)
+        self._repository, self._handler = acquire(git_uri, self._refresh)
+        self._task = None
+        self._index_task = None
 
         self._builder = Gtk.Builder()
         self._builder.add_from_resource('/com/nautilus/git/ui/page.ui')
         self._build_widgets()
+        self.main.connect("destroy", self._on_destroy)
 
     @property
     def main(self):
         return self._builder.get_object("main")
 
+    def _on_destroy(self, *args):
+        """Stop watching the repository once the widget is gone."""
+        for task in (self._task, self._index_task):
+            if task:
+                task.cancel()
+        release(self._repository, self._handler)
+
     def _build_widgets(self):
         """Build needed widgets."""
-        self._builder.get_object("branch").set_text(self._git.get_branch())
-        status = self._git.get_status()
+        self._builder.get_object("branch").set_text(_("Loading..."))
+        self._reload()
+
+    def _reload(self):
+        """Query the repository unless a query is already in flight."""
+        # The index alone answers quickly whether anything changed
+        if self._index_task is None:
+            self._index_task = self._repository.load_index_summary(
+                self._on_index_loaded, self._on_index_failed)
+        if self._task is None:
+            self._task = self._repository.load_state(self._on_loaded,
+                                                     self._on_failed)
+
+    def _on_index_loaded(self, summary):
+        """Show the staged count and whether the working tree is dirty."""
+        self._index_task = None
+        self._set_text("staged",
+                       _("{0} file.").format(len(summary['staged'])))
+        if summary['staged'] or summary['unstaged']:
+            self._set_text("state", _("Uncommitted changes"))
+        else:
+            self._set_text("state", _("Clean"))
+
+    def _on_index_failed(self, error):
+        self._index_task = None
+
+    def _on_failed(self, error):
+        """Stop showing the loading state, the next refresh tries again."""
+        self._task = None
+        if self._builder.get_object("branch").get_text() == _("Loading..."):
+            self._set_text("branch", _("Unavailable"))
+
+    def _on_loaded(self, state):
+        """Fill the widgets once the repository state is known."""
+        self._task = None
+        status = state['status']
+        self._set_text("branch", state['branch'])
 
         status_widgets = ["added", "removed", "modified"]
         for widget_name in status_widgets:
             count = str(len(status[widget_name]))
-            widget = self._builder.get_object(widget_name)
-            widget.set_text(_("{0} file.").format(count))
+            self._set_text(widget_name, _("{0} file.").format(count))
+
+    def _set_text(self, widget_name, text):
+        """Update a label, leaving it alone if the text didn't change."""
+        widget = self._builder.get_object(widget_name)
+        if widget.get_text() != text:
+            widget.set_text(text)
 
-    def _refresh(self, event):
-        branch = self._builder.get_object("branch")
-        branch.set_text(self._git.get_branch())
-        branch.show()
+    def _refresh(self, *args):
+        """The repository changed, update the labels in place."""
+        self._reload()
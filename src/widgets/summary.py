@@ -0,0 +1,171 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from gettext import gettext as _, ngettext
+from os import environ, path
+from sys import path as sys_path
+from time import time
+
+from gi import require_version
+require_version("Gtk", "3.0")
+from gi.repository import Gtk
+
+sys_path.insert(0, environ["MODELS_DIR"])
+
+from git import MODE_BRANCH, MODE_NO_UNTRACKED, MODE_STALE, Git
+from tasks import run_async
+from utils import get_uri
+from watchdog import subscribe, unsubscribe
+
+# Store columns
+NAME, BRANCH, CHANGES, PATH = range(4)
+# Snapshots taken while git status runs past its budget
+PENDING_MODES = (MODE_STALE, MODE_BRANCH)
+
+
+def get_summary(root):
+    """Return the branch and the changes of a repository, in a worker."""
+    git = Git(get_uri(root))
+    snapshot = git.get_snapshot()
+    return {
+        'branch': git.get_branch(snapshot),
+        'status': git.get_status(snapshot),
+        'mode': snapshot.mode
+    }
+
+
+class NautilusGitSummaryPage:
+    """Property page summing up the repositories of a selection.
+
+    Every repository is queried at once on the worker pool, rows are
+    filled in as the results arrive. Rows whose status exceeded its
+    budget are filled in again once it finishes.
+    """
+
+    def __init__(self, roots):
+        self._tasks = []
+        # root -> watchdog subscription, for the rows still pending
+        self._watches = {}
+        self._started = time()
+        self._pending = len(roots)
+
+        self._builder = Gtk.Builder()
+        self._builder.add_from_resource('/com/nautilus/git/ui/summary.ui')
+        self._store = self._builder.get_object("store")
+        self._build_widgets(sorted(roots))
+        self.main.connect("destroy", self._on_destroy)
+
+    @property
+    def main(self):
+        return self._builder.get_object("main")
+
+    def _build_widgets(self, roots):
+        """Add a loading row per repository and start querying them."""
+        self._update_summary()
+        for root in roots:
+            tree_iter = self._store.append([path.basename(root),
+                                            "", _("Loading..."), root])
+            row = Gtk.TreeRowReference.new(self._store,
+                                           self._store.get_path(tree_iter))
+            self._load(root, row, True)
+
+    def _load(self, root, row, first):
+        """Query a repository, first for the initial load of its row."""
+        self._tasks.append(run_async(
+            get_summary, root,
+            callback=lambda summary: self._on_loaded(root, row, summary,
+                                                     first),
+            error_callback=lambda error: self._on_failed(root, row, first)))
+
+    def _on_loaded(self, root, row, summary, first):
+        """Fill the row of a repository."""
+        if first:
+            self._pending -= 1
+        tree_path = row.get_path()
+        if tree_path is not None:
+            tree_iter = self._store.get_iter(tree_path)
+            self._store.set_value(tree_iter, BRANCH, summary['branch'])
+            self._store.set_value(tree_iter, CHANGES,
+                                  self._format_changes(summary))
+        if summary['mode'] in PENDING_MODES:
+            # The watchdog refreshes once the late status is known
+            if root not in self._watches:
+                self._watches[root] = subscribe(
+                    root, lambda watchdog: self._load(root, row, False))
+        else:
+            self._unwatch(root)
+        self._update_summary()
+
+    def _on_failed(self, root, row, first):
+        """The repository couldn't be read, say so in its row."""
+        if first:
+            self._pending -= 1
+        self._unwatch(root)
+        tree_path = row.get_path()
+        if tree_path is not None:
+            self._store.set_value(self._store.get_iter(tree_path), CHANGES,
+                                  _("Unavailable"))
+        self._update_summary()
+
+    def _unwatch(self, root):
+        token = self._watches.pop(root, None)
+        if token is not None:
+            unsubscribe(token)
+
+    @staticmethod
+    def _format_changes(summary):
+        """Return the changes of a repository as a short text."""
+        if summary['mode'] == MODE_BRANCH:
+            # Nothing is known of the changes yet
+            return _("Computing changes...")
+        status = summary['status']
+        labels = [
+            ('modified', _("{0} modified")),
+            ('added', _("{0} added")),
+            ('removed', _("{0} removed")),
+            ('untracked', _("{0} untracked")),
+            ('conflicted', _("{0} conflicted"))
+        ]
+        changes = [label.format(len(status[key])) for key, label in labels
+                   if status[key]]
+        text = ", ".join(changes) if changes else _("Clean")
+        if summary['mode'] == MODE_STALE:
+            text += " " + _("(updating...)")
+        elif summary['mode'] == MODE_NO_UNTRACKED:
+            text += " " + _("(incomplete)")
+        return text
+
+    def _update_summary(self):
+        """Show how many repositories there are, and the time taken."""
+        count = len(self._store) or self._pending
+        text = ngettext("{0} repository", "{0} repositories",
+                        count).format(count)
+        if self._pending:
+            text += " - " + _("loading...")
+        else:
+            text += " - " + _("loaded in {0:.1f}s").format(
+                time() - self._started)
+        self._builder.get_object("summary").set_text(text)
+
+    def _on_destroy(self, *args):
+        """Cancel the queries still running."""
+        for task in self._tasks:
+            task.cancel()
+        for root in list(self._watches):
+            self._unwatch(root)
@@ -0,0 +1,94 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from os import environ, makedirs, path
+from shutil import rmtree
+from subprocess import check_output
+from sys import path as sys_path
+from tempfile import mkdtemp
+from unittest import TestCase
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+environ["SRC_DIR"] = path.join(ROOT, "src")
+environ["MODELS_DIR"] = path.join(ROOT, "src", "models")
+sys_path.insert(0, environ["SRC_DIR"])
+sys_path.insert(0, environ["MODELS_DIR"])
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "Test",
+    "GIT_AUTHOR_EMAIL": "test@localhost",
+    "GIT_COMMITTER_NAME": "Test",
+    "GIT_COMMITTER_EMAIL": "test@localhost",
+    "GIT_CONFIG_NOSYSTEM": "1",
+    "PATH": environ.get("PATH", "/usr/local/bin:/usr/bin:/bin")
+}
+# Read from the environment by the models as well as by git
+SHARED_ENV = ["HOME", "XDG_CONFIG_HOME", "GIT_CONFIG_NOSYSTEM",
+              "GIT_CONFIG_GLOBAL"]
+
+
+class GitTestCase(TestCase):
+    """A test running git in a fresh repository under a fresh home.
+
+    The models read the same home as git, the global config of whoever
+    runs the tests is left out.
+    """
+
+    def setUp(self):
+        self.tmp = path.realpath(mkdtemp(prefix="nautilus-git-test-"))
+        self.home = path.join(self.tmp, "home")
+        self.root = path.join(self.tmp, "repository")
+        makedirs(self.home)
+        makedirs(self.root)
+        self.env = dict(GIT_ENV, HOME=self.home,
+                        XDG_CONFIG_HOME=path.join(self.home, ".config"))
+        self._saved_env = dict((key, environ.get(key)) for key in SHARED_ENV)
+        for key in SHARED_ENV:
+            if key in self.env:
+                environ[key] = self.env[key]
+            else:
+                environ.pop(key, None)
+        self.git("init", "-q")
+
+    def tearDown(self):
+        for key, value in self._saved_env.items():
+            if value is None:
+                environ.pop(key, None)
+            else:
+                environ[key] = value
+        rmtree(self.tmp)
+
+    def git(self, *args, **kwargs):
+        """Run git in the repository, or in cwd, and return its output."""
+        return check_output(["git"] + list(args),
+                            cwd=kwargs.get("cwd", self.root), env=self.env)
+
+    def write(self, name, content, root=None):
+        """Write a file of the repository, or under root."""
+        file_path = path.join(root or self.root, name)
+        if not path.isdir(path.dirname(file_path)):
+            makedirs(path.dirname(file_path))
+        with open(file_path, "w") as obj:
+            obj.write(content)
+        return file_path
+
+    def commit(self, message="commit"):
+        """Commit every change of the working tree."""
+        self.git("add", "-A")
+        self.git("commit", "-q", "--allow-empty", "-m", message)
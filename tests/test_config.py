@@ -0,0 +1,136 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from os import path
+from unittest import main
+
+from gitcase import GitTestCase
+
+from config import get_config
+from discovery import find_repository
+
+
+class ConfigTest(GitTestCase):
+    """Compare the config cascade with git config --list --includes."""
+
+    def get_git_values(self):
+        """Return key -> values of git config --list, in order."""
+        values = {}
+        output = self.git("config", "--list", "--includes", "-z")
+        for record in output.decode("utf-8").split("\0"):
+            if record:
+                key, _, value = record.partition("\n")
+                values.setdefault(key, []).append(
+                    value if "\n" in record else None)
+        return values
+
+    def assertMatchesGit(self):
+        config = get_config(find_repository(self.root))
+        values = self.get_git_values()
+        self.assertEqual(dict((key, config.get_all(key)) for key in values),
+                         values)
+        # Nothing git doesn't see either
+        self.assertEqual(sorted(config._values), sorted(values))
+        return config
+
+    def append_config(self, content, file_path=None):
+        file_path = file_path or path.join(self.root, ".git", "config")
+        with open(file_path, "a") as obj:
+            obj.write(content)
+
+    def test_values(self):
+        self.append_config(
+            '[Core]\n'
+            '\tEditor = "vim -c \\"set ft=gitcommit\\"" ; a comment\n'
+            '[user]\n'
+            '\tname = Some \tOne # trailing comment\n'
+            '\tsigningKey\n'
+            '[alias]\n'
+            '\tlg = log --graph \\\n'
+            '\t\t--oneline\n'
+            '\tesc = "tab\\there\\nnewline"\n'
+            '[remote "Origin"]\n'
+            '\turl = https://example.com/a.git\n'
+            '\tfetch = +refs/heads/*:refs/remotes/Origin/*\n'
+            '\tfetch = +refs/tags/*:refs/tags/*\n'
+            '[branch.Main]\n'
+            '\tremote = Origin\n'
+            '; only a comment\n'
+            '[empty]\n')
+        config = self.assertMatchesGit()
+        self.assertTrue(config.get_bool("user.signingkey"))
+        self.assertEqual(config.get("remote.Origin.url"),
+                         "https://example.com/a.git")
+
+    def test_global_files(self):
+        self.write(".gitconfig", "[user]\n\tname = Home\n[core]\n"
+                   "\tautocrlf = input\n", self.home)
+        self.write(".config/git/config", "[user]\n\tname = Xdg\n"
+                   "\temail = xdg@localhost\n", self.home)
+        self.append_config("[user]\n\tname = Local\n")
+        config = self.assertMatchesGit()
+        self.assertEqual(config.get("user.name"), "Local")
+
+    def test_include(self):
+        self.write("included/first", "[user]\n\tname = First\n"
+                   "[include]\n\tpath = second\n", self.home)
+        self.write("included/second", "[user]\n\temail = second@localhost\n"
+                   "[core]\n\tabbrev = 12\n", self.home)
+        self.write(".gitconfig", "[include]\n\tpath = included/first\n",
+                   self.home)
+        self.write("local-include", "[core]\n\tabbrev = 10\n",
+                   path.join(self.root, ".git"))
+        self.append_config("[include]\n\tpath = local-include\n"
+                           "\tpath = ~/included/missing\n"
+                           "[core]\n\tquotePath = false\n")
+        config = self.assertMatchesGit()
+        self.assertEqual(config.get_int("core.abbrev"), 10)
+
+    def test_include_if_gitdir(self):
+        self.write("match", "[user]\n\tname = Gitdir\n", self.home)
+        self.write("match-icase", "[user]\n\temail = icase@localhost\n",
+                   self.home)
+        self.write("no-match", "[user]\n\tname = Other\n", self.home)
+        self.write(".gitconfig",
+                   '[includeIf "gitdir:{0}/"]\n\tpath = match\n'
+                   '[includeIf "gitdir/i:{1}/"]\n\tpath = match-icase\n'
+                   '[includeIf "gitdir:**/elsewhere/"]\n\tpath = no-match\n'
+                   '[includeIf "gitdir:repository/.git"]\n'
+                   '\tpath = match\n'.format(self.tmp, self.tmp.upper()),
+                   self.home)
+        config = self.assertMatchesGit()
+        self.assertEqual(config.get("user.name"), "Gitdir")
+
+    def test_include_if_onbranch(self):
+        self.commit()
+        self.write("onbranch", "[user]\n\tname = Feature\n", self.home)
+        self.write(".gitconfig",
+                   '[includeIf "onbranch:feature/"]\n\tpath = onbranch\n',
+                   self.home)
+        self.assertIsNone(self.assertMatchesGit().get("user.name"))
+        self.git("checkout", "-q", "-b", "feature/one")
+        self.assertEqual(self.assertMatchesGit().get("user.name"),
+                         "Feature")
+        # Detached HEAD matches no branch
+        self.git("checkout", "-q", "--detach")
+        self.assertIsNone(self.assertMatchesGit().get("user.name"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from os import chmod, path, remove
+from unittest import main
+
+from gitcase import GitTestCase
+
+from diff import (DIFF_OPTIONS, HUNK_PREFIXES_RAW, PATCH_OPTIONS, get_base,
+                  get_header_path, strip_header)
+from git import Git
+from utils import get_uri
+
+# Paths git quotes in headers, or writes followed by a tab
+ODD_NAMES = ["with space.txt", "new\nline.txt", "tab\there.txt",
+             'quote".txt', "back\\slash.txt", u"\xe9t\xe9.txt",
+             "dir with space/a b.txt", "trailing space .txt"]
+
+
+class DiffTest(GitTestCase):
+    """Compare the patch headers parsed by DiffSet with git diff."""
+
+    def get_headers(self, base):
+        """Return the header lines of every patch of the whole diff."""
+        headers = []
+        in_header = False
+        output = self.git("diff", *(PATCH_OPTIONS + [base]))
+        for line in output.splitlines(True):
+            if line.startswith(b"diff --git "):
+                headers.append([line])
+                in_header = True
+            elif in_header and line.startswith(HUNK_PREFIXES_RAW):
+                in_header = False
+            elif in_header:
+                headers[-1].append(line)
+        return headers
+
+    def assertMatchesGit(self):
+        base = get_base(self.root)
+        names = self.git("diff", "--name-only", "-z",
+                         *(DIFF_OPTIONS + [base])).decode("utf-8")
+        self.assertEqual([get_header_path(header)
+                          for header in self.get_headers(base)],
+                         [name for name in names.split("\0") if name])
+        diff_set = Git(get_uri(self.root)).get_diff_set()
+        try:
+            files = diff_set.get_files()
+            self.assertEqual(len(files), len(names.strip("\0").split("\0")))
+            for diff_file in files:
+                paths = [diff_file.path]
+                if diff_file.orig_path:
+                    paths.append(diff_file.orig_path)
+                patch = self.git("diff", *(PATCH_OPTIONS + [base, "--"] +
+                                           paths))
+                self.assertEqual(diff_set.get_patch(diff_file.path),
+                                 strip_header(patch.decode("utf-8",
+                                                           "replace")))
+        finally:
+            diff_set.close()
+
+    def populate(self):
+        for name in ODD_NAMES + ["renamed.txt", "deleted.txt", "mode.sh"]:
+            self.write(name, "line of {0}\n".format(name) * 20)
+        with open(path.join(self.root, "binary.bin"), "wb") as obj:
+            obj.write(b"\0binary\xff" * 100)
+
+    def change(self):
+        for name in ODD_NAMES:
+            self.write(name, "changed\n")
+        self.git("mv", "renamed.txt", "renamed with space\n.txt")
+        remove(path.join(self.root, "deleted.txt"))
+        chmod(path.join(self.root, "mode.sh"), 0o755)
+        with open(path.join(self.root, "binary.bin"), "wb") as obj:
+            obj.write(b"\0changed\xff" * 100)
+        self.write(u"added \xe9.txt", "added\n")
+        self.git("add", u"added \xe9.txt")
+
+    def test_headers(self):
+        self.populate()
+        self.commit()
+        self.change()
+        self.assertMatchesGit()
+
+    def test_unborn(self):
+        # Diffed against the empty tree
+        self.populate()
+        self.git("add", "-A")
+        self.assertMatchesGit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from binascii import hexlify
+from os import chmod, path, remove, stat, symlink, utime
+from subprocess import CalledProcessError
+from unittest import main
+
+from gitcase import GitTestCase
+
+from discovery import Repository, find_repository
+from index import get_index_summary, read_index
+
+# Reports every path as changed, enough for git to write an FSMN extension
+FSMONITOR_HOOK = "#!/bin/sh\nprintf 'token\\0/\\0'\n"
+
+
+class IndexTest(GitTestCase):
+    """Compare the index parser with git on generated repositories."""
+
+    def populate(self, count=300):
+        """Commit count files spread over a few directories."""
+        for i in range(count):
+            self.write("dir{0}/sub{1}/file{2}.txt".format(i % 3, i % 7, i),
+                       "line {0}\n".format(i))
+        self.write("run.sh", "#!/bin/sh\n")
+        chmod(path.join(self.root, "run.sh"), 0o755)
+        symlink("run.sh", path.join(self.root, "link"))
+        self.write("with space/\xe9t\xe9.txt", "unicode\n")
+        self.commit("initial")
+
+    def change(self):
+        """Leave staged, unstaged, deleted and intent to add changes."""
+        for i in range(0, 300, 40):
+            self.write("dir{0}/sub{1}/file{2}.txt".format(i % 3, i % 7, i),
+                       "staged\n")
+        self.git("add", "-A")
+        for i in range(5, 300, 60):
+            self.write("dir{0}/sub{1}/file{2}.txt".format(i % 3, i % 7, i),
+                       "unstaged\n")
+        remove(path.join(self.root, "dir1", "sub1", "file1.txt"))
+        self.git("rm", "-q", "--cached", "dir2/sub2/file2.txt")
+        self.write("new/staged.txt", "new\n")
+        self.git("add", "new/staged.txt")
+        self.write("new/intent.txt", "intent\n")
+        self.git("add", "-N", "new/intent.txt")
+        chmod(path.join(self.root, "run.sh"), 0o644)
+
+    def get_repository(self):
+        repository = find_repository(self.root)
+        self.assertIsInstance(repository, Repository)
+        return repository
+
+    def get_git_entries(self):
+        """Return (mode, oid, stage, path) of git ls-files --stage."""
+        entries = []
+        for line in self.git("ls-files", "--stage", "-z").split(b"\0"):
+            if line:
+                info, name = line.split(b"\t", 1)
+                mode, oid, stage = info.split(b" ")
+                entries.append((int(mode, 8), oid.decode("ascii"),
+                                int(stage), name))
+        return entries
+
+    def get_git_status(self):
+        """Return the staged and unstaged paths of git status."""
+        staged, unstaged = set(), set()
+        output = self.git("status", "--porcelain=v2", "-z", "--no-renames",
+                          "--untracked-files=no")
+        for record in output.split(b"\0"):
+            if not record:
+                continue
+            fields = record.split(b" ")
+            kind, changes = fields[0], fields[1]
+            # Ordinary records have 8 fields before the path,
+            # unmerged ones 10
+            name = b" ".join(fields[8 if kind == b"1" else 10:])
+            if changes[0:1] != b".":
+                staged.add(name.decode("utf-8"))
+            if changes[1:2] != b".":
+                unstaged.add(name.decode("utf-8"))
+        return sorted(staged), sorted(unstaged)
+
+    def assertMatchesGit(self):
+        repository = self.get_repository()
+        index = read_index(repository)
+        entries = index.entries
+        self.assertEqual(
+            [(entries.mode[i], hexlify(entries.oid(i)).decode("ascii"),
+              entries.stage(i), entries.name(i))
+             for i in range(len(entries))],
+            self.get_git_entries())
+        summary = get_index_summary(repository)
+        staged, unstaged = self.get_git_status()
+        self.assertEqual(summary["entries"], len(entries))
+        self.assertEqual(summary["staged"], staged)
+        self.assertEqual(summary["unstaged"], unstaged)
+        return index
+
+    def test_clean(self):
+        self.populate()
+        index = self.assertMatchesGit()
+        self.assertEqual(index.version, 2)
+
+    def test_changes(self):
+        self.populate()
+        self.change()
+        index = self.assertMatchesGit()
+        # Intent to add entries use the extended flags of version 3
+        self.assertEqual(index.version, 3)
+
+    def test_version_4(self):
+        self.populate()
+        self.git("update-index", "--index-version", "4")
+        self.change()
+        index = self.assertMatchesGit()
+        self.assertEqual(index.version, 4)
+
+    def test_conflict(self):
+        self.populate(10)
+        self.git("checkout", "-q", "-b", "other")
+        self.write("dir0/sub0/file0.txt", "other\n")
+        self.git("commit", "-q", "-a", "-m", "other")
+        self.git("checkout", "-q", "-")
+        self.write("dir0/sub0/file0.txt", "main\n")
+        self.git("commit", "-q", "-a", "-m", "main")
+        # The merge stops on the conflict
+        self.assertRaises(CalledProcessError, self.git, "merge", "-q",
+                          "other")
+        index = self.assertMatchesGit()
+        self.assertEqual(sorted(set(index.entries.stage(i)
+                                    for i in range(len(index.entries)))),
+                         [0, 1, 2, 3])
+
+    def test_split_index(self):
+        self.git("config", "splitIndex.maxPercentChange", "100")
+        self.populate()
+        self.git("update-index", "--split-index")
+        # Replaced and deleted entries of the shared index, a long run of
+        # deletions gives an EWAH bitmap with both run and literal words
+        self.change()
+        self.git("rm", "-q", "-r", "--cached", "dir0")
+        self.git("status", "--porcelain")
+        index = self.assertMatchesGit()
+        self.assertIsNotNone(index.shared_index)
+        self.assertTrue(path.exists(index.shared_index))
+
+    def test_untracked_cache_and_fsmonitor(self):
+        self.populate()
+        hook = path.join(self.root, ".git", "fsmonitor")
+        with open(hook, "w") as obj:
+            obj.write(FSMONITOR_HOOK)
+        chmod(hook, 0o755)
+        self.git("config", "core.untrackedCache", "true")
+        self.git("config", "core.fsmonitor", hook)
+        self.git("config", "core.fsmonitorHookVersion", "2")
+        self.change()
+        self.write("untracked/file.txt", "untracked\n")
+        self.git("status", "--porcelain")
+        index = self.assertMatchesGit()
+        self.assertTrue(index.has_untracked_cache)
+
+    def test_eol_conversion(self):
+        self.populate(20)
+        self.write(".gitattributes", "* text eol=crlf\n")
+        self.git("add", ".gitattributes")
+        self.git("commit", "-q", "-m", "attributes")
+        # Checked out again with CRLF line endings
+        self.git("rm", "-q", "-r", "--cached", ".")
+        self.git("reset", "-q", "--hard")
+        self.make_racy()
+        self.write("dir0/sub0/file0.txt", "changed\r\n")
+        self.assertMatchesGit()
+
+    def test_autocrlf(self):
+        self.populate(20)
+        self.git("config", "core.autocrlf", "true")
+        self.git("rm", "-q", "-r", "--cached", ".")
+        self.git("reset", "-q", "--hard")
+        self.make_racy()
+        self.write("dir2/sub2/file2.txt", "changed\r\n")
+        self.assertMatchesGit()
+
+    def make_racy(self):
+        """Give every file the mtime of the index, its content is then
+        compared instead of its stat data."""
+        mtime = stat(path.join(self.root, ".git", "index")).st_mtime
+        for name in self.git("ls-files", "-z").split(b"\0"):
+            file_path = path.join(self.root.encode("utf-8"), name)
+            if name and not path.islink(file_path):
+                utime(file_path, (mtime, mtime))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from os import path
+from subprocess import CalledProcessError
+from unittest import main
+
+from gitcase import GitTestCase
+
+from discovery import find_repository
+from refs import get_branch, get_head, is_detached, list_refs, resolve_ref
+
+
+class RefsTest(GitTestCase):
+    """Compare the native refs reader with git for-each-ref."""
+
+    def setUp(self):
+        GitTestCase.setUp(self)
+        self.commit("first")
+        self.git("branch", "feature/nested/one")
+        self.git("branch", "other")
+        self.git("tag", "v1")
+        self.git("tag", "-a", "-m", "annotated", "v1-annotated")
+        self.commit("second")
+        self.git("branch", "latest")
+
+    def get_git_refs(self, prefix, cwd=None):
+        output = self.git("for-each-ref", "--format=%(refname) %(objectname)",
+                          prefix, cwd=cwd or self.root)
+        return dict(line.split(" ", 1)
+                    for line in output.decode("utf-8").splitlines())
+
+    def rev_parse(self, name, cwd=None):
+        try:
+            return self.git("rev-parse", "-q", "--verify", name,
+                            cwd=cwd or self.root).decode("ascii").strip()
+        except CalledProcessError:
+            return None
+
+    def assertMatchesGit(self, root=None):
+        root = root or self.root
+        repository = find_repository(root)
+        for prefix in ("refs/heads/", "refs/tags/", "refs/"):
+            refs = self.get_git_refs(prefix, root)
+            self.assertEqual(list_refs(repository, prefix), refs)
+            for refname, oid in refs.items():
+                self.assertEqual(resolve_ref(repository, refname), oid)
+        self.assertEqual(resolve_ref(repository, "HEAD"),
+                         self.rev_parse("HEAD", root))
+        try:
+            head = self.git("symbolic-ref", "-q", "HEAD",
+                            cwd=root).decode("utf-8").strip()
+        except CalledProcessError:
+            head = self.rev_parse("HEAD", root)
+        self.assertEqual(get_head(repository), head)
+        self.assertEqual(is_detached(repository),
+                         not head.startswith("refs/"))
+        branch = head[len("refs/heads/"):] \
+            if head.startswith("refs/heads/") else None
+        self.assertEqual(get_branch(repository), branch)
+
+    def test_loose(self):
+        self.assertMatchesGit()
+
+    def test_packed(self):
+        self.git("pack-refs", "--all")
+        self.assertMatchesGit()
+
+    def test_packed_then_updated(self):
+        self.git("pack-refs", "--all")
+        # Loose refs take over their packed value
+        self.commit("third")
+        self.git("branch", "-f", "other", "HEAD")
+        self.git("branch", "-D", "feature/nested/one")
+        self.assertMatchesGit()
+
+    def test_detached(self):
+        self.git("checkout", "-q", "--detach", "other")
+        self.assertMatchesGit()
+
+    def test_unborn(self):
+        self.git("checkout", "-q", "--orphan", "unborn")
+        self.assertMatchesGit()
+        self.assertIsNone(resolve_ref(find_repository(self.root), "HEAD"))
+
+    def test_worktree(self):
+        worktree = path.join(self.tmp, "worktree")
+        self.git("pack-refs", "--all")
+        self.git("worktree", "add", "-q", "-b", "in-worktree", worktree,
+                 "other")
+        self.assertMatchesGit(worktree)
+        self.git("checkout", "-q", "--detach", cwd=worktree)
+        self.assertMatchesGit(worktree)
+        # The main worktree keeps its own HEAD
+        self.assertMatchesGit()
+
+
+if __name__ == "__main__":
+    main()
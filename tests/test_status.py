@@ -0,0 +1,149 @@
+#!/usr/bin/python2
+"""
+Nautilus git pluging to show useful information under any
+git directory
+
+Author : Bilal Elmoussaoui (bil.elmoussaoui@gmail.com)
+Website : https://github.com/bil-elmoussaoui/nautilus-git
+Licence : GPL-3.0
+nautilus-git is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+nautilus-git is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with nautilus-git. If not, see <http://www.gnu.org/licenses/>.
+"""
+from os import path, remove
+from subprocess import CalledProcessError
+from unittest import main
+
+from gitcase import GitTestCase
+
+from git import MODE_FULL, STATUS_COMMAND, StatusEntry, parse_status
+
+# Paths git quotes or that would break a line based parser
+ODD_NAMES = ["with space.txt", "new\nline.txt", "tab\there.txt",
+             'quote".txt', u"\xe9t\xe9.txt", "dir with space/a b.txt"]
+
+
+class StatusTest(GitTestCase):
+    """Compare the porcelain v2 parser with git status on generated
+    repositories."""
+
+    def get_output(self, *args):
+        try:
+            return self.git(*args).decode("utf-8").strip() or None
+        except CalledProcessError:
+            return None
+
+    def get_git_entries(self):
+        """Return the entries of git status --porcelain=v1 -z."""
+        entries = []
+        records = self.git("status", "--porcelain", "-z").decode(
+            "utf-8").split("\0")
+        i = 0
+        while i < len(records):
+            record = records[i]
+            i += 1
+            if not record:
+                continue
+            index, worktree = record[0], record[1]
+            orig_path = None
+            if index in "RC":
+                orig_path = records[i]
+                i += 1
+            entries.append(StatusEntry(
+                record[3:], index.replace(" ", "."),
+                worktree.replace(" ", "."), orig_path))
+        return sorted(entries)
+
+    def assertMatchesGit(self):
+        snapshot = parse_status(self.git(*STATUS_COMMAND[1:]))
+        self.assertEqual(sorted(snapshot.entries), self.get_git_entries())
+        self.assertEqual(snapshot.mode, MODE_FULL)
+        self.assertEqual(snapshot.oid,
+                         self.get_output("rev-parse", "-q", "--verify",
+                                         "HEAD"))
+        self.assertEqual(snapshot.branch,
+                         self.get_output("symbolic-ref", "-q", "--short",
+                                         "HEAD"))
+        upstream = self.get_output("rev-parse", "--abbrev-ref",
+                                   "--symbolic-full-name", "@{u}")
+        self.assertEqual(snapshot.upstream, upstream)
+        if upstream:
+            ahead, behind = self.get_output("rev-list", "--left-right",
+                                            "--count", "HEAD...@{u}").split()
+            self.assertEqual((snapshot.ahead, snapshot.behind),
+                             (int(ahead), int(behind)))
+        return snapshot
+
+    def test_initial(self):
+        self.write("first.txt", "first\n")
+        snapshot = self.assertMatchesGit()
+        self.assertIsNone(snapshot.oid)
+
+    def test_changes(self):
+        for name in ODD_NAMES + ["modified.txt", "deleted.txt",
+                                 "renamed.txt", "staged.txt"]:
+            self.write(name, "content of {0}\n".format(name) * 10)
+        self.commit()
+        for name in ODD_NAMES:
+            self.write(name, "changed\n")
+        self.git("add", ODD_NAMES[0], ODD_NAMES[1])
+        self.write("modified.txt", "changed\n")
+        self.write("staged.txt", "staged\n")
+        self.git("add", "staged.txt")
+        self.write("staged.txt", "staged then changed\n")
+        remove(path.join(self.root, "deleted.txt"))
+        self.git("mv", "renamed.txt", "renamed with\nnewline.txt")
+        self.git("mv", ODD_NAMES[2], "moved\ttab.txt")
+        self.write("added.txt", "added\n")
+        self.git("add", "added.txt")
+        self.write("untracked file.txt", "untracked\n")
+        self.write("untracked dir/nested.txt", "untracked\n")
+        snapshot = self.assertMatchesGit()
+        self.assertEqual(len(snapshot.renamed), 2)
+
+    def test_conflicts(self):
+        self.write("both.txt", "base\n")
+        self.commit()
+        self.git("checkout", "-q", "-b", "other")
+        self.write("both.txt", "other\n")
+        self.write("added by both.txt", "other\n")
+        self.commit()
+        self.git("checkout", "-q", "-")
+        self.write("both.txt", "main\n")
+        self.write("added by both.txt", "main\n")
+        self.commit()
+        self.assertRaises(CalledProcessError, self.git, "merge", "-q",
+                          "other")
+        snapshot = self.assertMatchesGit()
+        self.assertEqual(sorted(entry.path for entry in snapshot.conflicted),
+                         ["added by both.txt", "both.txt"])
+
+    def test_upstream(self):
+        self.commit()
+        base = self.get_output("symbolic-ref", "--short", "HEAD")
+        self.git("checkout", "-q", "-b", "work/with-slash", "--track", base)
+        self.commit("ahead")
+        self.commit("ahead again")
+        self.git("checkout", "-q", base)
+        self.commit("behind")
+        self.git("checkout", "-q", "work/with-slash")
+        snapshot = self.assertMatchesGit()
+        self.assertEqual((snapshot.ahead, snapshot.behind), (2, 1))
+
+    def test_detached(self):
+        self.commit()
+        self.commit()
+        self.git("checkout", "-q", "HEAD~1")
+        snapshot = self.assertMatchesGit()
+        self.assertIsNone(snapshot.branch)
+
+
+if __name__ == "__main__":
+    main()